@@ -1,17 +1,57 @@
 import streamlit as st
 st.set_page_config(layout="wide")  # Configurar layout ancho para todo el app
 import streamlit.components.v1 as components  # para usar iframe
-import pandas as pd
 import json
-import re  # para parseo de URI GCS
+import pandas as pd
 import os
 import time
+import uuid
 from datetime import datetime
-from google.cloud import storage  # para descargar audio desde GCS
-from google import genai
 # Google GenAI types import
 from google.genai import types
 
+from audio_cache import (
+    AUDIO_PREFETCH_NEIGHBOURS,
+    get_audio_cache,
+    get_audio_prefetcher,
+    neighbour_order,
+    parse_gcs_uri,
+)
+from audio_streaming import AUDIO_PLAYBACK_MODE, audio_playback_url
+from audio_transcription import (
+    AUDIO_BUCKET,
+    AUDIO_EXTENSIONS,
+    BATCH_TRANSCRIPTION_WORKERS,
+    BATCH_UPLOAD_WORKERS,
+    TRANSCRIPTION_MODEL,
+    audio_mime_type,
+    build_blob_path,
+    run_transcription_batch,
+    sources_from_directory,
+    sources_from_manifest,
+    sources_from_uploads,
+    transcribe_audio,
+    transcription_cache_key,
+    upload_audio,
+)
+from evaluation_store import (
+    DETAIL_FIELD,
+    TRANSCRIPT_FIELD,
+    build_call_index,
+    load_records_frame,
+    normalize_evaluations,
+    source_signature,
+)
+from gcp_clients import get_genai_client
+from quality_metrics import METRIC_LABELS, compute_quality_summary
+from retrieval import get_evaluation_retriever
+from telemetry import TELEMETRY_LOG_PATH, TELEMETRY_PANEL, begin_collection, record as record_span
+from transcription_cache import get_transcription_cache
+
+# Spans de esta ejecución del script, para el panel de tiempos del sidebar
+inicio_ejecucion = time.perf_counter()
+spans_ejecucion = begin_collection()
+
 # Configuración global para Gemini (usada por funciones de chat/reportes, si existen)
 generate_content_config = types.GenerateContentConfig(
     temperature=0.7,
@@ -63,8 +103,7 @@ def generate_report(source, context, questions):
     """
 
     try:
-        client = genai.Client()
-        response = client.models.generate_content(
+        response = get_genai_client(vertexai=False).models.generate_content(
             model='gemini-2.5-pro',
             contents=[report_prompt],
             config=generate_content_config
@@ -73,6 +112,34 @@ def generate_report(source, context, questions):
     except Exception as e:
         return f"Error al generar reporte: {str(e)}"
 
+# --- Evaluaciones normalizadas compartidas entre vistas ---
+def version_dataset(path):
+    """(tamaño, mtime) del archivo para usar en las claves de caché; None si no existe."""
+    try:
+        firma = source_signature(path)
+    except OSError:
+        return None
+    return (firma['size'], firma['mtime_ns'])
+
+@st.cache_resource(show_spinner="Cargando evaluaciones...", max_entries=8)
+def cargar_evaluaciones(path, version=None):
+    """DataFrame del dataset con las evaluaciones ya parseadas (ver normalize_evaluations).
+
+    Con st.cache_resource todas las sesiones y reruns reciben el mismo objeto, sin la copia
+    (pickle) que st.cache_data hace en cada llamada; por eso es de solo lectura.
+    `version` (tamaño, mtime) solo forma parte de la clave de caché para recargar si el archivo cambia.
+    """
+    df = load_records_frame(path)
+    # Mapear evaluacion_llamada a evaluacion_llamada_raw si hace falta
+    if 'evaluacion_llamada_raw' not in df.columns and 'evaluacion_llamada' in df.columns:
+        df['evaluacion_llamada_raw'] = df['evaluacion_llamada']
+    if 'id_llamada_procesada' not in df.columns or 'evaluacion_llamada_raw' not in df.columns:
+        raise ValueError(
+            "El archivo JSON debe contener las columnas 'id_llamada_procesada' y 'evaluacion_llamada_raw' o 'evaluacion_llamada'."
+        )
+    # Parsear las evaluaciones una sola vez: métricas numéricas, transcripción y detalle
+    return normalize_evaluations(df)
+
 # --- Eliminar elementos de header por defecto ---
 st.markdown("""
     <style>
@@ -113,6 +180,7 @@ menu_option = st.sidebar.selectbox(
     "Seleccione una opción:",
     [
         "📊 Monitor de Evaluaciones",
+        "📉 Tablero de Calidad",
         "🎤 Procesamiento de Audio",
         "💬 Chat Interactivo",
         "📊 Generador de Informes",
@@ -123,482 +191,642 @@ menu_option = st.sidebar.selectbox(
 
 st.sidebar.markdown("---")
 
+# --- Panel de tiempos de la ejecución actual ---
+def mostrar_panel_tiempos(spans, total_ms):
+    """Desglose de lo medido en esta ejecución: cada span con su duración, bytes, registros y tokens."""
+    st.sidebar.metric("⏱️ Ejecución completa", f"{total_ms:.0f} ms")
+    if not spans:
+        st.sidebar.caption("Nada medido en esta ejecución (todo vino de caché).")
+        return
+    columnas = ("bytes", "records", "tokens_in", "tokens_out", "source")
+    filas = []
+    for medido in spans:
+        fila = {"span": medido.name, "ms": round(medido.duration_ms, 1)}
+        fila.update({clave: valor for clave, valor in medido.attrs.items() if clave in columnas})
+        if medido.error:
+            fila["error"] = medido.error
+        filas.append(fila)
+    st.sidebar.dataframe(pd.DataFrame(filas), hide_index=True)
+    st.sidebar.caption(f"Registro JSONL: {TELEMETRY_LOG_PATH} (`python telemetry.py` resume p50/p95).")
+
+
 # Mostrar contenido según la selección del menú
 # Mostrar contenido según la selección del menú
-if menu_option == "📊 Monitor de Evaluaciones":
-    
-    # --- Opciones específicas para Monitor de Evaluaciones ---
-    st.sidebar.markdown("### ⚙️ Configuración")
-    
-    # --- Elección de dataset de evaluaciones ---
-    file_options = {
-        "Servicios": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_servicios.json",
-        "Preferente": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_preferente.json",
-        "Retención": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_retencion.json",
-        "Bloqueos": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_bloqueos.json"
-    }
-    selected_dataset = st.sidebar.selectbox("📂 Seleccione tipo de evaluación", list(file_options.keys()))
-    DATA_PATH = file_options[selected_dataset]
-
-    # --- Funciones de Carga y Visualización ---
-    @st.cache_data
-    def load_data(path):
-        """Carga los datos desde un archivo JSON y los devuelve como un DataFrame."""
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                datos_json = json.load(f)
-            df = pd.DataFrame(datos_json)
-            # Mapear evaluacion_llamada a evaluacion_llamada_raw si hace falta
-            if 'evaluacion_llamada_raw' not in df.columns and 'evaluacion_llamada' in df.columns:
-                df['evaluacion_llamada_raw'] = df['evaluacion_llamada']
-            if 'id_llamada_procesada' not in df.columns or 'evaluacion_llamada_raw' not in df.columns:
-                st.error("El archivo JSON debe contener las columnas 'id_llamada_procesada' y 'evaluacion_llamada_raw' o 'evaluacion_llamada'.")
+try:
+    if menu_option == "📊 Monitor de Evaluaciones":
+
+        # --- Opciones específicas para Monitor de Evaluaciones ---
+        st.sidebar.markdown("### ⚙️ Configuración")
+
+        # --- Elección de dataset de evaluaciones ---
+        file_options = {
+            "Servicios": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_servicios.json",
+            "Preferente": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_preferente.json",
+            "Retención": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_retencion.json",
+            "Bloqueos": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_bloqueos.json"
+        }
+        selected_dataset = st.sidebar.selectbox("📂 Seleccione tipo de evaluación", list(file_options.keys()))
+        DATA_PATH = file_options[selected_dataset]
+
+        # --- Funciones de Carga y Visualización ---
+        @st.cache_resource(show_spinner=False, max_entries=8)
+        def indexar_llamadas(path, version=None):
+            """Filtra las llamadas válidas y construye el índice id → fila una vez por versión del dataset.
+
+        El DataFrame se obtiene aquí dentro: en un rerun con el índice ya construido no se toca el dataset.
+        """
+            df = cargar_evaluaciones(path, version)
+            llamadas_validas = df[df['evaluacion_llamada_raw'].notna()].reset_index(drop=True)
+            llamadas_id = llamadas_validas['id_llamada_procesada'].dropna().tolist()
+            return llamadas_validas, llamadas_id, build_call_index(llamadas_validas)
+
+        def load_data(path, version=None):
+            """(llamadas válidas, ids, índice id → fila) del dataset o None si no se pudo cargar."""
+            try:
+                return indexar_llamadas(path, version)
+            except FileNotFoundError:
+                st.error(f"Error: No se encontró el archivo de datos en la ruta: {path}")
+                return None
+            except Exception as e:
+                st.error(f"Ocurrió un error inesperado al cargar los datos: {e}")
                 return None
-            return df
-        except FileNotFoundError:
-            st.error(f"Error: No se encontró el archivo de datos en la ruta: {path}")
-            return None
-        except Exception as e:
-            st.error(f"Ocurrió un error inesperado al cargar los datos: {e}")
-            return None
 
-    def mostrar_detalles_llamada(datos_llamada):
-        """Muestra solo ID, transcripción y el JSON de evaluación en dos columnas."""
-        # ID de la llamada
-        st.markdown(f"## 📞 ID Llamada: {datos_llamada.get('id_llamada_procesada', '-')}")
-        st.markdown("---")
+        def buscar_llamadas(dataset, path, consulta, ids_validos):
+            """Busca en transcripciones y evaluaciones con el índice BM25 persistido del dataset.
+
+        El índice se construye una vez por versión del archivo y se actualiza solo con lo que cambió.
+        """
+            resultados = get_evaluation_retriever(dataset, path).search_calls(consulta)
+            return [r for r in resultados if r.call_id in ids_validos]
+
+        def mostrar_resultados_busqueda(consulta, resultados, duracion_ms):
+            """Lista de llamadas encontradas, ordenadas por relevancia, con el fragmento que coincide."""
+            with st.expander(f"🔎 {len(resultados)} resultados para \"{consulta}\" ({duracion_ms:.0f} ms)", expanded=True):
+                for posicion, resultado in enumerate(resultados, start=1):
+                    st.markdown(f"**{posicion}. {resultado.call_id}** · relevancia {resultado.score:.2f}")
+                    st.caption(resultado.snippet)
+
+        def precargar_vecinos(llamadas_validas, fila, version):
+            """Precarga en segundo plano el audio de las llamadas anteriores y siguientes a la seleccionada.
+
+        Las evaluaciones ya vienen parseadas desde la carga, por lo que solo falta calentar el audio.
+        """
+            if 'id_original_path' not in llamadas_validas.columns:
+                return
+            if 'prefetch_owner' not in st.session_state:
+                st.session_state['prefetch_owner'] = uuid.uuid4().hex
+            rutas = llamadas_validas['id_original_path']
+            posiciones = neighbour_order(fila, len(llamadas_validas), AUDIO_PREFETCH_NEIGHBOURS)
+            uris = [rutas.iat[pos] for pos in posiciones if isinstance(rutas.iat[pos], str) and parse_gcs_uri(rutas.iat[pos])]
+            get_audio_prefetcher().prefetch(st.session_state['prefetch_owner'], version, uris)
+
+        def formatear_metrica(valor):
+            """Formatea una métrica numérica para st.metric ('N/A' si no existe)."""
+            if valor is None or pd.isna(valor):
+                return 'N/A'
+            return int(valor) if float(valor).is_integer() else round(float(valor), 2)
+
+        def mostrar_detalles_llamada(datos_llamada):
+            """Muestra solo ID, transcripción y el JSON de evaluación en dos columnas."""
+            # ID de la llamada
+            st.markdown(f"## 📞 ID Llamada: {datos_llamada.get('id_llamada_procesada', '-')}")
+            st.markdown("---")
+
+            # Transcripción y evaluación ya parseadas en la carga (ver normalize_evaluations)
+            transcripcion_texto = datos_llamada.get(TRANSCRIPT_FIELD) or "No disponible."
+            eval_dict = datos_llamada.get(DETAIL_FIELD) or {}
+
+            # --- MÉTRICAS DE PRECISIÓN Y DATOS CLAVE ---
+            st.subheader("📊 Métricas de Precisión y Datos Clave")
+
+            precision_cliente = formatear_metrica(datos_llamada.get('precision_error_critico_cliente'))
+            precision_negocio = formatear_metrica(datos_llamada.get('precision_error_critico_negocio'))
+            precision_cumplimiento = formatear_metrica(datos_llamada.get('precision_error_critico_cumplimiento'))
+            precision_no_critico = formatear_metrica(datos_llamada.get('precision_error_no_critico'))
+            precision_llamada = formatear_metrica(datos_llamada.get('precision_llamada'))
+
+            # Extraer datos adicionales
+            id_cliente = datos_llamada.get('celular', 'N/A')
+            fecha_llamada = datos_llamada.get('fecha_llamada', datos_llamada.get('fecha', 'N/A'))
+
+            # Mostrar métricas en columnas
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric(label="🎯 Precisión Total", value=f"{precision_llamada}%" if precision_llamada!='N/A' else 'N/A')
+                st.metric(label="👤 Error Crítico Cliente", value=precision_cliente)
+            with col2:
+                st.metric(label="💼 Error Crítico Negocio", value=precision_negocio)
+                st.metric(label="⚖️ Error Crítico Cumplimiento", value=precision_cumplimiento)
+            with col3:
+                st.metric(label="⚠️ Error No Crítico", value=precision_no_critico)
+                if id_cliente!='N/A': st.info(f"🆔 **ID Cliente:** {id_cliente}")
+                if fecha_llamada!='N/A': st.info(f"📅 **Fecha:** {fecha_llamada}")
+
+            st.markdown("---")
+            # Mostrar Audio y Transcripción
+            with st.container():
+                st.subheader("🔊 Audio de la llamada")
+                gcs_uri = datos_llamada.get('id_original_path')
+                if gcs_uri:
+                    # El navegador lee el audio por rangos (URL firmada o proxy local) si hay URL disponible
+                    url_audio = (
+                        audio_playback_url(gcs_uri)
+                        if parse_gcs_uri(gcs_uri) and AUDIO_PLAYBACK_MODE != 'bytes'
+                        else None
+                    )
+                    if url_audio:
+                        st.audio(url_audio, format='audio/mp3')
+                    elif parse_gcs_uri(gcs_uri):
+                        # Caché LRU compartida (memoria + disco): solo descarga si el audio no está local
+                        audio_bytes = get_audio_cache().get(gcs_uri)
+                        st.audio(audio_bytes, format='audio/mp3')
+                else:
+                    st.info("No hay ruta de audio disponible.")
+                st.subheader("📜 Transcripción de la llamada")
+                st.code(transcripcion_texto, language='text')
+
+            st.markdown("---")
+            # Mostrar Evaluación sin métricas ni transcripción
+            with st.container():
+                st.subheader("✅ Evaluación de Calidad (JSON)")
+                st.json(eval_dict)
+
+        # --- Lógica principal del Monitor de Evaluaciones ---
+        version_datos = version_dataset(DATA_PATH)
+        datos_llamadas = load_data(DATA_PATH, version_datos)
+
+        if datos_llamadas is not None:
+            llamadas_validas, llamadas_id, indice_llamadas = datos_llamadas
+
+            if not llamadas_id:
+                st.warning("No se encontraron llamadas procesadas correctamente en el archivo.")
+                st.sidebar.selectbox("🎧 Selecciona una llamada", ["No hay llamadas para mostrar"], disabled=True)
+            else:
+                # Búsqueda de texto completo: limita el selector a las llamadas encontradas
+                consulta = st.sidebar.text_input(
+                    "🔎 Buscar en transcripciones y evaluaciones",
+                    key=f"busqueda_{selected_dataset}",
+                    placeholder="Ej: cliente menciona otro banco",
+                ).strip()
+                resultados_busqueda = None
+                if consulta:
+                    inicio_busqueda = time.perf_counter()
+                    try:
+                        resultados_busqueda = buscar_llamadas(selected_dataset, DATA_PATH, consulta, indice_llamadas)
+                    except Exception as e:
+                        st.sidebar.warning(f"No se pudo ejecutar la búsqueda: {e}")
+                    duracion_busqueda_ms = (time.perf_counter() - inicio_busqueda) * 1000
+
+                if resultados_busqueda is not None:
+                    opciones_llamadas = [r.call_id for r in resultados_busqueda]
+                    if opciones_llamadas:
+                        mostrar_resultados_busqueda(consulta, resultados_busqueda, duracion_busqueda_ms)
+                    else:
+                        st.info(f"No se encontraron llamadas para \"{consulta}\".")
+                else:
+                    opciones_llamadas = llamadas_id
 
-        # Obtención de transcripción y evaluación
-        raw_eval = datos_llamada.get('evaluacion_llamada_raw') or datos_llamada.get('evaluacion_llamada')
-        transcripcion_texto = "No disponible."
-        eval_dict = {}
+                # Selector de llamada en el sidebar
+                llamada_seleccionada_id = st.sidebar.selectbox(
+                    "🎧 Selecciona una llamada", opciones_llamadas, disabled=not opciones_llamadas
+                )
 
-        # Parsear evaluación en dict
-        if isinstance(raw_eval, str):
-            try:
-                eval_dict = json.loads(raw_eval)
-                # Extraer transcripción del JSON de evaluación
-                if 'transcripcion' in eval_dict:
-                    transcripcion_texto = eval_dict['transcripcion']
-            except:
-                eval_dict = {"error": "Texto de evaluación no es JSON válido"}
-        elif isinstance(raw_eval, dict):
-            eval_dict = raw_eval
-            # Extraer transcripción del JSON de evaluación
-            if 'transcripcion' in eval_dict:
-                transcripcion_texto = eval_dict['transcripcion']
+                # Información adicional en el sidebar
+                st.sidebar.markdown("---")
+                st.sidebar.markdown("### 📊 Estadísticas")
+                st.sidebar.info(f"**Total de llamadas:** {len(llamadas_id)}")
+                st.sidebar.info(f"**Dataset actual:** {selected_dataset}")
+
+                # Mostrar contenido principal
+                if llamada_seleccionada_id:
+                    fila = indice_llamadas[llamada_seleccionada_id]
+                    # Calentar las llamadas vecinas mientras se muestra la actual
+                    if AUDIO_PLAYBACK_MODE == 'bytes':
+                        precargar_vecinos(llamadas_validas, fila, (DATA_PATH, version_datos))
+                    mostrar_detalles_llamada(llamadas_validas.iloc[fila])
+                else:
+                    st.info("⬅️ Selecciona una llamada de la lista para ver su análisis.")
         else:
-            eval_dict = {}
-
-        # --- MÉTRICAS DE PRECISIÓN Y DATOS CLAVE ---
-        st.subheader("📊 Métricas de Precisión y Datos Clave")
-
-        # Extraer métricas de precisión del JSON de evaluación
-        precision_cliente = eval_dict.get('precision_error_critico_cliente', 'N/A')
-        precision_negocio = eval_dict.get('precision_error_critico_negocio', 'N/A')
-        precision_cumplimiento = eval_dict.get('precision_error_critico_cumplimiento', 'N/A')
-        precision_no_critico = eval_dict.get('precision_error_no_critico', 'N/A')
-        precision_llamada = eval_dict.get('precision_llamada', 'N/A')
-
-        # Extraer datos adicionales
-        id_cliente = datos_llamada.get('celular', 'N/A')
-        fecha_llamada = datos_llamada.get('fecha_llamada', datos_llamada.get('fecha', 'N/A'))
-
-        # Mostrar métricas en columnas
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric(label="🎯 Precisión Total", value=f"{precision_llamada}%" if precision_llamada!='N/A' else 'N/A')
-            st.metric(label="👤 Error Crítico Cliente", value=precision_cliente)
-        with col2:
-            st.metric(label="💼 Error Crítico Negocio", value=precision_negocio)
-            st.metric(label="⚖️ Error Crítico Cumplimiento", value=precision_cumplimiento)
-        with col3:
-            st.metric(label="⚠️ Error No Crítico", value=precision_no_critico)
-            if id_cliente!='N/A': st.info(f"🆔 **ID Cliente:** {id_cliente}")
-            if fecha_llamada!='N/A': st.info(f"📅 **Fecha:** {fecha_llamada}")
+            st.sidebar.selectbox("🎧 Selecciona una llamada", ["Error al cargar datos"], disabled=True)
+            st.error("No se pudieron cargar los datos. Verifique la configuración.")
+
+    elif menu_option == "📉 Tablero de Calidad":
+
+        # --- Opciones específicas para el Tablero de Calidad ---
+        st.sidebar.markdown("### ⚙️ Configuración Tablero")
+        quality_file_options = {
+            "Servicios": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_servicios.json",
+            "Preferente": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_preferente.json",
+            "Retención": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_retencion.json",
+            "Bloqueos": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_bloqueos.json"
+        }
+        selected_dataset = st.sidebar.selectbox(
+            "📂 Seleccione tipo de evaluación", list(quality_file_options.keys()), key="quality_dataset"
+        )
+        DATA_PATH = quality_file_options[selected_dataset]
 
-        st.markdown("---")
-        # Mostrar Audio y Transcripción
-        with st.container():
-            st.subheader("🔊 Audio de la llamada")
-            gcs_uri = datos_llamada.get('id_original_path')
-            if gcs_uri:
-                match = re.match(r'gs://([^/]+)/(.+)', gcs_uri)
-                if match:
-                    bucket_name, blob_name = match.groups()
-                    client = storage.Client()
-                    bucket = client.bucket(bucket_name)
-                    blob = bucket.blob(blob_name)
-                    audio_bytes = blob.download_as_bytes()
-                    st.audio(audio_bytes, format='audio/mp3')
-            else:
-                st.info("No hay ruta de audio disponible.")
-            st.subheader("📜 Transcripción de la llamada")
-            st.code(transcripcion_texto, language='text')
+        @st.cache_data(show_spinner="Calculando métricas de calidad...", max_entries=8)
+        def calcular_metricas_calidad(path, version=None):
+            """Agregados de calidad del dataset, calculados una vez por versión del archivo.
 
-        st.markdown("---")
-        # Mostrar Evaluación sin métricas
-        eval_dict_sin_metricas = eval_dict.copy()
-        for metrica in ['precision_error_critico_cliente','precision_error_critico_negocio','precision_error_critico_cumplimiento','precision_error_no_critico','precision_llamada']:
-            eval_dict_sin_metricas.pop(metrica,None)
-        with st.container():
-            st.subheader("✅ Evaluación de Calidad (JSON)")
-            st.json(eval_dict_sin_metricas)
-
-    # --- Lógica principal del Monitor de Evaluaciones ---
-    df_resultados = load_data(DATA_PATH)
-
-    if df_resultados is not None:
-        llamadas_validas = df_resultados[df_resultados['evaluacion_llamada_raw'].notna()]
-        llamadas_id = llamadas_validas['id_llamada_procesada'].dropna().tolist()
-
-        if not llamadas_id:
-            st.warning("No se encontraron llamadas procesadas correctamente en el archivo.")
-            st.sidebar.selectbox("🎧 Selecciona una llamada", ["No hay llamadas para mostrar"], disabled=True)
-        else:
-            # Selector de llamada en el sidebar
-            llamada_seleccionada_id = st.sidebar.selectbox("🎧 Selecciona una llamada", llamadas_id)
-            
-            # Información adicional en el sidebar
-            st.sidebar.markdown("---")
-            st.sidebar.markdown("### 📊 Estadísticas")
-            st.sidebar.info(f"**Total de llamadas:** {len(llamadas_id)}")
-            st.sidebar.info(f"**Dataset actual:** {selected_dataset}")
-            
-            # Mostrar contenido principal
-            if llamada_seleccionada_id:
-                datos_llamada = llamadas_validas[llamadas_validas.id_llamada_procesada == llamada_seleccionada_id].iloc[0]
-                mostrar_detalles_llamada(datos_llamada)
-            else:
-                st.info("⬅️ Selecciona una llamada de la lista para ver su análisis.")
-    else:
-        st.sidebar.selectbox("🎧 Selecciona una llamada", ["Error al cargar datos"], disabled=True)
-        st.error("No se pudieron cargar los datos. Verifique la configuración.")
+        Reutiliza el DataFrame normalizado que comparte con el Monitor (cargar_evaluaciones).
+        `version` (tamaño, mtime) solo forma parte de la clave de caché para recalcular si el archivo cambia.
+        Devuelve el resumen y el tiempo total en milisegundos, incluida la carga si no estaba en memoria.
+        """
+            inicio = time.perf_counter()
+            resumen = compute_quality_summary(cargar_evaluaciones(path, version))
+            return resumen, (time.perf_counter() - inicio) * 1000
 
-elif menu_option == "🎤 Procesamiento de Audio":
-    
-    # --- Funciones para el procesamiento de audio ---
-    def upload_to_gcs(file_bytes, filename, bucket_name, blob_path):
-        """Sube un archivo a Google Cloud Storage y devuelve la URI de gs://"""
-        try:
-            client = storage.Client()
-            bucket = client.bucket(bucket_name)
-            blob = bucket.blob(blob_path)
-            
-            # Subir el archivo
-            blob.upload_from_string(file_bytes, content_type='audio/mpeg')
-            
-            # Retornar la URI de GCS
-            return f"gs://{bucket_name}/{blob_path}"
-        except Exception as e:
-            st.error(f"Error al subir archivo a GCS: {e}")
-            return None
+        def formatear_porcentaje(valor):
+            """Proporción 0-1 como porcentaje ('N/A' si no existe)."""
+            return 'N/A' if valor is None or pd.isna(valor) else f"{valor:.1%}"
+
+        def formatear_precision(valor):
+            """Precisión 0-100 con un decimal ('N/A' si no existe)."""
+            return 'N/A' if valor is None or pd.isna(valor) else f"{valor:.1f}%"
 
-    def process_audio_with_gemini(audio_uri):
-        """Procesa el audio usando el modelo Gemini-2.5-pro"""
+        st.header(f"📉 Tablero de Calidad · {selected_dataset}")
         try:
-            # Configurar cliente de Gemini
-            client = genai.Client(vertexai=True, project="augusta-bbog-dev-activo", location="global", 
-                                 http_options=types.HttpOptions(api_version="v1"))
-            
-            # Crear objeto Part desde la URI
-            audio_file_genai = types.Part.from_uri(file_uri=audio_uri, mime_type="audio/mpeg")
-            
-            # Prompt de transcripción
-            prompt_transcripcion = """
-            Rol: Eres un sistema de transcripción de alta fidelidad, especializado en entornos de call center complejos. Actúas como un "oído entrenado", capaz de discernir entre hablantes humanos, sistemas automáticos y ruidos relevantes.
-            
-            Tarea: Generar una transcripción y diarización ultra precisa del audio proporcionado, siguiendo estrictamente el protocolo de etiquetado definido, con formato de timecode.
-            
-            ---
-            
-            ### Protocolo de Transcripción Detallado ###
-            
-            **1. Identificación de Hablantes (Etiquetas obligatorias):**  
-            Usa **solo** las siguientes etiquetas al inicio de cada línea:
-            
-            - `Agente:` → Empleado del call center.  
-            - `Cliente:` → Persona que recibe o realiza la llamada.  
-            - `Sistema:` → Mensajes automáticos, música de espera, o voces del sistema telefónico.
-            
-            **2. Eventos de Audio y Ruido (Detección selectiva):**  
-            Tu foco es capturar únicamente los elementos que sean **relevantes para la interacción principal**.
-            
-            **Incluye los siguientes eventos usando corchetes `[]`:**
-            
-            - `[silencio prolongado]`:  
-              - **Este marcador solo debe usarse cuando exista un silencio real, continuo y no justificado de al menos 20 segundos.**  
-              - **NO marques pausas normales entre frases, respiraciones, búsquedas breves de información, o espacios de menos de 20 segundos.**  
-              - **Muchos sistemas cometen el error de etiquetar como "silencio" espacios naturales del habla: tú NO debes cometer ese error.**  
-              - Si tienes duda sobre si fue un silencio real y prolongado, **no lo marques**.
-            
-            - `[suspiro]`, `[sollozo]`, `[risa]`, `[tos]`: Reacciones físicas o emocionales audibles.
-            - `[tecleo de computador]`: Solo si es evidente y relevante.
-            - `[ininteligible]`: Cuando una palabra o frase no es comprensible.
-            - `[conversaciones de fondo]`: Si hay voces audibles que claramente no son parte de la conversación principal.
-            - `[transmite a encuesta]`: Si el agente lo indica explícitamente.
-            - `[superposición de voces]`: Cuando hay cruce simultáneo que impide entender lo dicho.
-            
-            **NO INCLUYAS:**
-            
-            - Ruidos lejanos o irrelevantes (tráfico, ambiente de oficina).
-            - Conversaciones de fondo **si no son comprensibles** o no interfieren en la conversación.
-            - Música o sonidos ambientales leves.
-            
-            ---
-            
-            ### 3. Reglas de Formato de Salida (Obligatorio):
-            
-            - Cada línea debe comenzar con el `timecode` entre corchetes `[MM:SS]`, seguido de la etiqueta (`Agente:`, `Cliente:`, `Sistema:`), un espacio y el texto.
-            - La transcripción debe ser literal, palabra por palabra, en español colombiano.
-            - No utilices formato Markdown.
-            - No incluyas resúmenes ni explicaciones.
-            - **NO transcribas contenido de personas de fondo. Si se escucha gente hablando, solo indica `[conversaciones de fondo]` si es claramente audible, sin incluir lo que dicen.**
-            - Si la llamada termina abruptamente sin despedida del agente, **asume que el cliente colgó.**
-            
-            ---
-            
-            ### Formato Esperado (Ejemplo literal):
-            
-            [00:01] Agente: Buenos días, le saluda Carlos del Banco de Bogotá. ¿Hablo con la señora Ana?
-            [00:04] Cliente: Sí, con ella.
-            [00:07] Agente: Señora Ana, el motivo de mi llamada es sobre su tarjeta de crédito. Permítame un momento mientras valido la información.
-            [00:11] Agente: [tecleo de computador]
-            [00:15] Sistema: Su llamada es importante para nosotros. Gracias por su paciencia. [música de espera suave]
-            [00:20] Cliente: [suspiro] Ok...
-            [00:25] [conversaciones de fondo]
-            [00:28] Agente: Gracias por la espera, señora Ana. Verifico que presenta una mora de...
-            [00:32] [superposición de voces]
-            [00:35] Cliente: Eh... sí, es que he tenido algunos problemas económicos.
-            [00:41] Agente: [transmite a encuesta] La remito a una breve encuesta...
-            
-            El audio corresponde a una llamada de cobranzas del Banco de Bogotá. Procede ahora con la transcripción del audio adjunto, aplicando **rigurosamente** las reglas anteriores.  
-            **Recuerda: marcar incorrectamente un silencio cuando no lo hay es un error crítico. Solo marca silencios prolongados reales de más de 20 segundos.**
-            """
-            
-            # Configuración para la generación
-            generate_content_config = types.GenerateContentConfig(
-                audio_timestamp=True,
-                temperature=0.7,
-                top_p=1,
-                thinking_config=types.ThinkingConfig(thinking_budget=-1)
-            )
-            
-            # Generar transcripción
-            respuesta_transcripcion = client.models.generate_content(
-                model='gemini-2.5-pro',
-                contents=[prompt_transcripcion, audio_file_genai], 
-                config=generate_content_config
-            )
-            
-            return respuesta_transcripcion.text
-            
+            resumen, duracion_ms = calcular_metricas_calidad(DATA_PATH, version_dataset(DATA_PATH))
+        except FileNotFoundError:
+            st.error(f"Error: No se encontró el archivo de datos en la ruta: {DATA_PATH}")
+            resumen = None
         except Exception as e:
-            st.error(f"Error al procesar audio con Gemini: {e}")
-            return None
+            st.error(f"Ocurrió un error inesperado al calcular las métricas: {e}")
+            resumen = None
+
+        if resumen is not None and resumen.evaluated_calls:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric(label="📞 Llamadas evaluadas", value=f"{resumen.evaluated_calls:,}", help=f"De {resumen.total_calls:,} registros")
+            with col2:
+                st.metric(label="🎯 Precisión media", value=formatear_precision(resumen.mean_precision))
+            with col3:
+                st.metric(label="📍 Precisión mediana", value=formatear_precision(resumen.median_precision))
+            with col4:
+                st.metric(label="🚨 Con error crítico", value=formatear_porcentaje(resumen.critical_error_rate))
+            st.caption(f"Datos y agregados calculados en {duracion_ms:.0f} ms y reutilizados mientras el archivo no cambie.")
+
+            st.markdown("---")
+            st.subheader("📊 Distribución y percentiles")
+            metrica = st.selectbox("Métrica", list(METRIC_LABELS.values()), key="quality_metric")
+            col_hist, col_pct = st.columns([3, 2])
+            with col_hist:
+                st.bar_chart(resumen.distributions[metrica], x_label="Precisión", y_label="Llamadas")
+            with col_pct:
+                st.dataframe(resumen.percentiles.round(1), use_container_width=True)
+
+            st.subheader("⚠️ Tasa de error por tipo")
+            st.bar_chart(resumen.error_rates.rename("Tasa de error"), y_label="Proporción de llamadas")
+
+            st.subheader("📅 Tendencia diaria")
+            if resumen.daily is not None and not resumen.daily.empty:
+                col_precision, col_volumen = st.columns(2)
+                with col_precision:
+                    st.line_chart(resumen.daily[["precision_media"]], y_label="Precisión media")
+                with col_volumen:
+                    st.line_chart(resumen.daily[["llamadas"]], y_label="Llamadas")
+                st.line_chart(resumen.daily[["tasa_error_critico"]], y_label="Tasa de error crítico")
+            else:
+                st.info("El dataset no tiene fechas de llamada ('fecha_llamada') para calcular tendencias.")
 
-    # --- Interfaz de usuario para procesamiento de audio ---
-    st.header("🎤 Procesamiento de Audio para Cobranzas")
-    st.markdown("---")
-    
-    # Información en el sidebar
-    st.sidebar.markdown("### ⚙️ Configuración")
-    st.sidebar.info("""
-    **Bucket GCS:** augusta-bbog-dev-sandbox  
+            st.subheader("🔻 Llamadas con menor precisión")
+            st.dataframe(resumen.worst_calls, use_container_width=True, hide_index=True)
+        elif resumen is not None:
+            st.warning("No se encontraron llamadas con métricas de precisión en el archivo.")
+
+    elif menu_option == "🎤 Procesamiento de Audio":
+
+        # --- Funciones para el procesamiento de audio ---
+        def upload_to_gcs(file_obj, filename, bucket_name, blob_path, size=None):
+            """Sube un archivo a Google Cloud Storage (por tramos, reanudable) y devuelve la URI de gs://"""
+            try:
+                return upload_audio(file_obj, bucket_name, blob_path, audio_mime_type(filename), size=size)
+            except Exception as e:
+                st.error(f"Error al subir archivo a GCS: {e}")
+                return None
+
+        def process_audio_with_gemini(audio_uri, mime_type="audio/mpeg"):
+            """Procesa el audio usando el modelo Gemini-2.5-pro"""
+            try:
+                return transcribe_audio(audio_uri, mime_type)
+            except Exception as e:
+                st.error(f"Error al procesar audio con Gemini: {e}")
+                return None
+
+        def procesar_lote(fuentes, max_subidas, max_transcripciones):
+            """Sube y transcribe varios audios en paralelo mostrando el avance de cada archivo."""
+            iconos = {"pendiente": "⏳", "subiendo": "📤", "transcribiendo": "🤖", "completado": "✅", "error": "❌"}
+            progreso = st.progress(0)
+            # Por posición en el lote: dos fuentes pueden tener el mismo nombre
+            filas = [st.empty() for _ in fuentes]
+            for fuente, fila in zip(fuentes, filas):
+                fila.text(f"{iconos['pendiente']} {fuente.name}: pendiente")
+
+            resultados = []
+            st.markdown("---")
+            st.subheader("📋 Resultados del Lote")
+            for evento in run_transcription_batch(fuentes, max_subidas, max_transcripciones):
+                detalle = evento.error if evento.stage == "error" else (evento.uri or "")
+                if evento.cached:
+                    detalle = f"(♻️ en caché) {detalle}"
+                filas[evento.index].text(f"{iconos[evento.stage]} {evento.name}: {evento.stage} {detalle}".rstrip())
+                if not evento.finished:
+                    continue
+                resultados.append(evento)
+                progreso.progress(len(resultados) / len(fuentes))
+                # Mostrar cada transcripción apenas termina
+                if evento.stage == "completado":
+                    with st.expander(f"📝 {evento.name} (#{evento.index + 1})", expanded=False):
+                        st.write(f"**URI en GCS:** `{evento.uri}`")
+                        st.code(evento.transcription, language='text')
+            return resultados
+
+        # --- Interfaz de usuario para procesamiento de audio ---
+        st.header("🎤 Procesamiento de Audio para Cobranzas")
+        st.markdown("---")
+
+        # Información en el sidebar
+        st.sidebar.markdown("### ⚙️ Configuración")
+        st.sidebar.info(f"""
+    **Bucket GCS:** {AUDIO_BUCKET}  
     **Ruta:** casos-uso/monitor-cobranzas/cobranzas-transcripcion/  
     **Modelo:** Gemini-2.5-pro
     """)
-    
-    # Instrucciones
-    st.info("""
+
+        # Instrucciones
+        st.info("""
     📋 **Instrucciones:**
     1. Sube un archivo de audio (formato MP3) de una llamada de cobranzas
     2. El archivo se guardará automáticamente en Google Cloud Storage
     3. Se procesará con el modelo Gemini-2.5-pro para generar la transcripción
     4. Podrás ver los resultados de la transcripción en tiempo real
     """)
-    
-    # Subida de archivo
-    uploaded_file = st.file_uploader(
-        "Selecciona un archivo de audio",
-        type=['mp3', 'wav', 'm4a'],
-        help="Formatos soportados: MP3, WAV, M4A"
-    )
-    
-    if uploaded_file is not None:
-        # Mostrar información del archivo
-        st.success(f"✅ Archivo cargado: {uploaded_file.name}")
-        st.write(f"**Tamaño:** {uploaded_file.size / 1024 / 1024:.2f} MB")
-        
-        # Reproducir audio
-        st.subheader("🔊 Reproducir Audio")
-        st.audio(uploaded_file, format='audio/mp3')
-        
-        # Botón para procesar
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            if st.button("🚀 Procesar Audio", type="primary", use_container_width=True):
-                # Crear nombre único para el archivo
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"audio_transcripcion_{timestamp}_{uploaded_file.name}"
-                blob_path = f"casos-uso/monitor-cobranzas/cobranzas-transcripcion/{filename}"
-                
-                # Mostrar progreso
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                # Paso 1: Subir a GCS
-                status_text.text("📤 Subiendo archivo a Google Cloud Storage...")
-                progress_bar.progress(25)
-                
-                # Leer bytes del archivo
-                file_bytes = uploaded_file.read()
-                
-                # Subir a GCS
-                audio_uri = upload_to_gcs(
-                    file_bytes, 
-                    filename, 
-                    "augusta-bbog-dev-sandbox", 
-                    blob_path
-                )
-                
-                if audio_uri:
-                    progress_bar.progress(50)
-                    status_text.text("✅ Archivo subido exitosamente a GCS")
-                    st.success(f"**URI generada:** `{audio_uri}`")
-                    
-                    # Paso 2: Procesar con Gemini
-                    status_text.text("🤖 Procesando audio con Gemini-2.5-pro...")
-                    progress_bar.progress(75)
-                    
-                    transcripcion = process_audio_with_gemini(audio_uri)
-                    
-                    if transcripcion:
-                        progress_bar.progress(100)
-                        status_text.text("✅ Procesamiento completado")
-                        
-                        # Mostrar resultados
-                        st.markdown("---")
-                        st.subheader("📋 Resultados de la Transcripción")
-                        
-                        # Información del procesamiento
-                        with st.expander("ℹ️ Información del Procesamiento", expanded=True):
-                            st.write(f"**Archivo:** {uploaded_file.name}")
-                            st.write(f"**URI en GCS:** `{audio_uri}`")
-                            st.write(f"**Fecha de procesamiento:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                        
-                        # Transcripción
-                        st.subheader("📝 Transcripción Generada")
-                        st.code(transcripcion, language='text')
-                        
-                        # Botón para descargar transcripción
+
+        modo_audio = st.radio(
+            "Modo de procesamiento",
+            ["📄 Archivo individual", "📦 Lote"],
+            horizontal=True,
+            key="audio_mode"
+        )
+
+        if modo_audio == "📦 Lote":
+            # --- Procesamiento por lotes ---
+            origen_lote = st.selectbox(
+                "Origen de los audios",
+                ["Subir varios archivos", "Directorio local", "Manifiesto (una ruta por línea)"],
+                key="batch_source"
+            )
+            fuentes = []
+            try:
+                if origen_lote == "Subir varios archivos":
+                    archivos = st.file_uploader(
+                        "Selecciona los archivos de audio",
+                        type=list(AUDIO_EXTENSIONS),
+                        accept_multiple_files=True,
+                        help="Formatos soportados: MP3, WAV, M4A"
+                    )
+                    fuentes = sources_from_uploads(archivos or [])
+                elif origen_lote == "Directorio local":
+                    directorio = st.text_input("Ruta del directorio con audios", key="batch_directory")
+                    if directorio:
+                        fuentes = sources_from_directory(directorio)
+                else:
+                    manifiesto = st.text_input("Ruta del manifiesto", key="batch_manifest")
+                    if manifiesto:
+                        fuentes = sources_from_manifest(manifiesto)
+            except OSError as e:
+                st.error(f"No se pudieron leer los audios: {e}")
+
+            col_subidas, col_transcripciones = st.columns(2)
+            with col_subidas:
+                max_subidas = st.slider("Subidas simultáneas", 1, 16, BATCH_UPLOAD_WORKERS, key="batch_uploads")
+            with col_transcripciones:
+                max_transcripciones = st.slider("Transcripciones simultáneas", 1, 16, BATCH_TRANSCRIPTION_WORKERS, key="batch_transcriptions")
+
+            if fuentes:
+                total_mb = sum(fuente.size for fuente in fuentes) / 1024 / 1024
+                st.success(f"✅ {len(fuentes)} archivos listos ({total_mb:.2f} MB)")
+                if st.button("🚀 Procesar Lote", type="primary", use_container_width=True):
+                    resultados = procesar_lote(fuentes, max_subidas, max_transcripciones)
+                    completados = [r for r in resultados if r.stage == "completado"]
+                    st.info(f"Procesados {len(completados)} de {len(resultados)} archivos.")
+                    if completados:
                         st.download_button(
-                            label="💾 Descargar Transcripción",
-                            data=transcripcion,
-                            file_name=f"transcripcion_{timestamp}.txt",
-                            mime="text/plain"
+                            label="💾 Descargar Transcripciones (JSON)",
+                            data=json.dumps(
+                                [{"archivo": r.name, "uri": r.uri, "transcripcion": r.transcription} for r in completados],
+                                ensure_ascii=False,
+                                indent=2
+                            ),
+                            file_name=f"transcripciones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                            mime="application/json"
                         )
-                        
-                        # Guardar en sesión para uso posterior
-                        st.session_state['last_transcription'] = {
-                            'filename': uploaded_file.name,
-                            'uri': audio_uri,
-                            'transcription': transcripcion,
-                            'timestamp': timestamp
-                        }
-                        
-                    else:
-                        progress_bar.progress(0)
-                        status_text.text("❌ Error en el procesamiento")
-                else:
-                    progress_bar.progress(0)
-                    status_text.text("❌ Error al subir archivo a GCS")
-    
-    # Mostrar historial si existe
-    if 'last_transcription' in st.session_state:
-        st.markdown("---")
-        st.subheader("📚 Última Transcripción Procesada")
-        
-        last = st.session_state['last_transcription']
-        with st.expander(f"📄 {last['filename']} - {last['timestamp']}", expanded=False):
-            st.write(f"**URI:** `{last['uri']}`")
-            st.code(last['transcription'], language='text')
-    else:
-        st.info("Aún no has procesado ningún audio en esta sesión.")
-
-elif menu_option == "💬 Chat Interactivo":
-    # Ejecutar sección de Chat Interactivo (modo 'chat')
-    # Selección de fuente de datos y límite de registros para el chat
-    st.sidebar.markdown("### ⚙️ Configuración Chat Interactivo")
-    chat_file_options = {
-        "Servicios": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_servicios.json",
-        "Preferente": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_preferente.json",
-        "Retención": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_retencion.json",
-        "Bloqueos": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_bloqueos.json"
-    }
-    selected_dataset = st.sidebar.selectbox(
-        "Fuente de datos",
-        options=list(chat_file_options.keys()),
-        index=0,
-        key="chat_dataset"
-    )
-    record_limit = st.sidebar.number_input(
-        "Límite de registros a usar",
-        min_value=1,
-        max_value=1000,
-        value=500,
-        step=50,
-        key="chat_limit"
-    )
-    # Pasar configuración al script v2
-    import os
-    globals()['MODE'] = 'chat'
-    globals()['CHAT_DATASET'] = selected_dataset
-    globals()['CHAT_LIMIT'] = record_limit
-    v2_path = os.path.join(os.path.dirname(__file__), 'chat_servicios_v2.py')
-    with open(v2_path, 'r', encoding='utf-8') as f:
-        exec(f.read(), globals())
-elif menu_option == "📊 Generador de Informes":
-    # Ejecutar sección de Generador de Informes (modo 'report')
-    # Selección de fuente de datos y límite de registros para el generador de informes
-    st.sidebar.markdown("### ⚙️ Configuración Generador de Informes")
-    report_file_options = {
-        "Servicios": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_servicios.json",
-        "Preferente": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_preferente.json",
-        "Retención": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_retencion.json",
-        "Bloqueos": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_bloqueos.json"
-    }
-    selected_report_dataset = st.sidebar.selectbox(
-        "Fuente de datos",
-        options=list(report_file_options.keys()),
-        index=0,
-        key="report_dataset"
-    )
-    report_limit = st.sidebar.number_input(
-        "Límite de registros a usar",
-        min_value=1,
-        max_value=1000,
-        value=500,
-        step=50,
-        key="report_limit"
-    )
-    # Pasar configuración al script v2
-    import os
-    globals()['MODE'] = 'report'
-    globals()['REPORT_DATASET'] = selected_report_dataset
-    globals()['REPORT_LIMIT'] = report_limit
-    v2_path = os.path.join(os.path.dirname(__file__), 'chat_servicios_v2.py')
-    with open(v2_path, 'r', encoding='utf-8') as f:
-        exec(f.read(), globals())
-elif menu_option == "📈 Reportes BI":
-    # Mostrar un iframe embebido con reporte BI en HTML
-    # Embed responsive Looker Studio report filling available width
-    iframe_url = "https://lookerstudio.google.com/embed/reporting/73cef5c2-3137-4031-aa01-b47b8cc65a3e/page/yJkVF"
-    # Sección de Reportes BI: iframe responsivo junto al menú lateral
-    iframe_url = "https://lookerstudio.google.com/embed/reporting/73cef5c2-3137-4031-aa01-b47b8cc65a3e/page/yJkVF"
-    # Crear iframe que ocupe el 100% del ancho del contenedor principal
-    html = f"""
+        else:
+            # Subida de archivo
+            uploaded_file = st.file_uploader(
+                "Selecciona un archivo de audio",
+                type=list(AUDIO_EXTENSIONS),
+                help="Formatos soportados: MP3, WAV, M4A"
+            )
+
+            if uploaded_file is not None:
+                # Mostrar información del archivo
+                st.success(f"✅ Archivo cargado: {uploaded_file.name}")
+                st.write(f"**Tamaño:** {uploaded_file.size / 1024 / 1024:.2f} MB")
+
+                # Reproducir audio
+                st.subheader("🔊 Reproducir Audio")
+                st.audio(uploaded_file, format='audio/mp3')
+
+                # Botón para procesar
+                col1, col2, col3 = st.columns([1, 2, 1])
+                with col2:
+                    if st.button("🚀 Procesar Audio", type="primary", use_container_width=True):
+                        # Crear nombre único para el archivo
+                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                        filename, blob_path = build_blob_path(uploaded_file.name, timestamp)
+
+                        # Mostrar progreso
+                        progress_bar = st.progress(0)
+                        status_text = st.empty()
+
+                        # Paso 0: Reutilizar la transcripción si este audio ya se procesó con la misma configuración
+                        clave_cache = transcription_cache_key(uploaded_file)
+                        en_cache = get_transcription_cache().get(clave_cache)
+
+                        if en_cache:
+                            audio_uri = en_cache['uri']
+                        else:
+                            # Paso 1: Subir a GCS
+                            status_text.text("📤 Subiendo archivo a Google Cloud Storage...")
+                            progress_bar.progress(25)
+
+                            # Subir a GCS directamente desde el archivo, sin copiarlo en memoria
+                            audio_uri = upload_to_gcs(
+                                uploaded_file,
+                                filename,
+                                AUDIO_BUCKET,
+                                blob_path,
+                                size=uploaded_file.size
+                            )
+
+                        if audio_uri:
+                            progress_bar.progress(50)
+                            if not en_cache:
+                                status_text.text("✅ Archivo subido exitosamente a GCS")
+                            st.success(f"**URI generada:** `{audio_uri}`")
+
+                            if en_cache:
+                                status_text.text("♻️ Audio ya transcrito: se reutiliza el resultado guardado")
+                                transcripcion = en_cache['transcription']
+                            else:
+                                # Paso 2: Procesar con Gemini
+                                status_text.text("🤖 Procesando audio con Gemini-2.5-pro...")
+                                progress_bar.progress(75)
+
+                                transcripcion = process_audio_with_gemini(audio_uri, audio_mime_type(uploaded_file.name))
+                                if transcripcion:
+                                    get_transcription_cache().put(clave_cache, {
+                                        'filename': uploaded_file.name,
+                                        'uri': audio_uri,
+                                        'transcription': transcripcion,
+                                        'model': TRANSCRIPTION_MODEL
+                                    })
+
+                            if transcripcion:
+                                progress_bar.progress(100)
+                                status_text.text("✅ Procesamiento completado")
+
+                                # Mostrar resultados
+                                st.markdown("---")
+                                st.subheader("📋 Resultados de la Transcripción")
+
+                                # Información del procesamiento
+                                with st.expander("ℹ️ Información del Procesamiento", expanded=True):
+                                    st.write(f"**Archivo:** {uploaded_file.name}")
+                                    st.write(f"**URI en GCS:** `{audio_uri}`")
+                                    st.write(f"**Fecha de procesamiento:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+                                # Transcripción
+                                st.subheader("📝 Transcripción Generada")
+                                st.code(transcripcion, language='text')
+
+                                # Botón para descargar transcripción
+                                st.download_button(
+                                    label="💾 Descargar Transcripción",
+                                    data=transcripcion,
+                                    file_name=f"transcripcion_{timestamp}.txt",
+                                    mime="text/plain"
+                                )
+
+                                # Guardar en sesión para uso posterior
+                                st.session_state['last_transcription'] = {
+                                    'filename': uploaded_file.name,
+                                    'uri': audio_uri,
+                                    'transcription': transcripcion,
+                                    'timestamp': timestamp
+                                }
+
+                            else:
+                                progress_bar.progress(0)
+                                status_text.text("❌ Error en el procesamiento")
+                        else:
+                            progress_bar.progress(0)
+                            status_text.text("❌ Error al subir archivo a GCS")
+
+
+        # Mostrar historial si existe
+        if 'last_transcription' in st.session_state:
+            st.markdown("---")
+            st.subheader("📚 Última Transcripción Procesada")
+
+            last = st.session_state['last_transcription']
+            with st.expander(f"📄 {last['filename']} - {last['timestamp']}", expanded=False):
+                st.write(f"**URI:** `{last['uri']}`")
+                st.code(last['transcription'], language='text')
+        else:
+            st.info("Aún no has procesado ningún audio en esta sesión.")
+
+    elif menu_option == "💬 Chat Interactivo":
+        # Sección de Chat Interactivo (modo 'chat')
+        # Selección de fuente de datos y límite de registros para el chat
+        st.sidebar.markdown("### ⚙️ Configuración Chat Interactivo")
+        chat_file_options = {
+            "Servicios": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_servicios.json",
+            "Preferente": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_preferente.json",
+            "Retención": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_retencion.json",
+            "Bloqueos": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_bloqueos.json"
+        }
+        selected_dataset = st.sidebar.selectbox(
+            "Fuente de datos",
+            options=list(chat_file_options.keys()),
+            index=0,
+            key="chat_dataset"
+        )
+        record_limit = st.sidebar.number_input(
+            "Límite de registros a usar",
+            min_value=1,
+            max_value=1000,
+            value=500,
+            step=50,
+            key="chat_limit"
+        )
+        # El módulo se importa una sola vez por proceso (cliente y preguntas incluidos)
+        from chat_servicios_v2 import render_chat_view
+        render_chat_view(
+            dataset_key=selected_dataset,
+            record_limit=record_limit,
+            allow_dataset_selector=False,
+        )
+    elif menu_option == "📊 Generador de Informes":
+        # Sección de Generador de Informes (modo 'report')
+        # Selección de fuente de datos y límite de registros para el generador de informes
+        st.sidebar.markdown("### ⚙️ Configuración Generador de Informes")
+        report_file_options = {
+            "Servicios": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_servicios.json",
+            "Preferente": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_preferente.json",
+            "Retención": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_retencion.json",
+            "Bloqueos": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_bloqueos.json"
+        }
+        selected_report_dataset = st.sidebar.selectbox(
+            "Fuente de datos",
+            options=list(report_file_options.keys()),
+            index=0,
+            key="report_dataset"
+        )
+        report_limit = st.sidebar.number_input(
+            "Límite de registros a usar",
+            min_value=1,
+            max_value=1000,
+            value=500,
+            step=50,
+            key="report_limit"
+        )
+        # El módulo se importa una sola vez por proceso (cliente y preguntas incluidos)
+        from chat_servicios_v2 import render_report_view
+        render_report_view(
+            dataset_key=selected_report_dataset,
+            record_limit=report_limit,
+            allow_dataset_selector=False,
+        )
+    elif menu_option == "📈 Reportes BI":
+        # Mostrar un iframe embebido con reporte BI en HTML
+        # Embed responsive Looker Studio report filling available width
+        iframe_url = "https://lookerstudio.google.com/embed/reporting/73cef5c2-3137-4031-aa01-b47b8cc65a3e/page/yJkVF"
+        # Sección de Reportes BI: iframe responsivo junto al menú lateral
+        iframe_url = "https://lookerstudio.google.com/embed/reporting/73cef5c2-3137-4031-aa01-b47b8cc65a3e/page/yJkVF"
+        # Crear iframe que ocupe el 100% del ancho del contenedor principal
+        html = f"""
         <iframe src="{iframe_url}" width="100%" height="1200" style="border:0;">
         </iframe>
     """
-    components.html(html, height=1200)
\ No newline at end of file
+        components.html(html, height=1200)
+
+
+    st.sidebar.markdown("---")
+    if st.sidebar.checkbox("⏱️ Mostrar tiempos de esta ejecución", value=TELEMETRY_PANEL, key="telemetry_panel"):
+        mostrar_panel_tiempos(list(spans_ejecucion), (time.perf_counter() - inicio_ejecucion) * 1000)
+finally:
+    # También se registra si la ejecución termina con st.rerun() o st.stop(), que se implementan como excepciones
+    record_span("app.rerun", (time.perf_counter() - inicio_ejecucion) * 1000, page=menu_option, spans=len(spans_ejecucion))
@@ -0,0 +1,397 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from evaluation_store import CACHE_DIR
+from gcp_clients import get_storage_client
+from telemetry import span
+
+# --- CONFIGURACIÓN DE LA CACHÉ DE AUDIO ---
+_MB = 1024 * 1024
+AUDIO_CACHE_DIR = os.environ.get("AUDITBOT_AUDIO_CACHE_DIR", os.path.join(CACHE_DIR, "audio"))
+AUDIO_MEMORY_BUDGET = int(os.environ.get("AUDITBOT_AUDIO_MEMORY_MB", "256")) * _MB
+AUDIO_DISK_BUDGET = int(os.environ.get("AUDITBOT_AUDIO_DISK_MB", "4096")) * _MB
+# Cada cuánto se confirma con GCS la generación vigente de una URI sin generación explícita
+AUDIO_GENERATION_TTL = int(os.environ.get("AUDITBOT_AUDIO_GENERATION_TTL_SECONDS", "300"))
+# Precarga de llamadas vecinas en el Monitor
+AUDIO_PREFETCH_NEIGHBOURS = int(os.environ.get("AUDITBOT_AUDIO_PREFETCH_NEIGHBOURS", "2"))
+AUDIO_PREFETCH_WORKERS = int(os.environ.get("AUDITBOT_AUDIO_PREFETCH_WORKERS", "4"))
+
+# gs://bucket/ruta/al/objeto.mp3 con generación opcional al final (#1234567890)
+GCS_URI_PATTERN = re.compile(r"gs://([^/]+)/([^#]+)(?:#(\d+))?$")
+
+
+def parse_gcs_uri(uri: str) -> Optional[Tuple[str, str, Optional[int]]]:
+    """Devuelve (bucket, blob, generación) de una URI gs:// o None si no es válida."""
+
+    match = GCS_URI_PATTERN.match(uri or "")
+    if not match:
+        return None
+    bucket_name, blob_name, generation = match.groups()
+    return bucket_name, blob_name, int(generation) if generation else None
+
+
+class AudioCache:
+    """LRU en memoria con presupuesto en bytes que se respalda en una caché local en disco.
+
+    Las entradas se identifican por URI de GCS y generación del objeto, de modo que
+    una nueva versión del audio nunca se sirve desde una copia obsoleta. Para las URI
+    sin generación, la vigente se revalida con una consulta de metadatos a GCS cuando
+    la conocida tiene más de `generation_ttl` segundos. Los archivos en
+    disco se listan una sola vez y luego se siguen en un índice en memoria (con su tamaño y
+    orden de uso), así que ni buscar ni desalojar un audio recorre el directorio ni hace
+    E/S bajo el candado.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int = AUDIO_MEMORY_BUDGET,
+        disk_dir: str = AUDIO_CACHE_DIR,
+        disk_budget: int = AUDIO_DISK_BUDGET,
+        client_factory: Callable = get_storage_client,
+        generation_ttl: float = AUDIO_GENERATION_TTL,
+    ):
+        self.memory_budget = memory_budget
+        self.disk_dir = disk_dir
+        self.disk_budget = disk_budget
+        self._client_factory = client_factory
+        self.generation_ttl = generation_ttl
+        self._client = None
+        self._memory: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        # URI sin generación -> (generación vigente, momento en que se confirmó con GCS)
+        self._latest_generation: Dict[str, Tuple[int, float]] = {}
+        # Huella de la URI -> {generación: ruta} de los archivos en disco; None hasta el primer uso
+        self._disk_index: Optional[Dict[str, Dict[int, str]]] = None
+        # Ruta -> tamaño de cada archivo en disco, del de uso menos reciente al más reciente
+        self._disk_files: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        # URI -> descarga en curso, compartida por todos los hilos que piden el mismo audio
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.RLock()
+
+    # --- Memoria ---
+    def _memory_get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            return data
+
+    def _memory_put(self, key, data: bytes) -> None:
+        if len(data) > self.memory_budget:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.memory_budget and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    # --- Disco ---
+    @staticmethod
+    def _uri_digest(uri: str) -> str:
+        return hashlib.sha256(uri.encode("utf-8")).hexdigest()[:32]
+
+    def _disk_path(self, uri: str, generation: int) -> str:
+        return os.path.join(self.disk_dir, f"{self._uri_digest(uri)}_{generation}.bin")
+
+    def _scan_disk(self) -> Tuple[Dict[str, Dict[int, str]], "OrderedDict[str, int]"]:
+        index: Dict[str, Dict[int, str]] = {}
+        found = []
+        try:
+            entries = list(os.scandir(self.disk_dir))
+        except FileNotFoundError:
+            return index, OrderedDict()
+        for entry in entries:
+            digest, _, generation = entry.name[:-len(".bin")].rpartition("_")
+            if not (entry.name.endswith(".bin") and digest and generation.isdigit()):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            index.setdefault(digest, {})[int(generation)] = entry.path
+            found.append((stat.st_mtime, entry.path, stat.st_size))
+        # El orden de uso inicial es el de modificación: lo más antiguo se desaloja primero
+        return index, OrderedDict((path, size) for _, path, size in sorted(found))
+
+    def _disk_entries(self) -> Dict[str, Dict[int, str]]:
+        """Índice de los archivos en disco; el directorio se recorre (fuera del candado) solo la primera vez."""
+
+        with self._lock:
+            if self._disk_index is not None:
+                return self._disk_index
+        index, files = self._scan_disk()
+        with self._lock:
+            if self._disk_index is None:
+                self._disk_index = index
+                self._disk_files = files
+                self._disk_bytes = sum(files.values())
+            return self._disk_index
+
+    def _disk_find(self, uri: str, generation: Optional[int]) -> Optional[Tuple[int, str]]:
+        index = self._disk_entries()
+        with self._lock:
+            generations = index.get(self._uri_digest(uri))
+            if not generations:
+                return None
+            if generation is None:
+                generation = max(generations)
+            path = generations.get(generation)
+        return (generation, path) if path is not None else None
+
+    def _disk_touch(self, path: str) -> None:
+        with self._lock:
+            if path in self._disk_files:
+                self._disk_files.move_to_end(path)
+
+    def _disk_forget(self, path: str) -> None:
+        digest, _, generation = os.path.basename(path)[:-len(".bin")].rpartition("_")
+        index = self._disk_entries()
+        with self._lock:
+            generations = index.get(digest, {})
+            if generation.isdigit() and generations.get(int(generation)) == path:
+                del generations[int(generation)]
+                if not generations:
+                    index.pop(digest, None)
+            self._disk_bytes -= self._disk_files.pop(path, 0)
+
+    def _disk_put(self, uri: str, generation: int, data: bytes) -> None:
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            path = self._disk_path(uri, generation)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # La caché en disco es opcional; un disco lleno no debe romper la reproducción
+            return
+        index = self._disk_entries()
+        with self._lock:
+            index.setdefault(self._uri_digest(uri), {})[generation] = path
+            self._disk_bytes += len(data) - self._disk_files.pop(path, 0)
+            self._disk_files[path] = len(data)
+        self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        """Borra los archivos de uso menos reciente hasta volver al presupuesto, sin listar el directorio."""
+
+        with self._lock:
+            victims = []
+            while self._disk_bytes > self.disk_budget and self._disk_files:
+                path, _ = next(iter(self._disk_files.items()))
+                self._disk_forget(path)
+                victims.append(path)
+        for path in victims:
+            try:
+                os.remove(path)
+            except OSError:
+                # Ya borrado por fuera: el índice quedó consistente de todas formas
+                continue
+
+    # --- GCS ---
+    def _storage_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def _download(self, bucket_name: str, blob_name: str, generation: Optional[int]) -> Tuple[int, bytes]:
+        with span("gcs.download", bucket=bucket_name) as current:
+            blob = self._storage_client().bucket(bucket_name).blob(blob_name, generation=generation)
+            data = blob.download_as_bytes()
+            current.set(bytes=len(data))
+        return int(blob.generation or generation or 0), data
+
+    def _current_generation(self, bucket_name: str, blob_name: str, base_uri: str) -> Optional[int]:
+        """Generación vigente de una URI sin generación; consulta GCS solo si la conocida venció."""
+
+        with self._lock:
+            known = self._latest_generation.get(base_uri)
+        if known is not None and time.time() - known[1] < self.generation_ttl:
+            return known[0]
+        if known is None and self._disk_find(base_uri, None) is None:
+            # Nada en caché que revalidar: la descarga trae la generación vigente
+            return None
+        try:
+            with span("gcs.reload", bucket=bucket_name):
+                blob = self._storage_client().bucket(bucket_name).blob(blob_name)
+                blob.reload()
+        except Exception:  # pylint: disable=broad-except
+            # Sin acceso a GCS se sigue sirviendo la copia conocida
+            return known[0] if known is not None else None
+        generation = int(blob.generation or 0)
+        with self._lock:
+            self._latest_generation[base_uri] = (generation, time.time())
+        return generation
+
+    def get(self, uri: str) -> bytes:
+        """Bytes del audio en `uri`; solo accede a la red si no está en memoria ni en disco.
+
+        Si otro hilo (p. ej. una precarga) ya está cargando la misma URI, se espera su
+        resultado en vez de descargarla de nuevo.
+        """
+
+        with self._lock:
+            future = self._inflight.get(uri)
+            leader = future is None
+            if leader:
+                future = self._inflight[uri] = Future()
+        if not leader:
+            return future.result()
+        try:
+            data = self._load(uri)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(uri, None)
+        future.set_result(data)
+        return data
+
+    def loading(self, uri: str) -> bool:
+        """Indica si hay una carga de `uri` en curso."""
+
+        with self._lock:
+            return uri in self._inflight
+
+    def _load(self, uri: str) -> bytes:
+        parsed = parse_gcs_uri(uri)
+        if parsed is None:
+            raise ValueError(f"URI de GCS inválida: {uri}")
+        bucket_name, blob_name, generation = parsed
+        base_uri = f"gs://{bucket_name}/{blob_name}"
+
+        pinned = generation is not None
+        if not pinned:
+            generation = self._current_generation(bucket_name, blob_name, base_uri)
+        if generation is not None:
+            data = self._memory_get((base_uri, generation))
+            if data is not None:
+                return data
+
+        found = self._disk_find(base_uri, generation)
+        if found is not None:
+            disk_generation, path = found
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                self._disk_touch(path)
+            except OSError:
+                # Borrado por fuera (u otro proceso): se olvida y se descarga de nuevo
+                self._disk_forget(path)
+                data = None
+            if data is not None:
+                self._memory_put((base_uri, disk_generation), data)
+                return data
+
+        disk_generation, data = self._download(bucket_name, blob_name, generation)
+        if not pinned:
+            with self._lock:
+                self._latest_generation[base_uri] = (disk_generation, time.time())
+        self._memory_put((base_uri, disk_generation), data)
+        self._disk_put(base_uri, disk_generation, data)
+        return data
+
+    def contains(self, uri: str) -> bool:
+        """Indica si el audio ya está disponible sin acceder a la red."""
+
+        parsed = parse_gcs_uri(uri)
+        if parsed is None:
+            return False
+        bucket_name, blob_name, generation = parsed
+        base_uri = f"gs://{bucket_name}/{blob_name}"
+        with self._lock:
+            if generation is None and base_uri in self._latest_generation:
+                generation = self._latest_generation[base_uri][0]
+            if generation is not None and (base_uri, generation) in self._memory:
+                return True
+        return self._disk_find(base_uri, generation) is not None
+
+
+_shared_cache: Optional[AudioCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_audio_cache() -> AudioCache:
+    """Instancia única de la caché de audio, compartida por todas las sesiones del proceso."""
+
+    global _shared_cache  # pylint: disable=global-statement
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = AudioCache()
+        return _shared_cache
+
+
+class AudioPrefetcher:
+    """Precarga audios en segundo plano con un pool de hilos acotado.
+
+    Cada sesión (`owner`) tiene su propio lote de precargas asociado a un `token`
+    (p. ej. dataset y versión); al cambiar el token se cancelan las pendientes.
+    """
+
+    def __init__(self, cache: AudioCache, max_workers: int = AUDIO_PREFETCH_WORKERS):
+        self._cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio-prefetch")
+        self._batches: Dict[str, Tuple[Hashable, List[Tuple[str, Future]]]] = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, owner: str, token: Hashable, uris: Iterable[str]) -> None:
+        """Encola la descarga de `uris` que aún no estén en caché ni en curso."""
+
+        with self._lock:
+            previous_token, batch = self._batches.get(owner, (token, []))
+            if previous_token != token:
+                for _, future in batch:
+                    future.cancel()
+                batch = []
+            batch = [(uri, future) for uri, future in batch if not future.done()]
+            queued = {uri for uri, _ in batch}
+
+            for uri in uris:
+                if uri in queued or self._cache.loading(uri) or self._cache.contains(uri):
+                    continue
+                batch.append((uri, self._executor.submit(self._cache.get, uri)))
+                queued.add(uri)
+
+            self._batches[owner] = (token, batch)
+            # Las sesiones cuyas precargas ya terminaron no necesitan seguir registradas
+            for other, (_, pending) in list(self._batches.items()):
+                if all(future.done() for _, future in pending):
+                    del self._batches[other]
+
+
+def neighbour_order(position: int, total: int, radius: int) -> List[int]:
+    """Posiciones vecinas ordenadas por cercanía, priorizando la siguiente llamada."""
+
+    order = []
+    for offset in range(1, radius + 1):
+        for candidate in (position + offset, position - offset):
+            if 0 <= candidate < total:
+                order.append(candidate)
+    return order
+
+
+_shared_prefetcher: Optional[AudioPrefetcher] = None
+
+
+def get_audio_prefetcher() -> AudioPrefetcher:
+    """Precargador único del proceso, asociado a la caché de audio compartida."""
+
+    global _shared_prefetcher  # pylint: disable=global-statement
+    cache = get_audio_cache()
+    with _shared_cache_lock:
+        if _shared_prefetcher is None:
+            _shared_prefetcher = AudioPrefetcher(cache)
+        return _shared_prefetcher
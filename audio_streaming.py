@@ -0,0 +1,255 @@
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from audio_cache import parse_gcs_uri
+from gcp_clients import get_storage_client
+from telemetry import span
+
+# --- CONFIGURACIÓN DE REPRODUCCIÓN ---
+# "bytes": descarga completa vía caché local (comportamiento original)
+# "signed_url": el navegador descarga directamente de GCS con una URL firmada
+# "proxy": el navegador pide rangos a un proxy local que los lee de GCS
+AUDIO_PLAYBACK_MODE = os.environ.get("AUDITBOT_AUDIO_PLAYBACK_MODE", "bytes").lower()
+AUDIO_URL_TTL = int(os.environ.get("AUDITBOT_AUDIO_URL_TTL_SECONDS", "900"))
+AUDIO_PROXY_HOST = os.environ.get("AUDITBOT_AUDIO_PROXY_HOST", "127.0.0.1")
+AUDIO_PROXY_PORT = int(os.environ.get("AUDITBOT_AUDIO_PROXY_PORT", "8765"))
+# URL con la que el navegador alcanza el proxy (p. ej. detrás de un balanceador, o
+# http://127.0.0.1:8765 si el navegador corre en la misma máquina). Es obligatoria: el proxy
+# escucha en loopback y un navegador remoto no lo alcanza, así que sin ella se usa el modo "bytes"
+AUDIO_PROXY_PUBLIC_URL = os.environ.get("AUDITBOT_AUDIO_PROXY_PUBLIC_URL")
+# Tiempo que el proxy reutiliza el tamaño y la generación de un audio sin consultar GCS
+AUDIO_PROXY_METADATA_TTL = int(os.environ.get("AUDITBOT_AUDIO_PROXY_METADATA_TTL_SECONDS", "300"))
+_METADATA_MAX_ENTRIES = 1024
+
+_RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def signed_audio_url(client, uri: str, ttl: int = AUDIO_URL_TTL) -> str:
+    """URL firmada V4 de corta duración para que el navegador lea el audio directo de GCS."""
+
+    bucket_name, blob_name, generation = parse_gcs_uri(uri)
+    blob = client.bucket(bucket_name).blob(blob_name, generation=generation)
+    expiration = timedelta(seconds=ttl)
+    try:
+        return blob.generate_signed_url(version="v4", expiration=expiration, method="GET")
+    except AttributeError:
+        # Credenciales sin llave privada (p. ej. GCE/Cloud Run): firmar vía IAM con el token de acceso
+        import google.auth.transport.requests  # pylint: disable=import-outside-toplevel
+
+        credentials = client._credentials  # pylint: disable=protected-access
+        credentials.refresh(google.auth.transport.requests.Request())
+        return blob.generate_signed_url(
+            version="v4",
+            expiration=expiration,
+            method="GET",
+            service_account_email=credentials.service_account_email,
+            access_token=credentials.token,
+        )
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Interpreta un encabezado Range de un solo tramo; devuelve (inicio, fin) inclusivos."""
+
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    start_text, end_text = match.groups()
+    if not start_text:
+        # Sufijo: "bytes=-N" son los últimos N bytes
+        if not end_text:
+            return None
+        length = min(int(end_text), size)
+        return size - length, size - 1
+    start = int(start_text)
+    end = min(int(end_text), size - 1) if end_text else size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+class _StreamWriter:
+    """Archivo de solo escritura sobre la respuesta HTTP, para que GCS descargue directo al socket."""
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+    def write(self, data: bytes) -> int:
+        self._wfile.write(data)
+        return len(data)
+
+
+class AudioProxy:
+    """Proxy HTTP local con soporte de Range que transmite audios de GCS.
+
+    Cada petición es una sola descarga por rango que se escribe en la respuesta a medida que llega;
+    el tamaño y la generación de cada audio se reutilizan durante AUDIO_PROXY_METADATA_TTL.
+    Las URLs se firman con HMAC y expiran, así que el proxy no queda abierto a rutas arbitrarias.
+    """
+
+    def __init__(self, client, host: str = AUDIO_PROXY_HOST, port: int = AUDIO_PROXY_PORT, public_url: Optional[str] = None):
+        self.client = client
+        self._secret = secrets.token_bytes(32)
+        self._metadata: Dict[str, Tuple[float, int, Optional[str], Optional[int]]] = {}
+        self._metadata_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        bound_host, bound_port = self._server.server_address[:2]
+        self.public_url = (public_url or f"http://{bound_host}:{bound_port}").rstrip("/")
+        self._thread = threading.Thread(target=self._server.serve_forever, name="audio-proxy", daemon=True)
+        self._thread.start()
+
+    def _signature(self, uri: str, expires: int) -> str:
+        return hmac.new(self._secret, f"{uri}|{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def url_for(self, uri: str, ttl: int = AUDIO_URL_TTL) -> str:
+        expires = int(time.time()) + ttl
+        query = urlencode({"uri": uri, "expires": expires, "sig": self._signature(uri, expires)})
+        return f"{self.public_url}/audio?{query}"
+
+    def verify(self, uri: str, expires: str, signature: str) -> bool:
+        try:
+            expires_at = int(expires)
+        except ValueError:
+            return False
+        if expires_at < time.time():
+            return False
+        return hmac.compare_digest(self._signature(uri, expires_at), signature)
+
+    def metadata(self, uri: str) -> Tuple[int, Optional[str], Optional[int]]:
+        """(tamaño, content_type, generación) del audio, con una sola consulta a GCS por TTL."""
+
+        now = time.time()
+        with self._metadata_lock:
+            cached = self._metadata.get(uri)
+        if cached is not None and cached[0] > now:
+            return cached[1:]
+
+        bucket_name, blob_name, generation = parse_gcs_uri(uri)
+        blob = self.client.bucket(bucket_name).blob(blob_name, generation=generation)
+        with span("gcs.reload", bucket=bucket_name):
+            blob.reload()
+        entry = (now + AUDIO_PROXY_METADATA_TTL, int(blob.size or 0), blob.content_type, blob.generation)
+        with self._metadata_lock:
+            if len(self._metadata) >= _METADATA_MAX_ENTRIES:
+                self._metadata.clear()
+            self._metadata[uri] = entry
+        return entry[1:]
+
+    def forget(self, uri: str) -> None:
+        with self._metadata_lock:
+            self._metadata.pop(uri, None)
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        proxy = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                return
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                request = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(request.query).items()}
+                uri = params.get("uri", "")
+                if request.path != "/audio" or not parse_gcs_uri(uri):
+                    self.send_error(404)
+                    return
+                if not proxy.verify(uri, params.get("expires", ""), params.get("sig", "")):
+                    self.send_error(403, "URL vencida o inválida")
+                    return
+
+                try:
+                    size, content_type, generation = proxy.metadata(uri)
+                except Exception:  # pylint: disable=broad-except
+                    self.send_error(404)
+                    return
+
+                byte_range = parse_range(self.headers.get("Range"), size)
+                if self.headers.get("Range") and byte_range is None:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.end_headers()
+                    return
+                start, end = byte_range or (0, size - 1)
+
+                self.send_response(206 if byte_range else 200)
+                self.send_header("Content-Type", content_type or "audio/mpeg")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(max(end - start + 1, 0)))
+                if byte_range:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                self.end_headers()
+                if end < start:
+                    return
+
+                # La generación fijada garantiza que los bytes correspondan al tamaño anunciado
+                bucket_name, blob_name, _ = parse_gcs_uri(uri)
+                blob = proxy.client.bucket(bucket_name).blob(blob_name, generation=generation)
+                try:
+                    with span("gcs.download_range", bucket=bucket_name, bytes=end - start + 1):
+                        blob.download_to_file(_StreamWriter(self.wfile), start=start, end=end)
+                except (BrokenPipeError, ConnectionResetError):
+                    # El navegador canceló la petición (p. ej. al hacer seek)
+                    return
+                except Exception:  # pylint: disable=broad-except
+                    # El audio cambió o desapareció: la próxima petición vuelve a consultar GCS
+                    proxy.forget(uri)
+                    self.close_connection = True
+
+        return _Handler
+
+
+_proxy: Optional[AudioProxy] = None
+_lock = threading.Lock()
+
+
+def get_audio_proxy() -> Optional[AudioProxy]:
+    """Proxy único del proceso; se inicia en el primer uso.
+
+    Devuelve None si no hay AUDITBOT_AUDIO_PROXY_PUBLIC_URL o si el puerto no está disponible
+    (p. ej. otro proceso de la app ya lo ocupa); el llamador vuelve entonces al modo "bytes".
+    """
+
+    global _proxy  # pylint: disable=global-statement
+    if not AUDIO_PROXY_PUBLIC_URL:
+        return None
+    client = get_storage_client()
+    with _lock:
+        if _proxy is None:
+            try:
+                _proxy = AudioProxy(client, public_url=AUDIO_PROXY_PUBLIC_URL)
+            except OSError:
+                return None
+        return _proxy
+
+
+def audio_playback_url(uri: str, mode: str = AUDIO_PLAYBACK_MODE) -> Optional[str]:
+    """URL de reproducción para `uri` según el modo; si no se puede firmar, usa el proxy.
+
+    None indica que no hay URL posible y que el audio debe enviarse como bytes.
+    """
+
+    if mode == "signed_url":
+        try:
+            url = signed_audio_url(get_storage_client(), uri)
+            # El bucket local devuelve file://, que el navegador no puede reproducir
+            if url.startswith("http"):
+                return url
+        except Exception:  # pylint: disable=broad-except
+            pass
+    proxy = get_audio_proxy()
+    return proxy.url_for(uri) if proxy is not None else None
@@ -0,0 +1,344 @@
+import contextlib
+import io
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from queue import Queue
+from typing import Callable, ContextManager, Iterable, Iterator, List, Optional, Tuple
+
+from google.genai import types
+
+from gcp_clients import get_genai_client, get_storage_client, model_call_slot
+from telemetry import record_usage, span
+from transcription_cache import audio_digest, config_digest, get_transcription_cache
+
+# --- CONFIGURACIÓN DE TRANSCRIPCIÓN ---
+AUDIO_BUCKET = "augusta-bbog-dev-sandbox"
+AUDIO_PREFIX = "casos-uso/monitor-cobranzas/cobranzas-transcripcion/"
+TRANSCRIPTION_MODEL = "gemini-2.5-pro"
+AUDIO_EXTENSIONS = ("mp3", "wav", "m4a")
+_MIME_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav", "m4a": "audio/mp4"}
+
+# Subida reanudable por tramos: GCS exige múltiplos de 256 KiB
+_UPLOAD_CHUNK_UNIT = 256 * 1024
+UPLOAD_CHUNK_SIZE = max(
+    _UPLOAD_CHUNK_UNIT,
+    int(float(os.environ.get("AUDITBOT_UPLOAD_CHUNK_MB", "8")) * 1024 * 1024) // _UPLOAD_CHUNK_UNIT * _UPLOAD_CHUNK_UNIT,
+)
+# Tiempo máximo total de reintentos de un tramo fallido
+UPLOAD_RETRY_TIMEOUT = float(os.environ.get("AUDITBOT_UPLOAD_RETRY_SECONDS", "300"))
+
+# Concurrencia por defecto del modo lote
+BATCH_UPLOAD_WORKERS = int(os.environ.get("AUDITBOT_BATCH_UPLOAD_WORKERS", "4"))
+BATCH_TRANSCRIPTION_WORKERS = int(os.environ.get("AUDITBOT_BATCH_TRANSCRIPTION_WORKERS", "4"))
+
+TRANSCRIPTION_PROMPT = """
+            Rol: Eres un sistema de transcripción de alta fidelidad, especializado en entornos de call center complejos. Actúas como un "oído entrenado", capaz de discernir entre hablantes humanos, sistemas automáticos y ruidos relevantes.
+            
+            Tarea: Generar una transcripción y diarización ultra precisa del audio proporcionado, siguiendo estrictamente el protocolo de etiquetado definido, con formato de timecode.
+            
+            ---
+            
+            ### Protocolo de Transcripción Detallado ###
+            
+            **1. Identificación de Hablantes (Etiquetas obligatorias):**  
+            Usa **solo** las siguientes etiquetas al inicio de cada línea:
+            
+            - `Agente:` → Empleado del call center.  
+            - `Cliente:` → Persona que recibe o realiza la llamada.  
+            - `Sistema:` → Mensajes automáticos, música de espera, o voces del sistema telefónico.
+            
+            **2. Eventos de Audio y Ruido (Detección selectiva):**  
+            Tu foco es capturar únicamente los elementos que sean **relevantes para la interacción principal**.
+            
+            **Incluye los siguientes eventos usando corchetes `[]`:**
+            
+            - `[silencio prolongado]`:  
+              - **Este marcador solo debe usarse cuando exista un silencio real, continuo y no justificado de al menos 20 segundos.**  
+              - **NO marques pausas normales entre frases, respiraciones, búsquedas breves de información, o espacios de menos de 20 segundos.**  
+              - **Muchos sistemas cometen el error de etiquetar como "silencio" espacios naturales del habla: tú NO debes cometer ese error.**  
+              - Si tienes duda sobre si fue un silencio real y prolongado, **no lo marques**.
+            
+            - `[suspiro]`, `[sollozo]`, `[risa]`, `[tos]`: Reacciones físicas o emocionales audibles.
+            - `[tecleo de computador]`: Solo si es evidente y relevante.
+            - `[ininteligible]`: Cuando una palabra o frase no es comprensible.
+            - `[conversaciones de fondo]`: Si hay voces audibles que claramente no son parte de la conversación principal.
+            - `[transmite a encuesta]`: Si el agente lo indica explícitamente.
+            - `[superposición de voces]`: Cuando hay cruce simultáneo que impide entender lo dicho.
+            
+            **NO INCLUYAS:**
+            
+            - Ruidos lejanos o irrelevantes (tráfico, ambiente de oficina).
+            - Conversaciones de fondo **si no son comprensibles** o no interfieren en la conversación.
+            - Música o sonidos ambientales leves.
+            
+            ---
+            
+            ### 3. Reglas de Formato de Salida (Obligatorio):
+            
+            - Cada línea debe comenzar con el `timecode` entre corchetes `[MM:SS]`, seguido de la etiqueta (`Agente:`, `Cliente:`, `Sistema:`), un espacio y el texto.
+            - La transcripción debe ser literal, palabra por palabra, en español colombiano.
+            - No utilices formato Markdown.
+            - No incluyas resúmenes ni explicaciones.
+            - **NO transcribas contenido de personas de fondo. Si se escucha gente hablando, solo indica `[conversaciones de fondo]` si es claramente audible, sin incluir lo que dicen.**
+            - Si la llamada termina abruptamente sin despedida del agente, **asume que el cliente colgó.**
+            
+            ---
+            
+            ### Formato Esperado (Ejemplo literal):
+            
+            [00:01] Agente: Buenos días, le saluda Carlos del Banco de Bogotá. ¿Hablo con la señora Ana?
+            [00:04] Cliente: Sí, con ella.
+            [00:07] Agente: Señora Ana, el motivo de mi llamada es sobre su tarjeta de crédito. Permítame un momento mientras valido la información.
+            [00:11] Agente: [tecleo de computador]
+            [00:15] Sistema: Su llamada es importante para nosotros. Gracias por su paciencia. [música de espera suave]
+            [00:20] Cliente: [suspiro] Ok...
+            [00:25] [conversaciones de fondo]
+            [00:28] Agente: Gracias por la espera, señora Ana. Verifico que presenta una mora de...
+            [00:32] [superposición de voces]
+            [00:35] Cliente: Eh... sí, es que he tenido algunos problemas económicos.
+            [00:41] Agente: [transmite a encuesta] La remito a una breve encuesta...
+            
+            El audio corresponde a una llamada de cobranzas del Banco de Bogotá. Procede ahora con la transcripción del audio adjunto, aplicando **rigurosamente** las reglas anteriores.  
+            **Recuerda: marcar incorrectamente un silencio cuando no lo hay es un error crítico. Solo marca silencios prolongados reales de más de 20 segundos.**
+            """
+
+
+def transcription_config() -> types.GenerateContentConfig:
+    """Configuración de generación usada para transcribir."""
+
+    return types.GenerateContentConfig(
+        audio_timestamp=True,
+        temperature=0.7,
+        top_p=1,
+        thinking_config=types.ThinkingConfig(thinking_budget=-1),
+    )
+
+
+def transcription_cache_key(file_obj) -> str:
+    """Clave de caché: SHA-256 del audio más la huella del prompt, el modelo y la configuración."""
+
+    config = transcription_config().model_dump(mode="json", exclude_none=True)
+    return f"{audio_digest(file_obj)}-{config_digest(TRANSCRIPTION_PROMPT, TRANSCRIPTION_MODEL, config)[:16]}"
+
+
+def audio_mime_type(filename: str) -> str:
+    """Tipo MIME según la extensión del archivo (MP3 por defecto)."""
+
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    return _MIME_TYPES.get(extension, "audio/mpeg")
+
+
+def build_blob_path(original_name: str, timestamp: Optional[str] = None) -> Tuple[str, str]:
+    """Nombre único del archivo y ruta del blob en el bucket de transcripciones.
+
+    El sufijo aleatorio evita que dos audios con el mismo nombre (p. ej. `a/llamada.mp3` y
+    `b/llamada.mp3` en un lote, o dos sesiones en el mismo segundo) se pisen en el bucket.
+    """
+
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"audio_transcripcion_{timestamp}_{uuid.uuid4().hex[:8]}_{os.path.basename(original_name)}"
+    return filename, f"{AUDIO_PREFIX}{filename}"
+
+
+def upload_audio(
+    file_obj,
+    bucket_name: str,
+    blob_path: str,
+    content_type: str = "audio/mpeg",
+    size: Optional[int] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> str:
+    """Sube el audio a GCS por tramos con una sesión reanudable y devuelve su URI gs://.
+
+    `file_obj` es un archivo binario (también se aceptan bytes). Cada tramo fallido se
+    reintenta sobre la misma sesión, sin reiniciar la transferencia. Propaga cualquier error.
+    """
+
+    if isinstance(file_obj, (bytes, bytearray)):
+        size = len(file_obj) if size is None else size
+        file_obj = io.BytesIO(file_obj)
+
+    from google.cloud.storage.retry import DEFAULT_RETRY  # pylint: disable=import-outside-toplevel
+
+    client = get_storage_client()
+    blob = client.bucket(bucket_name).blob(blob_path, chunk_size=chunk_size)
+    with span("gcs.upload", bucket=bucket_name, bytes=size):
+        blob.upload_from_file(
+            file_obj,
+            rewind=True,
+            size=size,
+            content_type=content_type,
+            # Reintentar aunque no haya precondición de generación: build_blob_path da nombres únicos
+            retry=DEFAULT_RETRY.with_timeout(UPLOAD_RETRY_TIMEOUT),
+        )
+    return f"gs://{bucket_name}/{blob_path}"
+
+
+def transcribe_audio(audio_uri: str, mime_type: str = "audio/mpeg") -> str:
+    """Transcribe el audio en `audio_uri` con Gemini. Propaga cualquier error."""
+
+    client = get_genai_client()
+    audio_part = types.Part.from_uri(file_uri=audio_uri, mime_type=mime_type)
+    with model_call_slot(), span("gemini.transcribe", model=TRANSCRIPTION_MODEL) as current:
+        response = client.models.generate_content(
+            model=TRANSCRIPTION_MODEL,
+            contents=[TRANSCRIPTION_PROMPT, audio_part],
+            config=transcription_config(),
+        )
+        record_usage(current, response)
+    return response.text
+
+
+# --- MODO LOTE ---
+@dataclass
+class AudioSource:
+    """Audio pendiente de procesar: nombre visible, tamaño y cómo abrirlo.
+
+    `opener` devuelve un context manager que entrega un archivo binario legible.
+    """
+
+    name: str
+    size: int
+    opener: Callable[[], ContextManager]
+
+
+@dataclass
+class BatchEvent:
+    """Avance de un archivo del lote: 'subiendo', 'transcribiendo', 'completado' o 'error'.
+
+    `index` es la posición de la fuente en el lote (los nombres pueden repetirse).
+    """
+
+    index: int
+    name: str
+    stage: str
+    uri: Optional[str] = None
+    transcription: Optional[str] = None
+    error: Optional[str] = None
+    cached: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in ("completado", "error")
+
+
+def sources_from_uploads(uploaded_files: Iterable) -> List[AudioSource]:
+    """Fuentes a partir de los archivos del `st.file_uploader` (modo múltiple)."""
+
+    sources = []
+    for uploaded in uploaded_files:
+        def _opener(uploaded=uploaded):
+            # No cerrar el archivo del uploader: Streamlit lo reutiliza entre reruns
+            uploaded.seek(0)
+            return contextlib.nullcontext(uploaded)
+
+        sources.append(AudioSource(uploaded.name, uploaded.size, _opener))
+    return sources
+
+
+def _source_from_path(path: str) -> AudioSource:
+    return AudioSource(os.path.basename(path), os.path.getsize(path), lambda: open(path, "rb"))
+
+
+def sources_from_directory(directory: str) -> List[AudioSource]:
+    """Fuentes con todos los audios soportados de un directorio local (no recursivo)."""
+
+    names = sorted(
+        name
+        for name in os.listdir(directory)
+        if name.lower().rsplit(".", 1)[-1] in AUDIO_EXTENSIONS and os.path.isfile(os.path.join(directory, name))
+    )
+    return [_source_from_path(os.path.join(directory, name)) for name in names]
+
+
+def sources_from_manifest(manifest_path: str) -> List[AudioSource]:
+    """Fuentes listadas en un manifiesto: una ruta local por línea (se ignoran vacías y '#')."""
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    sources = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = line.strip()
+            if not entry or entry.startswith("#"):
+                continue
+            sources.append(_source_from_path(os.path.join(base_dir, entry)))
+    return sources
+
+
+def run_transcription_batch(
+    sources: List[AudioSource],
+    upload_workers: int = BATCH_UPLOAD_WORKERS,
+    transcription_workers: int = BATCH_TRANSCRIPTION_WORKERS,
+    timestamp: Optional[str] = None,
+) -> Iterator[BatchEvent]:
+    """Sube y transcribe un lote en paralelo, emitiendo eventos a medida que avanza.
+
+    Las subidas y las transcripciones usan pools separados, de modo que un archivo
+    empieza a transcribirse apenas termina su subida mientras los demás siguen subiendo.
+    """
+
+    if not sources:
+        return
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    events: "Queue[BatchEvent]" = Queue()
+
+    cache = get_transcription_cache()
+
+    def _upload(index: int, source: AudioSource) -> Tuple[str, str, Optional[dict]]:
+        with source.opener() as file_obj:
+            # Audios ya transcritos con la misma configuración no se suben ni se transcriben de nuevo
+            key = transcription_cache_key(file_obj)
+            cached = cache.get(key)
+            if cached:
+                return key, cached["uri"], cached
+            events.put(BatchEvent(index, source.name, "subiendo"))
+            _, blob_path = build_blob_path(source.name, timestamp)
+            uri = upload_audio(file_obj, AUDIO_BUCKET, blob_path, audio_mime_type(source.name), size=source.size)
+        return key, uri, None
+
+    def _transcribe(index: int, source: AudioSource, key: str, uri: str) -> None:
+        try:
+            events.put(BatchEvent(index, source.name, "transcribiendo", uri=uri))
+            text = transcribe_audio(uri, audio_mime_type(source.name))
+            cache.put(key, {"filename": source.name, "uri": uri, "transcription": text, "model": TRANSCRIPTION_MODEL})
+            events.put(BatchEvent(index, source.name, "completado", uri=uri, transcription=text))
+        except Exception as exc:  # pylint: disable=broad-except
+            events.put(BatchEvent(index, source.name, "error", uri=uri, error=str(exc)))
+
+    # El pool de transcripciones envuelve al de subidas: al salir (también si el consumidor
+    # abandona el generador) se esperan primero las subidas, cuyos callbacks aún encolan transcripciones
+    with ThreadPoolExecutor(transcription_workers, thread_name_prefix="batch-transcribe") as transcriptions:
+        with ThreadPoolExecutor(upload_workers, thread_name_prefix="batch-upload") as uploads:
+
+            def _on_uploaded(index: int, source: AudioSource, future) -> None:
+                try:
+                    key, uri, cached = future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    events.put(BatchEvent(index, source.name, "error", error=str(exc)))
+                    return
+                if cached:
+                    events.put(
+                        BatchEvent(
+                            index, source.name, "completado", uri=uri, transcription=cached["transcription"], cached=True
+                        )
+                    )
+                    return
+                try:
+                    transcriptions.submit(_transcribe, index, source, key, uri)
+                except RuntimeError as exc:
+                    # El pool ya se cerró: el archivo queda subido pero sin transcribir
+                    events.put(BatchEvent(index, source.name, "error", uri=uri, error=str(exc)))
+
+            for index, source in enumerate(sources):
+                future = uploads.submit(_upload, index, source)
+                future.add_done_callback(lambda f, index=index, source=source: _on_uploaded(index, source, f))
+
+            pending = len(sources)
+            while pending:
+                event = events.get()
+                if event.finished:
+                    pending -= 1
+                yield event
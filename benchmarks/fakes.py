@@ -0,0 +1,150 @@
+"""Backends falsos de Gemini y GCS para medir sin red ni credenciales.
+
+El almacenamiento se resuelve con LocalStorageClient (igual que AUDITBOT_FAKE_GCS_DIR) y el
+modelo con FakeGenaiClient, que responde texto fijo tras una latencia configurable.
+"""
+
+import hashlib
+import itertools
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Iterator, List
+
+import numpy as np
+
+# Aproximación de tokens usada también por context_packer (≈4 caracteres por token)
+_CHARS_PER_TOKEN = 4
+_EMBEDDING_DIMENSIONS = 768
+
+
+def _contents_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    return "".join(item if isinstance(item, str) else str(item) for item in contents or [])
+
+
+def _response(text: str, prompt_chars: int, cached: bool) -> SimpleNamespace:
+    prompt_tokens = prompt_chars // _CHARS_PER_TOKEN
+    return SimpleNamespace(
+        text=text,
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=len(text) // _CHARS_PER_TOKEN,
+            cached_content_token_count=prompt_tokens if cached else None,
+        ),
+    )
+
+
+class _FakeModels:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self._owner = owner
+
+    def generate_content(self, model: str, contents, config=None, **_kwargs) -> SimpleNamespace:
+        prompt = _contents_text(contents)
+        self._owner.wait(len(prompt))
+        cached = bool(getattr(config, "cached_content", None))
+        return _response(self._owner.reply(model, prompt), len(prompt), cached)
+
+    def generate_content_stream(self, model: str, contents, config=None, **_kwargs) -> Iterator[SimpleNamespace]:
+        prompt = _contents_text(contents)
+        self._owner.wait(len(prompt))
+        text = self._owner.reply(model, prompt)
+        chunks = [text[start:start + 200] for start in range(0, len(text), 200)]
+        cached = bool(getattr(config, "cached_content", None))
+        for number, chunk in enumerate(chunks):
+            last = number == len(chunks) - 1
+            yield _response(chunk, len(prompt) if last else 0, cached)
+
+    def embed_content(self, model: str, contents: List[str], config=None, **_kwargs) -> SimpleNamespace:
+        self._owner.wait(sum(len(text) for text in contents))
+        return SimpleNamespace(
+            embeddings=[SimpleNamespace(values=_fake_embedding(text).tolist()) for text in contents]
+        )
+
+
+class _FakeCaches:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self._owner = owner
+        self._ids = itertools.count(1)
+
+    def create(self, model: str, config=None, **_kwargs) -> SimpleNamespace:
+        self._owner.wait(0)
+        return SimpleNamespace(name=f"cachedContents/bench-{next(self._ids)}", model=model)
+
+    def delete(self, name: str, **_kwargs) -> None:
+        return None
+
+
+def _fake_embedding(text: str) -> np.ndarray:
+    """Vector unitario determinista derivado del texto."""
+
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(_EMBEDDING_DIMENSIONS).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class FakeGenaiClient:
+    """Subconjunto de `genai.Client` usado por la app (models y caches), sin red.
+
+    Cada llamada espera `latency_ms` más `ms_per_1k_chars` por cada mil caracteres del prompt,
+    para que el costo de enviar contextos grandes se note en los tiempos. Cuenta las llamadas
+    y los caracteres enviados para incluirlos en el informe.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, ms_per_1k_chars: float = 0.0, reply_chars: int = 2000):
+        self.latency_ms = latency_ms
+        self.ms_per_1k_chars = ms_per_1k_chars
+        self.reply_chars = reply_chars
+        self.models = _FakeModels(self)
+        self.caches = _FakeCaches(self)
+        self.calls = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+
+    def wait(self, prompt_chars: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += prompt_chars
+        delay_ms = self.latency_ms + self.ms_per_1k_chars * prompt_chars / 1000
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def reply(self, model: str, prompt: str) -> str:
+        header = f"## Respuesta simulada ({model}, {len(prompt)} caracteres de prompt)\n\n"
+        body = "Hallazgo: los clientes valoran la agilidad y la solución en el primer contacto. "
+        return header + (body * (self.reply_chars // len(body) + 1))[: self.reply_chars]
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.prompt_chars = 0
+
+
+def install_fake_backends(gcs_dir: str, genai_client: FakeGenaiClient) -> None:
+    """Reemplaza los clientes compartidos de gcp_clients por los falsos para todo el proceso."""
+
+    import gcp_clients  # pylint: disable=import-outside-toplevel
+    from local_storage import LocalStorageClient  # pylint: disable=import-outside-toplevel
+
+    with gcp_clients._lock:  # pylint: disable=protected-access
+        clients = gcp_clients._clients  # pylint: disable=protected-access
+        clients["genai:vertex"] = genai_client
+        clients["genai:env"] = genai_client
+        clients["storage"] = LocalStorageClient(gcs_dir)
+
+
+def write_fake_audio(gcs_dir: str, uris: List[str], size_bytes: int) -> None:
+    """Crea en el bucket local los audios de `uris` (gs://bucket/ruta) con bytes de relleno."""
+
+    payload = os.urandom(min(size_bytes, 1 << 16))
+    for uri in uris:
+        bucket, _, name = uri[len("gs://"):].partition("/")
+        path = os.path.join(gcs_dir, bucket, name)
+        if os.path.exists(path) and os.path.getsize(path) == size_bytes:
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            for written in range(0, size_bytes, len(payload)):
+                f.write(payload[: min(len(payload), size_bytes - written)])
@@ -0,0 +1,439 @@
+"""Benchmarks de carga de datos, construcción de contexto y búsqueda sobre datasets sintéticos.
+
+Mide tiempo (mediana de varias repeticiones) y pico de memoria (tracemalloc, en una pasada
+aparte para no distorsionar los tiempos) de los cargadores del Monitor y del chat, el índice
+de llamadas, el empaquetado de contexto, la búsqueda BM25, el tablero de calidad, los informes
+y la caché de audio. Gemini y GCS se reemplazan por backends falsos (ver fakes.py).
+
+Uso:
+    python -m benchmarks.run_benchmarks --sizes 1000,10000,100000
+    python -m benchmarks.run_benchmarks --sizes 1000000 --repeat 1
+    python -m benchmarks.run_benchmarks --baseline benchmarks/results/base.json --tolerance 0.25
+
+El informe JSON incluye entorno, commit y resultados por caso y tamaño. Con --baseline se
+compara contra un informe anterior y el proceso termina con código 1 si algo empeoró.
+"""
+
+import argparse
+import gc
+import json
+import os
+import pickle
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.fakes import FakeGenaiClient, install_fake_backends, write_fake_audio
+from benchmarks.synthetic_data import DATASETS, ensure_dataset
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_WORK_DIR = os.path.join(tempfile.gettempdir(), "auditbot-bench")
+# Consultas del Monitor usadas para medir la búsqueda
+SEARCH_QUERIES = ("cobro no reconocido", "bloquear tarjeta robo", "tasa competencia cancelar")
+CALL_LOOKUPS = 1000
+AUDIO_FILES = 20
+AUDIO_FILE_BYTES = 1 << 20
+# Diferencias menores a estas no cuentan como regresión aunque superen la tolerancia relativa
+MIN_REGRESSION_MS = 5.0
+MIN_REGRESSION_MB = 1.0
+
+
+@dataclass
+class CaseResult:
+    """Resultado de un caso para un tamaño de dataset."""
+
+    case: str
+    rows: Optional[int]
+    repeat: int
+    median_ms: float
+    min_ms: float
+    max_ms: float
+    peak_mb: Optional[float] = None
+    extra: dict = field(default_factory=dict)
+
+
+@dataclass
+class Case:
+    """Función medida; `setup` se ejecuta antes de cada repetición, fuera del tiempo medido."""
+
+    name: str
+    run: Callable[[], Optional[dict]]
+    setup: Callable[[], None] = lambda: None
+
+
+def _configure_environment(work_dir: str) -> None:
+    """Aísla cachés, índices y bucket en `work_dir`; debe ejecutarse antes de importar la app."""
+
+    os.environ["AUDITBOT_CACHE_DIR"] = os.path.join(work_dir, "cache")
+    os.environ["AUDITBOT_FAKE_GCS_DIR"] = os.path.join(work_dir, "gcs")
+    # Ni el registro de spans ni los embeddings ni la caché de contexto remota entran en la medición
+    os.environ["AUDITBOT_TELEMETRY"] = "0"
+    os.environ["AUDITBOT_RETRIEVAL_MODE"] = "lexical"
+    os.environ["AUDITBOT_CONTEXT_CACHE"] = "off"
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+
+def _invalidate(path: str) -> None:
+    """Cambia el mtime del archivo: su caché columnar y las filas en memoria dejan de valer."""
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, max(time.time_ns(), stat.st_mtime_ns + 1000)))
+
+
+def measure(case: Case, rows: Optional[int], repeat: int, memory: bool) -> CaseResult:
+    timings = []
+    extra: Optional[dict] = None
+    for _ in range(repeat):
+        case.setup()
+        gc.collect()
+        start = time.perf_counter()
+        extra = case.run()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    peak_mb = None
+    if memory:
+        case.setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            case.run()
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1 << 20)
+        finally:
+            tracemalloc.stop()
+
+    return CaseResult(
+        case=case.name,
+        rows=rows,
+        repeat=repeat,
+        median_ms=round(statistics.median(timings), 3),
+        min_ms=round(min(timings), 3),
+        max_ms=round(max(timings), 3),
+        peak_mb=None if peak_mb is None else round(peak_mb, 3),
+        extra=extra or {},
+    )
+
+
+@contextmanager
+def _dataset_paths(module, paths: Dict[str, str]):
+    """Apunta DATASET_PATHS (el mismo dict que usa la app) a los archivos sintéticos."""
+
+    original = dict(module.DATASET_PATHS)
+    module.DATASET_PATHS.clear()
+    module.DATASET_PATHS.update(paths)
+    try:
+        yield
+    finally:
+        module.DATASET_PATHS.clear()
+        module.DATASET_PATHS.update(original)
+
+
+def dataset_cases(data_dir: str, rows: int, index_dir: str, genai_client: FakeGenaiClient) -> List[Case]:
+    """Casos que dependen del tamaño del dataset."""
+
+    # pylint: disable=import-outside-toplevel
+    import chat_servicios_v2 as chat
+    from evaluation_store import build_call_index, load_records_frame, normalize_evaluations
+    from quality_metrics import compute_quality_summary
+    from report_engine import shard_records
+    from retrieval import EvaluationRetriever
+
+    path = ensure_dataset(data_dir, rows, "servicios")
+    # Para la carga de todos los datasets: cuatro archivos que suman `rows`
+    split_paths = [ensure_dataset(os.path.join(data_dir, "split"), max(rows // len(DATASETS), 1), name) for name in DATASETS]
+    dataset_key = "Servicios"
+    questions = chat.QUESTIONS_FOR_REPORTS[dataset_key]
+
+    def monitor_load_data():
+        frame = load_records_frame(path)
+        if "evaluacion_llamada_raw" not in frame.columns:
+            frame["evaluacion_llamada_raw"] = frame["evaluacion_llamada"]
+        return normalize_evaluations(frame)
+
+    state: dict = {}
+
+    def prepare_frame():
+        if "frame" not in state:
+            state["frame"] = monitor_load_data()
+
+    def cache_data_roundtrip():
+        # st.cache_data serializa el valor al guardarlo y entrega una copia deserializada en cada rerun;
+        # este es el costo que evita devolver el frame normalizado con st.cache_resource
+        payload = pickle.dumps(state["frame"], protocol=pickle.HIGHEST_PROTOCOL)
+        copy = pickle.loads(payload)
+        return {"records": len(copy), "pickled_mb": round(len(payload) / 1e6, 1)}
+
+    def call_index():
+        frame = state["frame"]
+        valid = frame[frame["evaluacion_llamada_raw"].notna()].reset_index(drop=True)
+        index = build_call_index(valid)
+        ids = valid["id_llamada_procesada"].tolist()
+        step = max(len(ids) // CALL_LOOKUPS, 1)
+        found = sum(index.get(call_id) is not None for call_id in ids[::step][:CALL_LOOKUPS])
+        return {"valid_calls": len(valid), "lookups": found}
+
+    def load_single(limit=None):
+        with _dataset_paths(chat, {dataset_key: path}):
+            return chat.load_evaluation_data(dataset_key, limit)
+
+    def prepare_records():
+        if "records" not in state:
+            state["records"] = load_single()
+
+    def pack(token_budget):
+        def run():
+            packed = chat.pack_evaluation_context(state["records"], token_budget)
+            return {"included": packed.included, "tokens": packed.tokens, "truncated": packed.truncated}
+
+        return run
+
+    def shards():
+        return {"shards": len(shard_records(state["records"]))}
+
+    def fresh_retriever():
+        shutil.rmtree(index_dir, ignore_errors=True)
+        state["retriever"] = EvaluationRetriever(dataset_key, path, directory=index_dir, mode="lexical")
+
+    def warm_retriever():
+        if "retriever" not in state:
+            fresh_retriever()
+            state["retriever"].search_calls(SEARCH_QUERIES[0])
+
+    def search_calls():
+        hits = [len(state["retriever"].search_calls(query)) for query in SEARCH_QUERIES]
+        return {"queries": len(SEARCH_QUERIES), "hits": sum(hits)}
+
+    def quality_summary():
+        summary = compute_quality_summary(state["frame"])
+        return {"evaluated_calls": summary.evaluated_calls}
+
+    def prepare_report():
+        prepare_records()
+        if "report_context" not in state:
+            state["report_context"] = chat.build_evaluation_context(state["records"], chat.REPORT_CONTEXT_TOKENS)
+        genai_client.reset_counters()
+
+    def model_usage(**values):
+        return {**values, "model_calls": genai_client.calls, "prompt_chars": genai_client.prompt_chars}
+
+    def structured_report():
+        text = chat.generate_structured_report(dataset_key, state["report_context"], questions)
+        return model_usage(ok=chat.report_succeeded(text))
+
+    def map_reduce():
+        context = chat.map_reduce_report_context(dataset_key, state["records"], questions)
+        return model_usage(context_chars=len(context))
+
+    def invalidate_all():
+        for split_path in split_paths:
+            _invalidate(split_path)
+
+    def load_all():
+        with _dataset_paths(chat, dict(zip(("Servicios", "Preferente", "Retención", "Bloqueos"), split_paths))):
+            records = chat.load_evaluation_data(None)
+        return {"records": len(records), "datasets": len(split_paths)}
+
+    def count_single(limit=None):
+        return lambda: {"records": len(load_single(limit))}
+
+    return [
+        Case("dataset.load_records_frame[cold]", lambda: {"records": len(load_records_frame(path))}, lambda: _invalidate(path)),
+        Case("dataset.load_records_frame[warm]", lambda: {"records": len(load_records_frame(path))}),
+        Case("monitor.load_data", lambda: {"records": len(monitor_load_data())}),
+        Case("monitor.cache_data_roundtrip", cache_data_roundtrip, prepare_frame),
+        Case("monitor.call_index", call_index, prepare_frame),
+        Case("quality.compute_quality_summary", quality_summary, prepare_frame),
+        Case("chat.load_evaluation_data[cold]", count_single(), lambda: _invalidate(path)),
+        Case("chat.load_evaluation_data[cold,limit=500]", count_single(500), lambda: _invalidate(path)),
+        Case("chat.load_evaluation_data[memory]", count_single(), load_single),
+        Case("chat.load_evaluation_data[all,cold]", load_all, invalidate_all),
+        Case("context.build_evaluation_context[chat]", pack(chat.CHAT_CONTEXT_TOKENS), prepare_records),
+        Case("context.build_evaluation_context[report]", pack(chat.REPORT_CONTEXT_TOKENS), prepare_records),
+        Case("context.shard_records", shards, prepare_records),
+        Case("retrieval.search_calls[cold]", search_calls, fresh_retriever),
+        Case("retrieval.search_calls[warm]", search_calls, warm_retriever),
+        Case("report.generate_structured_report", structured_report, prepare_report),
+        Case("report.map_reduce_report_context", map_reduce, prepare_report),
+    ]
+
+
+def audio_cases(work_dir: str, gcs_dir: str) -> List[Case]:
+    """Casos de la caché de audio contra el bucket local (no dependen del tamaño del dataset)."""
+
+    from audio_cache import AudioCache  # pylint: disable=import-outside-toplevel
+    from gcp_clients import get_storage_client  # pylint: disable=import-outside-toplevel
+
+    uris = [f"gs://auditbot-bench/servicios/{number:07d}.mp3" for number in range(AUDIO_FILES)]
+    write_fake_audio(gcs_dir, uris, AUDIO_FILE_BYTES)
+    disk_dir = os.path.join(work_dir, "audio-cache")
+    state: dict = {}
+
+    def new_cache(clear_disk: bool):
+        def setup():
+            if clear_disk:
+                shutil.rmtree(disk_dir, ignore_errors=True)
+            state["cache"] = AudioCache(disk_dir=disk_dir, client_factory=get_storage_client)
+
+        return setup
+
+    def warm_memory():
+        if "memory" not in state:
+            new_cache(False)()
+            for uri in uris:
+                state["cache"].get(uri)
+            state["memory"] = state["cache"]
+        state["cache"] = state["memory"]
+
+    def get_all():
+        total = sum(len(state["cache"].get(uri)) for uri in uris)
+        return {"files": len(uris), "bytes": total}
+
+    return [
+        Case("audio.cache_get[download]", get_all, new_cache(True)),
+        Case("audio.cache_get[disk]", get_all, new_cache(False)),
+        Case("audio.cache_get[memory]", get_all, warm_memory),
+    ]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment() -> dict:
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def find_regressions(results: List[dict], baseline: dict, tolerance: float) -> List[dict]:
+    """Casos más lentos o con más memoria que en `baseline`, más allá de la tolerancia relativa."""
+
+    previous = {(item["case"], item["rows"]): item for item in baseline.get("results", [])}
+    regressions = []
+    for item in results:
+        before = previous.get((item["case"], item["rows"]))
+        if before is None:
+            continue
+        if (
+            item["median_ms"] > before["median_ms"] * (1 + tolerance)
+            and item["median_ms"] - before["median_ms"] > MIN_REGRESSION_MS
+        ):
+            regressions.append(
+                {"case": item["case"], "rows": item["rows"], "metric": "median_ms", "baseline": before["median_ms"], "current": item["median_ms"]}
+            )
+        if (
+            item.get("peak_mb") is not None
+            and before.get("peak_mb") is not None
+            and item["peak_mb"] > before["peak_mb"] * (1 + tolerance)
+            and item["peak_mb"] - before["peak_mb"] > MIN_REGRESSION_MB
+        ):
+            regressions.append(
+                {"case": item["case"], "rows": item["rows"], "metric": "peak_mb", "baseline": before["peak_mb"], "current": item["peak_mb"]}
+            )
+    return regressions
+
+
+def _print_result(result: CaseResult) -> None:
+    rows = "-" if result.rows is None else f"{result.rows:,}"
+    peak = "-" if result.peak_mb is None else f"{result.peak_mb:,.1f} MB"
+    print(f"{result.case:<45} {rows:>10} {result.median_ms:>12,.1f} ms {peak:>12}", flush=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks offline de carga y contexto con datos sintéticos.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES), help="Filas por dataset, separadas por coma (hasta 1000000).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso; se informa la mediana.")
+    parser.add_argument("--cases", default="", help="Solo los casos cuyo nombre contenga alguno de estos textos (separados por coma).")
+    parser.add_argument("--no-memory", action="store_true", help="Omite la pasada de tracemalloc.")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="Datos sintéticos, cachés y bucket local (se reutilizan).")
+    parser.add_argument("--out", default=None, help="Ruta del informe JSON (por defecto benchmarks/results/<fecha>.json).")
+    parser.add_argument("--baseline", default=None, help="Informe anterior contra el que comparar.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento relativo permitido frente a la línea base.")
+    parser.add_argument("--model-latency-ms", type=float, default=50.0, help="Latencia fija de cada llamada al Gemini falso.")
+    parser.add_argument("--model-ms-per-1k-chars", type=float, default=0.05, help="Latencia adicional por cada mil caracteres de prompt.")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    filters = [text.strip() for text in args.cases.split(",") if text.strip()]
+    work_dir = os.path.abspath(args.work_dir)
+    _configure_environment(work_dir)
+    # Cachés e índices de una corrida anterior no deben contar como calientes en esta
+    shutil.rmtree(os.environ["AUDITBOT_CACHE_DIR"], ignore_errors=True)
+
+    genai_client = FakeGenaiClient(args.model_latency_ms, args.model_ms_per_1k_chars)
+    install_fake_backends(os.environ["AUDITBOT_FAKE_GCS_DIR"], genai_client)
+
+    def selected(cases: List[Case]) -> List[Case]:
+        return [case for case in cases if not filters or any(text in case.name for text in filters)]
+
+    results: List[CaseResult] = []
+    data_dir = os.path.join(work_dir, "data")
+    for rows in sizes:
+        print(f"Dataset sintético de {rows:,} filas...", flush=True)
+        index_dir = os.path.join(work_dir, "indices", str(rows))
+        for case in selected(dataset_cases(data_dir, rows, index_dir, genai_client)):
+            results.append(measure(case, rows, args.repeat, not args.no_memory))
+            _print_result(results[-1])
+    for case in selected(audio_cases(work_dir, os.environ["AUDITBOT_FAKE_GCS_DIR"])):
+        results.append(measure(case, None, args.repeat, not args.no_memory))
+        _print_result(results[-1])
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "environment": _environment(),
+        "config": {
+            "sizes": sizes,
+            "repeat": args.repeat,
+            "memory": not args.no_memory,
+            "model_latency_ms": args.model_latency_ms,
+            "model_ms_per_1k_chars": args.model_ms_per_1k_chars,
+        },
+        "results": [asdict(result) for result in results],
+    }
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["baseline"] = {"path": args.baseline, "commit": baseline.get("commit"), "tolerance": args.tolerance}
+        report["regressions"] = find_regressions(report["results"], baseline, args.tolerance)
+
+    out = args.out or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Informe: {out}")
+
+    for regression in report.get("regressions", []):
+        print(
+            f"REGRESIÓN {regression['case']} ({regression['rows']} filas): "
+            f"{regression['metric']} {regression['baseline']} → {regression['current']}"
+        )
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
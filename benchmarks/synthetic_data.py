@@ -0,0 +1,132 @@
+"""Generador de archivos `resultados_evaluaciones_*` sintéticos para los benchmarks.
+
+Uso:
+    python -m benchmarks.synthetic_data --rows 100000 --dataset servicios --out /tmp/auditbot-bench
+"""
+
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator
+
+# --- VOCABULARIO DE LAS LLAMADAS SINTÉTICAS ---
+_AGENT_LINES = (
+    "Buenos días, gracias por comunicarse con el banco, ¿en qué le puedo ayudar?",
+    "Con gusto le reviso, ¿me confirma su número de documento por favor?",
+    "Ya validé su información, permítame un momento mientras consulto el sistema.",
+    "Le confirmo que la transacción quedó registrada el día de ayer.",
+    "Entiendo su molestia, voy a radicar una solicitud para revisar el caso.",
+    "El bloqueo de la tarjeta quedó aplicado de inmediato.",
+    "Le puedo ofrecer una mejor tasa si mantiene el producto con nosotros.",
+    "¿Hay algo más en lo que le pueda colaborar el día de hoy?",
+)
+_CLIENT_LINES = (
+    "Hola, quiero consultar un movimiento que no reconozco en mi cuenta.",
+    "Me aparece un cobro de un comercio que nunca he visitado.",
+    "Ya había llamado la semana pasada y no me solucionaron nada.",
+    "En el otro banco me ofrecen una tasa más baja, por eso quiero cancelar.",
+    "La aplicación no me deja hacer la transferencia desde ayer.",
+    "Necesito bloquear la tarjeta porque me la robaron.",
+    "Llevo mucho tiempo esperando en la línea.",
+    "Perfecto, muchas gracias por la ayuda.",
+)
+_OBJECTIONS = ("tasa", "cuota de manejo", "tiempos de espera", "servicio", "competencia", "cupo")
+_COMPETITORS = ("Davivienda", "Bancolombia", "BBVA", "Nu", "Scotiabank")
+_REASONS = ("consulta de movimientos", "bloqueo por fraude", "cancelación", "transferencia fallida", "reclamo")
+_SENTIMENTS = ("positivo", "neutral", "negativo")
+
+DATASETS = ("servicios", "preferente", "retencion", "bloqueos")
+
+
+def dataset_file_name(dataset: str) -> str:
+    return f"resultados_evaluaciones_servicios_{dataset}.json"
+
+
+def _transcript(rng: random.Random, turns: int) -> str:
+    lines = []
+    seconds = 0
+    for turn in range(turns):
+        seconds += rng.randint(3, 25)
+        speaker, options = ("Agente", _AGENT_LINES) if turn % 2 == 0 else ("Cliente", _CLIENT_LINES)
+        lines.append(f"[{seconds // 60:02d}:{seconds % 60:02d}] {speaker}: {rng.choice(options)}")
+    return "\n".join(lines)
+
+
+def generate_records(rows: int, dataset: str = "servicios", seed: int = 0, turns: int = 16) -> Iterator[dict]:
+    """Registros con la forma de los archivos reales: la evaluación va como texto JSON en `evaluacion_llamada`.
+
+    Son deterministas para un mismo `seed`; cerca del 2 % de las llamadas no tiene evaluación.
+    """
+
+    rng = random.Random(f"{dataset}:{seed}")
+    start = date(2026, 1, 1)
+    for number in range(rows):
+        record: Dict[str, object] = {
+            "id_llamada_procesada": f"{dataset}-{number:07d}",
+            "celular": f"3{rng.randint(100000000, 999999999)}",
+            "fecha_llamada": (start + timedelta(days=rng.randint(0, 179))).isoformat(),
+            "id_original_path": f"gs://auditbot-bench/{dataset}/{number:07d}.mp3",
+        }
+        if rng.random() < 0.02:
+            record["evaluacion_llamada"] = None
+            yield record
+            continue
+        evaluation = {
+            "precision_llamada": rng.randint(40, 100),
+            "precision_error_critico_cliente": rng.choice((0, 100)),
+            "precision_error_critico_negocio": rng.choice((0, 100, 100, 100)),
+            "precision_error_critico_cumplimiento": rng.choice((0, 100)),
+            "precision_error_no_critico": rng.randint(50, 100),
+            "transcripcion": _transcript(rng, rng.randint(turns // 2, turns * 2)),
+            "resumen": f"Cliente llama por {rng.choice(_REASONS)}; sentimiento {rng.choice(_SENTIMENTS)}.",
+            "motivo_llamada": rng.choice(_REASONS),
+            "objeciones": rng.sample(_OBJECTIONS, rng.randint(0, 3)),
+            "menciona_competencia": rng.choice((None, rng.choice(_COMPETITORS))),
+            "recontacto": rng.random() < 0.3,
+            "sentimiento_cliente": rng.choice(_SENTIMENTS),
+        }
+        record["evaluacion_llamada"] = json.dumps(evaluation, ensure_ascii=False)
+        yield record
+
+
+def write_dataset(path: str, rows: int, dataset: str = "servicios", seed: int = 0, turns: int = 16) -> int:
+    """Escribe el arreglo JSON registro a registro (sin tenerlo completo en memoria) y devuelve su tamaño en bytes."""
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for number, record in enumerate(generate_records(rows, dataset, seed, turns)):
+            if number:
+                f.write(",\n")
+            f.write(json.dumps(record, ensure_ascii=False))
+        f.write("]")
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def ensure_dataset(directory: str, rows: int, dataset: str = "servicios", seed: int = 0) -> str:
+    """Ruta del dataset sintético de `rows` filas; lo genera solo si aún no existe."""
+
+    path = os.path.join(directory, f"{rows}", dataset_file_name(dataset))
+    if not os.path.exists(path):
+        write_dataset(path, rows, dataset, seed)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Genera archivos de evaluaciones sintéticos.")
+    parser.add_argument("--rows", type=int, default=10000, help="Registros por archivo (1k a 1M).")
+    parser.add_argument("--dataset", choices=DATASETS, default="servicios")
+    parser.add_argument("--out", default="benchmarks/data", help="Directorio de salida.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    path = os.path.join(args.out, dataset_file_name(args.dataset))
+    size = write_dataset(path, args.rows, args.dataset, args.seed)
+    print(f"{path}: {args.rows} registros, {size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
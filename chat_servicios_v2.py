@@ -1,44 +1,87 @@
-import json
-from typing import List, Optional
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Callable, Iterator, List, Optional, Tuple
 
 import streamlit as st
-from google import genai
 from google.genai import types
 
-# --- CONFIGURACIÓN DE ENTORNO Y CONSTANTES ---
-MODE = globals().get("MODE")
-CHAT_DATASET = globals().get("CHAT_DATASET")
-CHAT_LIMIT = globals().get("CHAT_LIMIT")
-REPORT_DATASET = globals().get("REPORT_DATASET")
-REPORT_LIMIT = globals().get("REPORT_LIMIT")
+from context_cache import get_context_cache_registry
+from context_packer import (
+    CONTEXT_DROP_FIELDS,
+    CONTEXT_FIELD_CHARS,
+    CONTEXT_TRANSCRIPT_CHARS,
+    PackedContext,
+    pack_evaluations,
+)
+from evaluation_store import DATASET_LOAD_WORKERS, load_evaluation_rows, source_signature, warm_record_caches
+from gcp_clients import get_genai_client, model_call_slot
+from job_queue import DONE, Job, JobContext, get_job_queue
+from report_cache import get_report_cache, records_digest, report_cache_key, section_cache_key
+from report_engine import (
+    REPORT_CHUNK_TOKENS,
+    REPORT_SECTION_ATTEMPTS,
+    ReportSection,
+    assemble_report,
+    build_reduce_context,
+    build_section_prompt,
+    build_synthesis_prompt,
+    run_map_phase,
+    run_section_phase,
+    shard_records,
+)
+from retrieval import RETRIEVAL_MODE, RETRIEVAL_TOP_K, get_evaluation_retriever
+from telemetry import bind, record_usage, span
+
+# --- CONFIGURACIÓN DE PÁGINA (solo en ejecución independiente) ---
+PAGE_ICON = "data:image/webp;base64,UklGRrgHAABXRUJQVlA4WAoAAAAQAAAAPwAAPwAAQUxQSE8DAAARoAb9/+FI+nWleqt3KtNrO1tGam3btnm2bdtY29b5bm3bu705jBa5rqQHqf/3RXf//79kju8iYgLo/+1g9cYdGtcpVShKhMc8+9XsBQsWzZ751cyPHxgcLpVaDR9cdfTqD0+0rlI8QBSo0nrCh3vPzhxmpIreZqZlZ24YVY6kQx/cuLGtl54SdV68iOiRO8uQ8sgIsKNh8vSB+51Ezhu1iLPvJSD7bj1JFT++UYCzk9KIVX9BAPH3jGRotb5JQGzrbhDzYBuAuDsZ4V8A7GxvEPdABwCshmxaaIcATnch/jeES7zEVmGdAGIPFeVreREe3xTneqsAwDfliL3SAeGBYyWYutwAcGsgsdf5Br5H0nj0HwEkVplcxrBj8F9q8IwCgOhAYq71QQb87TuI1Tzk2luORa9y51kByR+q8YwSrteIs8y4rTEBSedOjUVfBHcfNbPxo4ccyDszW1dMZ6hwwvVnWKX6uLkH8qAsnIvzxpfSTYVetiujjkzxWl0+OJ8nwJkAnCtvN1d4HO7fJMqOmrctCm4RO7ZkmkmKX3hc9zNGHisAe86GcaU0Ut7ikdnYh9L73/PxAYfFuq91uBypF9nhYffyc5cbsy5TLfboDMuJTFIzdnrkPSBHWnDAlltCyL33UAaAjCZKuhcW6XLunkstqZ13RuG+UUFF+8nrdEhNM7p/40h8uAzeG1Voq5fdR42IzKlXhM+7MR/0UpnnhVVBDqI633gVrIC/pfKqjz2Qh8x3Yy5xTAJtFEb5YJvJQzQ+DiB6VWaTQs24j3iOi9pHADtHBrpc4IgPbrTjom4JiIRUYzl6yA+na3PRI1CcqmDG/XCsFhc9pfCAAi2TgNWEi7bIjVKp5UjAfoBrg1xjFXpRBjjTl6PLWUgLU4ksKWDjkIBC/21Q3EvqzRWAvB0vdK+VrmlGqNMjO6A+mYEeUfF0ojfiYLWJ9V0O/iE89FnqLCPut1LlPPEPzEmK7ROplAQqspDv8TvhfVKj5PY9y7M7HIx4bUyjpIfnJlRiX4SILsKd2YtSstK4DdfzAAGBgkurxpUhqnYE7o3plLJaMNSkTbNwtQARkTkT7qUGFdLhcQBXXilHhfSVKzFraeeiVFiLj5k9pEqQ/rsEAFZQOCBCBAAAEBYAnQEqQABAAD4xCoxGIhERDHggAwS2NbkjCxD9QeR/ij7CdF/k33H/br/D/ADS3+PP8H+VX+g7QH2q+4B+lf9t/KftM+YD+Pf1D/a/4D2mf6r7D/QA/n/9C6xX9sfYA/XL1Uf9R+03wLfsx/2v878BH6r/9PgANbM3QYbKZj4x3rrHARRz3umxVzaHLG7l/O0Fo1w66k5DVcZC9lXH726EHXMk8AbiI0VY6F2Ry3R/22lZ9VPv8gAA/vj0F9v/iO7xPY//PYxV8nvtCu9n/zVMl1CgFkZjmDo1/yOxNK8Sgmnv8vKZCDXEvB8nRi96gw8SVhMHO8qKmyCbm/ptgjRXGSufmuAhhrXXCSm5B6H8dwHf9GZ//sR3/7c7v/9hDrYaGId3Wr3TxhcpTM8ZTYxmbrDQb74fSeaegJ7VmKxfSaljO97nokqMXufVqtD8LdzuGVCDuWN1VZ8Omb8UmPAQv32T3O/qLq8iWldZcKnawKEFZ1u+Fq1bR4xAVEEmMY2EBHgjFcfbqZcTjAE6+t4KWPnCChJWCPsa3r4o5TLXmANh/b+W0LSup3SZc/+JrT2gZdvKA1GF4/6EqNg9jQZI3Ci4llJ8g1zr3yAg//Kv8/3b7vO2f6FY6Tc67V90A/W2WmSVitLKX/vIjxPVO0Vy/3HmDjpMGmbcs9evIzOvjr8Y/tZGr9WWEnS87LaG+y/iPuEFHggGc6pxqO9enL+kERcRkoPose1hIt+PbDdkbJeXfkzjJ1fb0iVmGBEKPz8DWqbniVOgxfPagdZ0F4zcanivx+ebZlfsNAil3AN1QxbE1fxVoiy42hsW3VAdYuFWWcP/VunA+2pkCmLaiHAV5PYW8XKdXPOnlpUbUhbak2sET6oKjgWwJE8P+aWzNZqmQ06WO3izfia/Zlz89NycVKGun1Z0ZGGC4WTHAs7nmtR6wCUsGJKaWvVoLK3PR9IzhBkyGs8DUJL/LHJ72lcOB/AcSPCf2Ju+Eg4FRFhSVl1l/gG3QF1ayCJGTS8OXd+/dNpY7Z8xDG9/VVbbclmGBZ/aiPhBf///gfzP74tI+Mrt6t4p0+U/cf/Ijw0y7zPTE3AiaLCwoZozd6wi2D3zEq11tmHjiscuPHc1RuiODA6l+ZADm5iRW+UdDqdipy96MGnJsEmVYTEoRzDgz6c3BhFVtzMy3KyKxMULe5P93dpXVZDi0TsSentJXpuPCm2HpIySC0dkNpxy8fMVv8eStZmmhzP/NURjRVi/uHcPuI17PtddkhBlZcA0s9cJV5wWh/+JucfKlz4CG4wA0sl2wPVsqr8H7hoQbZjPtO9CUVCWYKAosc7h5l4y61fIdiplpR+b6ttEE4FvkslF+XrryoTepTi55OfgrJDgmhxke3SRMFKaoUczZAVRaMOrwxJf+XhImKZBtOmzhV+aRkeGC5D4gh+JouP/ouHvnw8gAA=="
 
-STANDALONE_MODE = MODE is None
-resolved_mode = (MODE or "tabs").lower()
 
-if STANDALONE_MODE:
+def configure_standalone_page() -> None:
+    """Configura la página cuando el módulo se ejecuta con `streamlit run` directamente."""
+
     try:
         st.set_page_config(
             page_title="Auditbot CX",
-            page_icon="data:image/webp;base64,UklGRrgHAABXRUJQVlA4WAoAAAAQAAAAPwAAPwAAQUxQSE8DAAARoAb9/+FI+nWleqt3KtNrO1tGam3btnm2bdtY29b5bm3bu705jBa5rqQHqf/3RXf//79kju8iYgLo/+1g9cYdGtcpVShKhMc8+9XsBQsWzZ751cyPHxgcLpVaDR9cdfTqD0+0rlI8QBSo0nrCh3vPzhxmpIreZqZlZ24YVY6kQx/cuLGtl54SdV68iOiRO8uQ8sgIsKNh8vSB+51Ezhu1iLPvJSD7bj1JFT++UYCzk9KIVX9BAPH3jGRotb5JQGzrbhDzYBuAuDsZ4V8A7GxvEPdABwCshmxaaIcATnch/jeES7zEVmGdAGIPFeVreREe3xTneqsAwDfliL3SAeGBYyWYutwAcGsgsdf5Br5H0nj0HwEkVplcxrBj8F9q8IwCgOhAYq71QQb87TuI1Tzk2luORa9y51kByR+q8YwSrteIs8y4rTEBSedOjUVfBHcfNbPxo4ccyDszW1dMZ6hwwvVnWKX6uLkH8qAsnIvzxpfSTYVetiujjkzxWl0+OJ8nwJkAnCtvN1d4HO7fJMqOmrctCm4RO7ZkmkmKX3hc9zNGHisAe86GcaU0Ut7ikdnYh9L73/PxAYfFuq91uBypF9nhYffyc5cbsy5TLfboDMuJTFIzdnrkPSBHWnDAlltCyL33UAaAjCZKuhcW6XLunkstqZ13RuG+UUFF+8nrdEhNM7p/40h8uAzeG1Voq5fdR42IzKlXhM+7MR/0UpnnhVVBDqI633gVrIC/pfKqjz2Qh8x3Yy5xTAJtFEb5YJvJQzQ+DiB6VWaTQs24j3iOi9pHADtHBrpc4IgPbrTjom4JiIRUYzl6yA+na3PRI1CcqmDG/XCsFhc9pfCAAi2TgNWEi7bIjVKp5UjAfoBrg1xjFXpRBjjTl6PLWUgLU4ksKWDjkIBC/21Q3EvqzRWAvB0vdK+VrmlGqNMjO6A+mYEeUfF0ojfiYLWJ9V0O/iE89FnqLCPut1LlPPEPzEmK7ROplAQqspDv8TvhfVKj5PY9y7M7HIx4bUyjpIfnJlRiX4SILsKd2YtSstK4DdfzAAGBgkurxpUhqnYE7o3plLJaMNSkTbNwtQARkTkT7qUGFdLhcQBXXilHhfSVKzFraeeiVFiLj5k9pEqQ/rsEAFZQOCBCBAAAEBYAnQEqQABAAD4xCoxGIhERDHggAwS2NbkjCxD9QeR/ij7CdF/k33H/br/D/ADS3+PP8H+VX+g7QH2q+4B+lf9t/KftM+YD+Pf1D/a/4D2mf6r7D/QA/n/9C6xX9sfYA/XL1Uf9R+03wLfsx/2v878BH6r/9PgANbM3QYbKZj4x3rrHARRz3umxVzaHLG7l/O0Fo1w66k5DVcZC9lXH726EHXMk8AbiI0VY6F2Ry3R/22lZ9VPv8gAA/vj0F9v/iO7xPY//PYxV8nvtCu9n/zVMl1CgFkZjmDo1/yOxNK8Sgmnv8vKZCDXEvB8nRi96gw8SVhMHO8qKmyCbm/ptgjRXGSufmuAhhrXXCSm5B6H8dwHf9GZ//sR3/7c7v/9hDrYaGId3Wr3TxhcpTM8ZTYxmbrDQb74fSeaegJ7VmKxfSaljO97nokqMXufVqtD8LdzuGVCDuWN1VZ8Omb8UmPAQv32T3O/qLq8iWldZcKnawKEFZ1u+Fq1bR4xAVEEmMY2EBHgjFcfbqZcTjAE6+t4KWPnCChJWCPsa3r4o5TLXmANh/b+W0LSup3SZc/+JrT2gZdvKA1GF4/6EqNg9jQZI3Ci4llJ8g1zr3yAg//Kv8/3b7vO2f6FY6Tc67V90A/W2WmSVitLKX/vIjxPVO0Vy/3HmDjpMGmbcs9evIzOvjr8Y/tZGr9WWEnS87LaG+y/iPuEFHggGc6pxqO9enL+kERcRkoPose1hIt+PbDdkbJeXfkzjJ1fb0iVmGBEKPz8DWqbniVOgxfPagdZ0F4zcanivx+ebZlfsNAil3AN1QxbE1fxVoiy42hsW3VAdYuFWWcP/VunA+2pkCmLaiHAV5PYW8XKdXPOnlpUbUhbak2sET6oKjgWwJE8P+aWzNZqmQ06WO3izfia/Zlz89NycVKGun1Z0ZGGC4WTHAs7nmtR6wCUsGJKaWvVoLK3PR9IzhBkyGs8DUJL/LHJ72lcOB/AcSPCf2Ju+Eg4FRFhSVl1l/gG3QF1ayCJGTS8OXd+/dNpY7Z8xDG9/VVbbclmGBZ/aiPhBf///gfzP74tI+Mrt6t4p0+U/cf/Ijw0y7zPTE3AiaLCwoZozd6wi2D3zEq11tmHjiscuPHc1RuiODA6l+ZADm5iRW+UdDqdipy96MGnJsEmVYTEoRzDgz6c3BhFVtzMy3KyKxMULe5P93dpXVZDi0TsSentJXpuPCm2HpIySC0dkNpxy8fMVv8eStZmmhzP/NURjRVi/uHcPuI17PtddkhBlZcA0s9cJV5wWh/+JucfKlz4CG4wA0sl2wPVsqr8H7hoQbZjPtO9CUVCWYKAosc7h5l4y61fIdiplpR+b6ttEE4FvkslF+XrryoTepTi55OfgrJDgmhxke3SRMFKaoUczZAVRaMOrwxJf+XhImKZBtOmzhV+aRkeGC5D4gh+JouP/ouHvnw8gAA==",
+            page_icon=PAGE_ICON,
             layout="wide",
             initial_sidebar_state="expanded",
         )
     except Exception:
         pass
 
+
 # --- CONFIGURACIÓN INICIAL DE GEMINI ---
-client = genai.Client(
-    vertexai=True,
-    project="augusta-bbog-dev-activo",
-    location="global",
-    http_options=types.HttpOptions(api_version="v1"),
-)
+# Se ejecuta una sola vez por proceso: el módulo se importa, no se re-ejecuta en cada rerun.
+# El cliente GenAI se obtiene del registro compartido (ver gcp_clients).
 generate_content_config = types.GenerateContentConfig(
     temperature=0.6,
     top_p=0.95,
     thinking_config=types.ThinkingConfig(thinking_budget=-1),
 )
 
+CHAT_MODEL = "gemini-2.5-flash"
+REPORT_MODEL = "gemini-2.5-pro"
+# Presupuesto de tokens (estimados) del contexto de evaluaciones por llamada al modelo
+CHAT_CONTEXT_TOKENS = int(os.environ.get("AUDITBOT_CHAT_CONTEXT_TOKENS", "200000"))
+REPORT_CONTEXT_TOKENS = int(os.environ.get("AUDITBOT_REPORT_CONTEXT_TOKENS", "500000"))
+# Modelo de la fase map de los informes map-reduce (análisis parcial por bloque)
+REPORT_MAP_MODEL = os.environ.get("AUDITBOT_REPORT_MAP_MODEL", REPORT_MODEL)
+# Valor inicial del modo map-reduce en el generador de informes
+REPORT_MAP_REDUCE = os.environ.get("AUDITBOT_REPORT_MAP_REDUCE", "0") == "1"
+# Valor inicial del modo por pregunta (una llamada por pregunta en paralelo más una síntesis); desactivado por defecto
+REPORT_PER_QUESTION = os.environ.get("AUDITBOT_REPORT_PER_QUESTION", "0") == "1"
+# Incrementar al cambiar build_report_prompt o los prompts de report_engine: invalida la caché de informes
+REPORT_PROMPT_VERSION = 1
+REPORT_ERROR_PREFIX = "Lo siento, ocurrió un error al generar el informe"
+STREAM_INTERRUPTED_NOTICE = "_Respuesta interrumpida"
+# Tipo de trabajo de la cola en segundo plano y frecuencia de sondeo de su estado en la interfaz
+REPORT_JOB_KIND = "report"
+REPORT_POLL_SECONDS = 2
+# Mostrar las respuestas token a token (AUDITBOT_GEMINI_STREAMING=0 vuelve al modo bloqueante)
+GEMINI_STREAMING = os.environ.get("AUDITBOT_GEMINI_STREAMING", "1") != "0"
+
 # Definir rutas de los archivos de evaluaciones (alineadas con app_servicios_v2)
 DATASET_PATHS = {
     "Servicios": "/home/ec2-user/data-bbog-integration-monitor-assistant/data/resultados_evaluaciones_servicios_servicios.json",
@@ -95,80 +138,109 @@ def _dataset_keys() -> List[str]:
     return list(DATASET_PATHS.keys())
 
 
-@st.cache_data(show_spinner=False)
+def _read_dataset(key: str, limit: Optional[int]) -> Tuple[List[dict], Optional[str]]:
+    path = DATASET_PATHS.get(key)
+    if not path:
+        return [], f"Dataset '{key}' no tiene una ruta configurada."
+    try:
+        return load_evaluation_rows(path, key, limit), None
+    except FileNotFoundError:
+        return [], f"Archivo no encontrado para '{key}': {path}"
+    except Exception as exc:  # pylint: disable=broad-except
+        return [], f"Error al cargar '{key}': {exc}"
+
+
+def read_evaluations(dataset_key: Optional[str] = None, limit: Optional[int] = None) -> Tuple[List[dict], List[str]]:
+    """Registros de evaluación y advertencias de carga; no usa Streamlit (apto para hilos de trabajo).
+
+    Sin `dataset_key` se leen todos los datasets a la vez, conservando el orden de DATASET_PATHS.
+    """
+
+    datasets = [dataset_key] if dataset_key else _dataset_keys()
+    if len(datasets) > 1 and not limit:
+        # Lectura completa: las cachés vencidas se construyen en procesos paralelos
+        warm_record_caches([DATASET_PATHS[key] for key in datasets if key in DATASET_PATHS])
+    if len(datasets) > 1:
+        with ThreadPoolExecutor(max_workers=max(1, min(DATASET_LOAD_WORKERS, len(datasets))), thread_name_prefix="datasets") as pool:
+            # bind: los tiempos de cada dataset cuentan en el panel de la ejecución que los pidió
+            results = list(pool.map(bind(lambda key: _read_dataset(key, limit)), datasets))
+    else:
+        results = [_read_dataset(key, limit) for key in datasets]
+
+    aggregated: List[dict] = []
+    warnings: List[str] = []
+    for dataset_rows, warning in results:
+        if warning:
+            warnings.append(warning)
+        aggregated.extend(dataset_rows)
+    return aggregated, warnings
+
+
 def load_evaluation_data(
     dataset_key: Optional[str] = None,
     limit: Optional[int] = None,
 ) -> List[dict]:
-    """Carga los datos de evaluación filtrados por dataset opcional."""
+    """Carga los datos de evaluación filtrados por dataset opcional.
 
-    datasets = [dataset_key] if dataset_key else _dataset_keys()
-    aggregated: List[dict] = []
+    Sin st.cache_data: las filas de cada dataset ya se comparten en memoria entre sesiones y
+    límites (ver load_evaluation_rows), y cachear aquí guardaría una copia por cada límite.
+    """
+
+    aggregated, warnings = read_evaluations(dataset_key, limit)
+    for warning in warnings:
+        st.warning(warning)
+    return aggregated
+
+
+def build_evaluation_context(records: List[dict], token_budget: Optional[int] = None) -> str:
+    """Convierte los registros en un bloque de texto compacto legible por el modelo.
+
+    Con `token_budget`, incluye solo los registros que caben (ver pack_evaluation_context).
+    """
+
+    return pack_evaluation_context(records, token_budget).text
 
-    for key in datasets:
-        path = DATASET_PATHS.get(key)
-        if not path:
-            st.warning(f"Dataset '{key}' no tiene una ruta configurada.")
-            continue
 
+def pack_evaluation_context(records: List[dict], token_budget: Optional[int] = None) -> PackedContext:
+    """Contexto compacto (encabezado de columnas + una fila por evaluación) dentro del presupuesto."""
+
+    return pack_evaluations(records, token_budget)
+
+
+def dataset_version(dataset_key: Optional[str]) -> Tuple:
+    """Tamaño y mtime de los archivos del dataset (o de todos): cambia cuando cambian los datos."""
+
+    version = []
+    for key in [dataset_key] if dataset_key else _dataset_keys():
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            st.warning(f"Archivo no encontrado para '{key}': {path}")
-            continue
-        except Exception as exc:  # pylint: disable=broad-except
-            st.warning(f"Error al cargar '{key}': {exc}")
-            continue
-
-        dataset_rows: List[dict] = []
-        for item in data:
-            evaluation = item.get("evaluacion_llamada_raw") or item.get("evaluacion_llamada")
-            if not evaluation:
-                continue
-            dataset_rows.append(
-                {
-                    "dataset": key,
-                    "id_llamada_procesada": item.get("id_llamada_procesada", ""),
-                    "evaluacion_llamada": evaluation,
-                }
-            )
+            signature = source_signature(DATASET_PATHS[key])
+            version.append((key, signature["size"], signature["mtime_ns"]))
+        except (KeyError, OSError):
+            version.append((key, None, None))
+    return tuple(version)
 
-        if limit:
-            dataset_rows = dataset_rows[: int(limit)]
 
-        aggregated.extend(dataset_rows)
+@st.cache_data(show_spinner=False)
+def load_packed_context(
+    dataset_key: str, limit: Optional[int], token_budget: int, version: Optional[Tuple] = None
+) -> PackedContext:
+    """Contexto empaquetado de los primeros `limit` registros, cacheado entre reruns.
 
-    return aggregated
+    `version` (ver dataset_version) solo forma parte de la clave de caché para reempaquetar si los datos cambian.
+    """
 
+    return pack_evaluation_context(load_evaluation_data(dataset_key, limit), token_budget)
 
-def build_evaluation_context(records: List[dict]) -> str:
-    """Convierte los registros en un bloque de texto legible por el modelo."""
 
-    if not records:
-        return ""
+def describe_packed_context(packed: PackedContext) -> str:
+    """Resumen para la interfaz de cuántos registros entraron en el contexto."""
 
-    segments: List[str] = []
-    for item in records:
-        evaluation = item.get("evaluacion_llamada", "")
-        if isinstance(evaluation, (dict, list)):
-            evaluation_text = json.dumps(evaluation, ensure_ascii=False)
-        else:
-            evaluation_text = str(evaluation)
-
-        segments.append(
-            "\n".join(
-                [
-                    "---",
-                    f"ID: {item.get('id_llamada_procesada', '')}",
-                    f"Dataset: {item.get('dataset', '')}",
-                    f"Evaluación: {evaluation_text}",
-                    "---",
-                ]
-            )
+    if packed.truncated:
+        return (
+            f"Contexto: {packed.included} de {packed.total} registros caben en el presupuesto "
+            f"(~{packed.tokens:,} tokens estimados)."
         )
-
-    return "\n".join(segments)
+    return f"Contexto: {packed.included} registros (~{packed.tokens:,} tokens estimados)."
 
 def _resolve_dataset(dataset_key: Optional[str], warning_prefix: str) -> str:
     options = _dataset_keys()
@@ -184,32 +256,67 @@ def _resolve_dataset(dataset_key: Optional[str], warning_prefix: str) -> str:
     return options[0]
 
 
-def get_gemini_response(prompt: str, evaluation_context: str = "") -> str:
-    """Genera una respuesta usando Gemini para el chat."""
+def retrieve_relevant_evaluations(dataset_key: str, query: str) -> Optional[List[dict]]:
+    """Los registros del dataset completo más relevantes para la consulta.
 
+    Devuelve None si la recuperación está desactivada o falla; en ese caso se usa el contexto fijo.
+    """
+
+    path = DATASET_PATHS.get(dataset_key)
+    if RETRIEVAL_MODE == "off" or not path:
+        return None
     try:
-        if evaluation_context:
-            enhanced_prompt = (
-                "Contexto de evaluaciones previas:\n"
-                f"{evaluation_context}\n\n"
-                "Consulta del usuario:\n"
-                f"{prompt}"
-            )
-        else:
-            enhanced_prompt = prompt
+        return get_evaluation_retriever(dataset_key, path).search(query, RETRIEVAL_TOP_K) or None
+    except Exception:  # pylint: disable=broad-except
+        return None
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[enhanced_prompt],
-            config=generate_content_config,
-        )
-        return response.text
-    except Exception as exc:  # pylint: disable=broad-except
-        return f"Lo siento, ocurrió un error al comunicarse con el modelo: {exc}"
 
+# Texto que sustituye al contexto en el prompt cuando ya viaja como contenido cacheado
+CACHED_CONTEXT_NOTE = "[Las evaluaciones se proporcionaron previamente como contexto de esta conversación]"
 
-def generate_structured_report(source_name: str, report_context: str, questions: List[str]) -> str:
-    """Genera un informe estratégico con el formato esperado."""
+
+def build_cached_context(dataset_key: str, evaluation_context: str) -> str:
+    """Contenido que se guarda en la caché de contexto de Gemini."""
+
+    return f"Contexto de evaluaciones previas (dataset '{dataset_key}'):\n{evaluation_context}"
+
+
+def context_cache_handle(dataset_key: str, record_limit: Optional[int], model: str, evaluation_context: str) -> Optional[str]:
+    """Handle de contexto cacheado en Gemini para estas evaluaciones, o None si no aplica."""
+
+    if not evaluation_context:
+        return None
+    return get_context_cache_registry().handle_for(
+        dataset_key,
+        int(record_limit) if record_limit else None,
+        model,
+        build_cached_context(dataset_key, evaluation_context),
+    )
+
+
+def _generation_config(cached_content: Optional[str]) -> types.GenerateContentConfig:
+    if not cached_content:
+        return generate_content_config
+    return generate_content_config.model_copy(update={"cached_content": cached_content})
+
+
+def build_chat_prompt(prompt: str, evaluation_context: str = "", context_cached: bool = False) -> str:
+    """Antepone el contexto de evaluaciones a la consulta del usuario."""
+
+    if context_cached:
+        return f"Consulta del usuario:\n{prompt}"
+    if not evaluation_context:
+        return prompt
+    return (
+        "Contexto de evaluaciones previas:\n"
+        f"{evaluation_context}\n\n"
+        "Consulta del usuario:\n"
+        f"{prompt}"
+    )
+
+
+def build_report_prompt(source_name: str, report_context: str, questions: List[str]) -> str:
+    """Prompt del informe estratégico con el formato esperado."""
 
     formatted_questions = "\n".join([f"- {question}" for question in questions])
 
@@ -242,22 +349,464 @@ Asume el rol de un **Analista Estratégico Senior de Experiencia del Cliente (CX
 
 Inicia el informe directamente sin mensajes introductorios adicionales.
 """
+    return report_prompt
+
+
+def _resolve_cached_content(contents: str, config: types.GenerateContentConfig):
+    """Con el backend local, antepone el texto cacheado al prompt en lugar de enviar su handle."""
+
+    if not config.cached_content:
+        return contents, config
+    cached_text = get_context_cache_registry().resolve(config.cached_content)
+    if cached_text is None:
+        return contents, config
+    return f"{cached_text}\n\n{contents}", config.model_copy(update={"cached_content": None})
+
+
+def _generate_content(operation: str, model: str, contents: str, config: types.GenerateContentConfig):
+    """Llamada bloqueante al modelo dentro del cupo global, medida como span 'gemini.<operation>'."""
+
+    contents, config = _resolve_cached_content(contents, config)
+    with model_call_slot(), span(
+        f"gemini.{operation}", model=model, cached=bool(config.cached_content), prompt_chars=len(contents)
+    ) as current:
+        response = get_genai_client().models.generate_content(model=model, contents=[contents], config=config)
+        record_usage(current, response)
+    return response
+
+
+def _stream_content(operation: str, model: str, contents: str, config: types.GenerateContentConfig) -> Iterator[str]:
+    """Igual que _generate_content, pero en streaming; el span registra también el primer fragmento."""
+
+    contents, config = _resolve_cached_content(contents, config)
+    with span(
+        f"gemini.{operation}", model=model, cached=bool(config.cached_content), prompt_chars=len(contents)
+    ) as current, ExitStack() as slot:
+        # El cupo cubre la solicitud hasta el primer fragmento (o el error); no queda retenido
+        # mientras el consumidor lee el resto o si abandona el generador
+        slot.enter_context(model_call_slot())
+        start = time.perf_counter()
+        stream = get_genai_client().models.generate_content_stream(model=model, contents=[contents], config=config)
+        for chunk in stream:
+            slot.close()
+            record_usage(current, chunk)
+            if chunk.text:
+                if "first_chunk_ms" not in current.attrs:
+                    current.set(first_chunk_ms=round((time.perf_counter() - start) * 1000, 1))
+                yield chunk.text
+
+
+def _generate_with_cache_fallback(
+    operation: str, model: str, build_contents: Callable[[bool], str], cached_content: Optional[str]
+):
+    """Genera usando el contexto cacheado; si el servidor lo rechaza, reintenta con el contexto completo."""
+
+    if cached_content:
+        try:
+            return _generate_content(operation, model, build_contents(True), _generation_config(cached_content))
+        except Exception:  # pylint: disable=broad-except
+            get_context_cache_registry().invalidate(cached_content)
+    return _generate_content(operation, model, build_contents(False), generate_content_config)
+
+
+def get_gemini_response(prompt: str, evaluation_context: str = "", cached_content: Optional[str] = None) -> str:
+    """Genera una respuesta usando Gemini para el chat.
+
+    Con `cached_content`, el contexto no se reenvía: se referencia el handle cacheado.
+    """
+
+    try:
+        response = _generate_with_cache_fallback(
+            "chat",
+            CHAT_MODEL,
+            lambda cached: build_chat_prompt(prompt, evaluation_context, context_cached=cached),
+            cached_content,
+        )
+        return response.text
+    except Exception as exc:  # pylint: disable=broad-except
+        return f"Lo siento, ocurrió un error al comunicarse con el modelo: {exc}"
+
+
+def stream_gemini_response(
+    prompt: str, evaluation_context: str = "", cached_content: Optional[str] = None
+) -> Iterator[str]:
+    """Igual que get_gemini_response, pero entrega el texto a medida que se genera."""
+
+    yield from _stream_content(
+        "chat_stream",
+        CHAT_MODEL,
+        build_chat_prompt(prompt, evaluation_context, context_cached=bool(cached_content)),
+        _generation_config(cached_content),
+    )
+
+
+def generate_structured_report(
+    source_name: str, report_context: str, questions: List[str], cached_content: Optional[str] = None
+) -> str:
+    """Genera un informe estratégico con el formato esperado."""
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=[report_prompt],
-            config=generate_content_config,
+        response = _generate_with_cache_fallback(
+            "report",
+            REPORT_MODEL,
+            lambda cached: build_report_prompt(
+                source_name, CACHED_CONTEXT_NOTE if cached else report_context, questions
+            ),
+            cached_content,
         )
         return response.text
     except Exception as exc:  # pylint: disable=broad-except
-        return f"Lo siento, ocurrió un error al generar el informe: {exc}"
+        return f"{REPORT_ERROR_PREFIX}: {exc}"
+
+
+def stream_structured_report(
+    source_name: str, report_context: str, questions: List[str], cached_content: Optional[str] = None
+) -> Iterator[str]:
+    """Igual que generate_structured_report, pero entrega el texto a medida que se genera."""
+
+    yield from _stream_content(
+        "report_stream",
+        REPORT_MODEL,
+        build_report_prompt(source_name, CACHED_CONTEXT_NOTE if cached_content else report_context, questions),
+        _generation_config(cached_content),
+    )
+
+
+def generate_partial_analysis(prompt: str) -> str:
+    """Análisis parcial de un bloque (fase map); los errores se propagan para reintentar."""
+
+    return _generate_content("report_map", REPORT_MAP_MODEL, prompt, generate_content_config).text or ""
+
+
+def generate_report_section(
+    source_name: str, report_context: str, question: str, number: int, total: int, cached_content: Optional[str] = None
+) -> str:
+    """Sección de una pregunta (modo por pregunta); los errores se propagan para reintentar."""
+
+    response = _generate_with_cache_fallback(
+        "report_section",
+        REPORT_MODEL,
+        lambda cached: build_section_prompt(
+            source_name, CACHED_CONTEXT_NOTE if cached else report_context, question, number, total
+        ),
+        cached_content,
+    )
+    if not response.text:
+        raise RuntimeError("El modelo devolvió una sección vacía.")
+    return response.text
+
+
+def generate_report_synthesis(source_name: str, sections: List[ReportSection]) -> str:
+    """Resumen ejecutivo y tabla de insights a partir de las secciones; no reenvía las evaluaciones."""
+
+    response = _generate_content("report_synthesis", REPORT_MODEL, build_synthesis_prompt(source_name, sections), generate_content_config)
+    if not response.text:
+        raise RuntimeError("El modelo devolvió una síntesis vacía.")
+    return response.text
+
+
+def generate_sectioned_report(
+    source_name: str,
+    report_context: str,
+    questions: List[str],
+    cached_content: Optional[str] = None,
+    report_key: Optional[str] = None,
+    on_progress: Callable[[int, int, str], None] = lambda done, total, partial: None,
+) -> str:
+    """Informe en modo por pregunta: secciones en paralelo sobre el mismo contexto y una síntesis final.
+
+    Con `report_key`, cada sección terminada se guarda en la caché de informes; si alguna falla,
+    el siguiente intento solo regenera las que faltan. `on_progress(terminadas, total, parcial)`
+    recibe el informe ensamblado hasta el momento.
+    """
+
+    report_cache = get_report_cache()
+    completed = {}
+    if report_key:
+        for number in range(1, len(questions) + 1):
+            entry = report_cache.get(section_cache_key(report_key, number))
+            if entry:
+                completed[number] = entry["section"]
+
+    total = len(questions)
+    sections: List[ReportSection] = []
+    for section in run_section_phase(
+        questions,
+        lambda number, question: generate_report_section(source_name, report_context, question, number, total, cached_content),
+        completed,
+    ):
+        sections.append(section)
+        if section.text is not None and report_key and section.number not in completed:
+            report_cache.put(section_cache_key(report_key, section.number), {"section": section.text})
+        on_progress(len(sections), total, assemble_report(sections))
+
+    failed = [section for section in sections if section.text is None]
+    if failed:
+        numbers = ", ".join(str(section.number) for section in sorted(failed, key=lambda section: section.number))
+        raise RuntimeError(
+            f"No se pudieron generar las secciones {numbers} ({failed[0].error}). "
+            "Vuelve a generar el informe: solo se repetirán esas secciones."
+        )
+
+    sections.sort(key=lambda section: section.number)
+    synthesis, error = None, ""
+    for _ in range(REPORT_SECTION_ATTEMPTS):
+        try:
+            synthesis = generate_report_synthesis(source_name, sections)
+            break
+        except Exception as exc:  # pylint: disable=broad-except
+            error = str(exc)
+    if synthesis is None:
+        raise RuntimeError(f"No se pudo redactar el resumen ejecutivo: {error}")
+    return assemble_report(sections, synthesis)
+
+
+def map_reduce_report_context(
+    source_name: str,
+    evaluations: List[dict],
+    questions: List[str],
+    on_progress: Callable[[int, int, int], None] = lambda done, total, failed: None,
+) -> str:
+    """Contexto del informe en modo map-reduce: análisis parciales por bloque, en paralelo.
+
+    Si todo cabe en un solo bloque, devuelve el contexto completo y no hay fase map.
+    `on_progress(terminados, total, fallidos)` se invoca tras cada bloque.
+    """
+
+    shards = shard_records(evaluations)
+    if len(shards) <= 1:
+        return shards[0].text if shards else ""
+
+    partials = []
+    failed = 0
+    for partial in run_map_phase(source_name, shards, questions, generate_partial_analysis):
+        partials.append(partial)
+        failed += partial.text is None
+        on_progress(len(partials), len(shards), failed)
+
+    if failed == len(partials):
+        errors = [partial.error for partial in partials if partial.error]
+        raise RuntimeError(f"No se pudo analizar ningún bloque: {errors[0] if errors else 'error desconocido'}")
+    return build_reduce_context(partials)
+
+
+def report_model_config(map_reduce: bool, per_question: bool = False) -> dict:
+    """Todo lo que, además de los datos y las preguntas, cambia el resultado de un informe."""
+
+    config = {
+        "model": REPORT_MODEL,
+        "generation": generate_content_config.model_dump(mode="json", exclude_none=True),
+        "context": {
+            "drop_fields": sorted(CONTEXT_DROP_FIELDS),
+            "transcript_chars": CONTEXT_TRANSCRIPT_CHARS,
+            "field_chars": CONTEXT_FIELD_CHARS,
+        },
+    }
+    if map_reduce:
+        config["map_reduce"] = {"model": REPORT_MAP_MODEL, "chunk_tokens": REPORT_CHUNK_TOKENS}
+    if per_question:
+        config["per_question"] = True
+    return config
+
+
+def report_succeeded(report_text: str) -> bool:
+    """Un informe con error o interrumpido no se guarda en la caché."""
+
+    return bool(report_text) and not report_text.startswith(REPORT_ERROR_PREFIX) and STREAM_INTERRUPTED_NOTICE not in report_text
+
+
+def write_streamed_response(
+    stream_factory: Callable[[], Iterator[str]],
+    blocking_fallback: Callable[[], str],
+) -> str:
+    """Muestra la respuesta token a token con st.write_stream y devuelve el texto completo.
+
+    Si el streaming está desactivado o falla antes del primer fragmento, usa el modo bloqueante.
+    """
+
+    if not GEMINI_STREAMING or not hasattr(st, "write_stream"):
+        with st.spinner("Pensando..."):
+            text = blocking_fallback()
+        st.markdown(text)
+        return text
+
+    received: List[str] = []
+
+    def _tokens() -> Iterator[str]:
+        for token in stream_factory():
+            received.append(token)
+            yield token
+
+    try:
+        st.write_stream(_tokens())
+        return "".join(received)
+    except Exception as exc:  # pylint: disable=broad-except
+        if received:
+            notice = f"\n\n{STREAM_INTERRUPTED_NOTICE}: {exc}_"
+            st.markdown(notice)
+            return "".join(received) + notice
+        with st.spinner("Pensando..."):
+            text = blocking_fallback()
+        st.markdown(text)
+        return text
+
+
+def run_report_job(job: JobContext) -> str:
+    """Genera un informe en un hilo de la cola; el avance y el texto parcial quedan persistidos."""
+
+    params = job.params
+    dataset_key = params["dataset"]
+    map_reduce = params["map_reduce"]
+    questions = QUESTIONS_FOR_REPORTS[dataset_key]
+
+    job.update(0.0, "Cargando evaluaciones...")
+    evaluations, _ = read_evaluations(dataset_key, None if map_reduce else params["record_limit"])
+    if not evaluations:
+        raise RuntimeError("No hay datos disponibles para generar el informe.")
+
+    if map_reduce:
+        def _on_progress(done: int, total: int, failed: int) -> None:
+            suffix = f" ({failed} con error)" if failed else ""
+            job.update(0.8 * done / total, f"Bloques analizados: {done}/{total}{suffix}")
+
+        analyzed_count = len(evaluations)
+        report_context = map_reduce_report_context(dataset_key, evaluations, questions, _on_progress)
+        cached_content = None
+    else:
+        packed_context = pack_evaluation_context(evaluations, REPORT_CONTEXT_TOKENS)
+        analyzed_count = packed_context.included
+        report_context = packed_context.text
+        cached_content = context_cache_handle(dataset_key, params["record_limit"], REPORT_MODEL, report_context)
+
+    start = 0.8 if map_reduce else 0.1
+    if params.get("per_question"):
+        def _on_section(done: int, total: int, partial: str) -> None:
+            job.update(start + (0.95 - start) * done / total, f"Secciones redactadas: {done}/{total}")
+            job.partial(partial, force=True)
+
+        job.update(start, f"Redactando {len(questions)} secciones en paralelo con {analyzed_count} registros...")
+        report_text = generate_sectioned_report(
+            dataset_key,
+            report_context,
+            questions,
+            cached_content,
+            report_key=params["cache_key"] if params.get("reuse_sections", True) else None,
+            on_progress=_on_section,
+        )
+        get_report_cache().put(
+            params["cache_key"],
+            {"dataset": dataset_key, "records": analyzed_count, "map_reduce": map_reduce, "report": report_text},
+        )
+        return report_text
+
+    job.update(start, f"Redactando el informe con {analyzed_count} registros...")
+    received: List[str] = []
+    report_text = ""
+    if GEMINI_STREAMING:
+        try:
+            for token in stream_structured_report(dataset_key, report_context, questions, cached_content):
+                received.append(token)
+                if job.partial_due():
+                    job.partial("".join(received))
+            report_text = "".join(received)
+        except Exception as exc:  # pylint: disable=broad-except
+            if received:
+                raise RuntimeError(f"Respuesta interrumpida: {exc}") from exc
+    if not report_text:
+        report_text = generate_structured_report(dataset_key, report_context, questions, cached_content)
+
+    if not report_succeeded(report_text):
+        raise RuntimeError(report_text)
+    get_report_cache().put(
+        params["cache_key"],
+        {"dataset": dataset_key, "records": analyzed_count, "map_reduce": map_reduce, "report": report_text},
+    )
+    return report_text
+
+
+def report_job_queue():
+    """Cola de trabajos con el handler de informes registrado (retoma los pendientes tras un reinicio)."""
+
+    queue = get_job_queue()
+    queue.register(REPORT_JOB_KIND, run_report_job)
+    return queue
+
+
+def _show_report_job(job: Job) -> None:
+    started_at = time.strftime("%H:%M", time.localtime(job.created_at))
+    if job.active:
+        st.progress(min(max(job.progress, 0.0), 1.0), text=job.message or "En cola")
+        st.caption(f"Informe {job.label or ''} · iniciado a las {started_at}. Puedes navegar: el trabajo sigue en segundo plano.")
+        if job.partial:
+            st.markdown("---")
+            st.markdown(job.partial)
+    elif job.status == DONE:
+        st.caption(f"Informe {job.label or ''} · iniciado a las {started_at}.")
+        st.markdown("---")
+        st.markdown(job.result or "")
+        st.success("¡Informe generado con éxito!")
+    else:
+        st.error(f"No se pudo generar el informe: {job.error}")
+
+
+def _poll_report_job(job_id: str) -> None:
+    job = report_job_queue().get(job_id)
+    if job is None:
+        return
+    _show_report_job(job)
+    if not job.active:
+        # Terminó: un rerun completo muestra el resultado y detiene el sondeo
+        st.rerun()
+
+
+if hasattr(st, "fragment"):
+    _poll_report_job = st.fragment(run_every=REPORT_POLL_SECONDS)(_poll_report_job)
+
+
+def render_report_job(job_id: str) -> None:
+    """Muestra el estado de un trabajo de informe; mientras esté activo, lo sondea sin bloquear la sesión."""
+
+    job = report_job_queue().get(job_id)
+    if job is None:
+        return
+    if not job.active:
+        _show_report_job(job)
+    elif hasattr(st, "fragment"):
+        _poll_report_job(job_id)
+    else:
+        _show_report_job(job)
+        st.button("🔄 Actualizar estado", key=f"refresh_report_job_{job_id}")
+
+
+def _attach_report_job(state_key: str, job_id: str) -> None:
+    st.session_state[state_key] = job_id
+
+
+def render_active_report_jobs(dataset_key: str, state_key: str) -> None:
+    """Informes en curso de este dataset lanzados por cualquier sesión, para acoplarse a ellos."""
+
+    current = st.session_state.get(state_key)
+    jobs = [
+        job
+        for job in report_job_queue().recent(REPORT_JOB_KIND, active_only=True)
+        if job.params.get("dataset") == dataset_key and job.id != current
+    ]
+    if not jobs:
+        return
+    with st.expander(f"⏳ Informes en curso ({len(jobs)})"):
+        for job in jobs:
+            col_label, col_attach = st.columns([4, 1])
+            with col_label:
+                st.caption(f"{job.label or job.id[:8]} · {job.message or ''} · {job.progress:.0%}")
+            with col_attach:
+                st.button("Ver", key=f"attach_report_job_{job.id}", on_click=_attach_report_job, args=(state_key, job.id))
 
 
 def render_chat_view(
     dataset_key: Optional[str],
     record_limit: Optional[int],
     allow_dataset_selector: bool,
+    standalone: bool = False,
 ) -> None:
     st.header("Chat con Asistente de Evaluaciones")
     st.info("Realiza preguntas abiertas sobre la fuente de datos seleccionada.")
@@ -294,9 +843,14 @@ def render_chat_view(
         st.error("No se encontraron registros con la configuración actual.")
         return
 
-    evaluation_context = build_evaluation_context(evaluations)
+    packed_context = load_packed_context(
+        effective_dataset, record_limit, CHAT_CONTEXT_TOKENS, dataset_version(effective_dataset)
+    )
+    evaluation_context = packed_context.text
+    if packed_context.truncated:
+        st.caption(describe_packed_context(packed_context))
 
-    if STANDALONE_MODE:
+    if standalone:
         st.sidebar.success(
             f"Cargados {len(evaluations)} registros de '{effective_dataset}' para el chat."
         )
@@ -318,10 +872,31 @@ def render_chat_view(
         with st.chat_message("user"):
             st.markdown(prompt)
 
+        # La recuperación se limita a propósito a los contextos que exceden el presupuesto. Si el
+        # contexto fijo cubre todos los registros, el modelo ya los ve todos y viajan una sola vez
+        # como contenido cacheado; rankear en ese caso cambiaría el contexto en cada pregunta, lo
+        # que anula la caché y agrega una búsqueda por mensaje sin sumar información. Si no cabe,
+        # se envían solo los registros relevantes para la pregunta, buscados en todo el dataset
+        relevant = (
+            retrieve_relevant_evaluations(effective_dataset, prompt) if packed_context.truncated else None
+        )
+        if relevant is not None:
+            relevant_context = pack_evaluation_context(relevant, CHAT_CONTEXT_TOKENS)
+            prompt_context = relevant_context.text
+            cached_content = None
+        else:
+            prompt_context = evaluation_context
+            cached_content = context_cache_handle(effective_dataset, record_limit, CHAT_MODEL, evaluation_context)
         with st.chat_message("assistant"):
-            with st.spinner("Pensando..."):
-                response = get_gemini_response(prompt, evaluation_context)
-                st.markdown(response)
+            if relevant is not None:
+                st.caption(
+                    f"Contexto: {relevant_context.included} evaluaciones relevantes de '{effective_dataset}' "
+                    f"(~{relevant_context.tokens:,} tokens estimados)."
+                )
+            response = write_streamed_response(
+                lambda: stream_gemini_response(prompt, prompt_context, cached_content),
+                lambda: get_gemini_response(prompt, prompt_context, cached_content),
+            )
 
         st.session_state[messages_key].append({"role": "assistant", "content": response})
 
@@ -330,6 +905,7 @@ def render_report_view(
     dataset_key: Optional[str],
     record_limit: Optional[int],
     allow_dataset_selector: bool,
+    standalone: bool = False,
 ) -> None:
     st.header("Generador de Informes Estratégicos")
     st.info("Selecciona una fuente y genera un informe con preguntas predefinidas.")
@@ -371,53 +947,109 @@ def render_report_view(
         st.error(f"No hay preguntas predefinidas para '{effective_dataset}'.")
         return
 
+    map_reduce = st.checkbox(
+        "🧩 Analizar el dataset completo (map-reduce)",
+        value=REPORT_MAP_REDUCE,
+        key=f"report_map_reduce_{effective_dataset}",
+        help="Divide todas las evaluaciones en bloques, los analiza en paralelo y consolida el informe.",
+    )
+    per_question = st.checkbox(
+        "⚡ Redactar por pregunta en paralelo",
+        value=REPORT_PER_QUESTION,
+        key=f"report_per_question_{effective_dataset}",
+        help="Una llamada al modelo por pregunta, todas a la vez, y un resumen final: el informe tarda lo que la pregunta más lenta.",
+    )
+    if map_reduce:
+        evaluations = load_evaluation_data(effective_dataset, None)
+        analyzed_count = len(evaluations)
+    else:
+        packed_context = load_packed_context(
+            effective_dataset, record_limit, REPORT_CONTEXT_TOKENS, dataset_version(effective_dataset)
+        )
+        analyzed_count = packed_context.included
+
     st.write(
-        f"Se analizarán **{len(evaluations)}** registros del dataset **{effective_dataset}**."
+        f"Se analizarán **{analyzed_count}** registros del dataset **{effective_dataset}**."
     )
+    if not map_reduce and packed_context.truncated:
+        st.caption(describe_packed_context(packed_context))
 
     button_key = f"generate_report_button_{effective_dataset}"
-    if st.button("✨ Generar Informe", key=button_key):
-        report_context = build_evaluation_context(evaluations)
-        with st.spinner(
-            f"Analizando {len(evaluations)} registros de '{effective_dataset}' y generando informe..."
-        ):
-            report_text = generate_structured_report(
-                effective_dataset,
-                report_context,
-                questions,
-            )
+    job_state_key = f"report_job_{effective_dataset}"
+    col_generate, col_regenerate = st.columns([1, 1])
+    with col_generate:
+        generate = st.button("✨ Generar Informe", key=button_key)
+    with col_regenerate:
+        regenerate = st.button(
+            "🔄 Regenerar sin caché",
+            key=f"regenerate_report_button_{effective_dataset}",
+            help="Ignora el informe guardado para estos datos y preguntas y lo genera de nuevo.",
+        )
 
-        st.success("¡Informe generado con éxito!")
-        st.markdown("---")
-        st.markdown(report_text)
+    if generate or regenerate:
+        # Mismos datos, preguntas, prompt y modelo → mismo informe: se sirve desde la caché en disco
+        analyzed = evaluations if map_reduce else evaluations[:analyzed_count]
+        cache_key = report_cache_key(
+            effective_dataset,
+            records_digest(analyzed),
+            questions,
+            REPORT_PROMPT_VERSION,
+            report_model_config(map_reduce, per_question),
+        )
+        report_cache = get_report_cache()
+        cached_report = None if regenerate else report_cache.get(cache_key)
+        if cached_report:
+            st.session_state.pop(job_state_key, None)
+            generated_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(cached_report["created_at"]))
+            st.caption(f"Informe recuperado de la caché (generado el {generated_at} con {cached_report['records']} registros).")
+            st.markdown("---")
+            st.markdown(cached_report["report"])
+            st.success("¡Informe generado con éxito!")
+            return
+
+        # La generación corre en la cola en segundo plano: sobrevive a reruns y reconexiones, y
+        # una solicitud idéntica ya en curso (misma clave) se reutiliza en lugar de duplicarse.
+        # Regenerar usa su propia clave: no debe sumarse a un trabajo que reutiliza secciones
+        job = report_job_queue().submit(
+            REPORT_JOB_KIND,
+            {
+                "dataset": effective_dataset,
+                "record_limit": int(record_limit) if record_limit else None,
+                "map_reduce": map_reduce,
+                "per_question": per_question,
+                # Al regenerar sin caché tampoco se reutilizan secciones de intentos anteriores
+                "reuse_sections": not regenerate,
+                "cache_key": cache_key,
+            },
+            dedupe_key=f"{cache_key}:regenerar" if regenerate else cache_key,
+            label=f"{effective_dataset} · {analyzed_count} registros"
+            + (" · map-reduce" if map_reduce else "")
+            + (" · por pregunta" if per_question else ""),
+        )
+        st.session_state[job_state_key] = job.id
+
+    render_active_report_jobs(effective_dataset, job_state_key)
+    if st.session_state.get(job_state_key):
+        render_report_job(st.session_state[job_state_key])
 
 
-def render_tabs_layout() -> None:
-    if STANDALONE_MODE:
+def render_tabs_layout(standalone: bool = False) -> None:
+    if standalone:
         st.title("Auditbot CX - BdB")
 
     tab_chat, tab_report = st.tabs(["💬 Chat Interactivo", "📊 Generador de Informes"])
     with tab_chat:
-        render_chat_view(dataset_key=None, record_limit=None, allow_dataset_selector=True)
+        render_chat_view(dataset_key=None, record_limit=None, allow_dataset_selector=True, standalone=standalone)
     with tab_report:
-        render_report_view(dataset_key=None, record_limit=None, allow_dataset_selector=True)
+        render_report_view(dataset_key=None, record_limit=None, allow_dataset_selector=True, standalone=standalone)
 
 
-def render_mode_layout() -> None:
-    if resolved_mode == "chat":
-        render_chat_view(
-            dataset_key=CHAT_DATASET,
-            record_limit=CHAT_LIMIT,
-            allow_dataset_selector=False,
-        )
-    elif resolved_mode == "report":
-        render_report_view(
-            dataset_key=REPORT_DATASET,
-            record_limit=REPORT_LIMIT,
-            allow_dataset_selector=False,
-        )
-    else:
-        render_tabs_layout()
+def main() -> None:
+    """Punto de entrada al ejecutar `streamlit run chat_servicios_v2.py`."""
+
+    configure_standalone_page()
+    render_tabs_layout(standalone=True)
 
 
-render_mode_layout()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
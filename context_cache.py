@@ -0,0 +1,209 @@
+import hashlib
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from google.genai import types
+
+from gcp_clients import get_genai_client
+from telemetry import span
+
+# --- CONFIGURACIÓN DE CACHÉ DE CONTEXTO EN GEMINI ---
+# "gemini": caché en el servidor; "local": stub en memoria para pruebas offline; "off": desactivada
+CONTEXT_CACHE_BACKEND = os.environ.get("AUDITBOT_CONTEXT_CACHE", "gemini").lower()
+CONTEXT_CACHE_TTL_SECONDS = int(os.environ.get("AUDITBOT_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+# Gemini exige un mínimo de tokens para cachear; por debajo no compensa (≈4 caracteres por token)
+CONTEXT_CACHE_MIN_CHARS = int(os.environ.get("AUDITBOT_CONTEXT_CACHE_MIN_CHARS", str(4096 * 4)))
+# Renovar el handle un poco antes de que venza en el servidor
+_REFRESH_MARGIN_SECONDS = 60
+# Si la creación falla, no reintentar en cada turno
+_FAILURE_BACKOFF_SECONDS = 300
+# Espera máxima de un hilo mientras otro crea el mismo contenido cacheado
+_CREATE_WAIT_SECONDS = 120
+
+
+class GeminiCacheBackend:
+    """Crea y elimina `cachedContents` en Gemini."""
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or get_genai_client()
+
+    def create(self, model: str, text: str, ttl_seconds: int, display_name: str) -> str:
+        with span("gemini.cache_create", model=model, prompt_chars=len(text)):
+            cached = self.client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    contents=[types.Content(role="user", parts=[types.Part.from_text(text=text)])],
+                    display_name=display_name,
+                    ttl=f"{ttl_seconds}s",
+                ),
+            )
+        return cached.name
+
+    def delete(self, name: str) -> None:
+        self.client.caches.delete(name=name)
+
+
+class LocalCacheBackend:
+    """Stub en memoria con la misma interfaz, para probar la lógica de caché sin red."""
+
+    def __init__(self):
+        self.contents: Dict[str, Tuple[str, str, float]] = {}
+        self._ids = itertools.count(1)
+
+    def create(self, model: str, text: str, ttl_seconds: int, display_name: str) -> str:
+        name = f"cachedContents/local-{next(self._ids)}-{display_name}"
+        self.contents[name] = (model, text, time.time() + ttl_seconds)
+        return name
+
+    def delete(self, name: str) -> None:
+        self.contents.pop(name, None)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Texto cacheado bajo `name`, o None si no existe o venció."""
+
+        entry = self.contents.get(name)
+        if entry is None or entry[2] < time.time():
+            return None
+        return entry[1]
+
+
+@dataclass
+class _CacheEntry:
+    name: Optional[str]
+    expires_at: float
+
+
+class ContextCacheRegistry:
+    """Handles de contexto cacheado por (dataset, límite, modelo, huella de los datos).
+
+    Un handle se reutiliza mientras no venza el TTL y la huella del contexto no cambie;
+    cuando cambia, se crea uno nuevo y se elimina el anterior del mismo alcance.
+    """
+
+    def __init__(
+        self,
+        backend,
+        ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS,
+        min_chars: int = CONTEXT_CACHE_MIN_CHARS,
+    ):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.min_chars = min_chars
+        self._entries: Dict[tuple, _CacheEntry] = {}
+        self._scopes: Dict[tuple, tuple] = {}
+        self._pending: Dict[tuple, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def handle_for(self, dataset: str, limit: Optional[int], model: str, text: str) -> Optional[str]:
+        """Nombre del contenido cacheado para `text`, creándolo si hace falta; None si no aplica.
+
+        La creación (una llamada de red) ocurre fuera del candado: solo el primer hilo que pide
+        una clave la crea y los demás esperan ese resultado, sin bloquear otras claves.
+        """
+
+        if self.backend is None or len(text) < self.min_chars:
+            return None
+
+        fingerprint = self.fingerprint(text)
+        scope = (dataset, limit, model)
+        key = scope + (fingerprint,)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at - _REFRESH_MARGIN_SECONDS > time.time():
+                return entry.name
+            pending = self._pending.get(key)
+            creator = pending is None
+            if creator:
+                pending = self._pending[key] = threading.Event()
+
+        if not creator:
+            pending.wait(_CREATE_WAIT_SECONDS)
+            with self._lock:
+                entry = self._entries.get(key)
+            return entry.name if entry is not None else None
+
+        stale_names = []
+        name = None
+        try:
+            try:
+                name = self.backend.create(model, text, self.ttl_seconds, f"auditbot-{dataset}-{fingerprint[:12]}")
+                expires_at = time.time() + self.ttl_seconds
+            except Exception:  # pylint: disable=broad-except
+                # Contexto demasiado corto para el modelo, cuota, etc.: seguir sin caché por un rato
+                expires_at = time.time() + _FAILURE_BACKOFF_SECONDS
+
+            with self._lock:
+                for stale_key in dict.fromkeys((self._scopes.get(scope), key)):
+                    stale = self._entries.pop(stale_key, None)
+                    if stale is not None and stale.name and stale.name != name:
+                        stale_names.append(stale.name)
+                self._entries[key] = _CacheEntry(name, expires_at)
+                self._scopes[scope] = key
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+
+        for stale_name in stale_names:
+            self._delete(stale_name)
+        return name
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Texto de un handle local para enviarlo en el prompt; None si el backend es el de Gemini.
+
+        El backend local no existe en el servidor: sus handles nunca deben llegar a la API.
+        Si el handle local ya no existe, lanza KeyError para que el llamador reenvíe el contexto completo.
+        """
+
+        if not isinstance(self.backend, LocalCacheBackend):
+            return None
+        text = self.backend.resolve(name)
+        if text is None:
+            raise KeyError(f"Contenido cacheado local no disponible: {name}")
+        return text
+
+    def invalidate(self, name: str) -> None:
+        """Descarta un handle que el servidor rechazó (p. ej. vencido antes de tiempo)."""
+
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.name == name:
+                    self._entries.pop(key)
+        self._delete(name)
+
+    def _delete(self, name: str) -> None:
+        try:
+            self.backend.delete(name)
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+
+_registry: Optional[ContextCacheRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_context_cache_registry() -> ContextCacheRegistry:
+    """Registro único del proceso, con el backend elegido en AUDITBOT_CONTEXT_CACHE."""
+
+    global _registry  # pylint: disable=global-statement
+    with _registry_lock:
+        if _registry is None:
+            backend = {
+                "gemini": GeminiCacheBackend,
+                "local": LocalCacheBackend,
+            }.get(CONTEXT_CACHE_BACKEND)
+            _registry = ContextCacheRegistry(backend() if backend else None)
+        return _registry
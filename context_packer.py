@@ -0,0 +1,226 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from evaluation_store import PRECISION_FIELDS, TRANSCRIPT_FIELD, parse_evaluation
+
+# --- CONFIGURACIÓN DEL EMPAQUETADO DE CONTEXTO ---
+# Metadatos que no aportan al análisis: identificadores repetidos, rutas, datos de contacto y de procesamiento
+DEFAULT_DROP_FIELDS = (
+    "id_llamada_procesada",
+    "id_original_path",
+    "celular",
+    "fecha_procesamiento",
+    "modelo",
+    "version_prompt",
+)
+# Campos de la evaluación que no se envían al modelo (separados por coma; vacío = enviar todos)
+CONTEXT_DROP_FIELDS = frozenset(
+    field.strip()
+    for field in os.environ.get("AUDITBOT_CONTEXT_DROP_FIELDS", ",".join(DEFAULT_DROP_FIELDS)).split(",")
+    if field.strip()
+)
+# Máximo de caracteres por transcripción (0 = completa); ~3000 caracteres son unos 750 tokens
+CONTEXT_TRANSCRIPT_CHARS = int(os.environ.get("AUDITBOT_CONTEXT_TRANSCRIPT_CHARS", "3000"))
+# Máximo de caracteres para el resto de campos de texto
+CONTEXT_FIELD_CHARS = int(os.environ.get("AUDITBOT_CONTEXT_FIELD_CHARS", "1000"))
+
+MISSING_VALUE = "-"
+FIELD_SEPARATOR = " | "
+TRANSCRIPT_PREFIX = "  T: "
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación local y rápida de tokens para texto en español.
+
+    Cuenta signos de puntuación como un token y palabras como 1 token más uno por cada
+    6 caracteres adicionales, lo que se aproxima al tokenizador de Gemini sin llamarlo.
+    """
+
+    return sum(1 + (len(piece) - 1) // 6 for piece in _TOKEN_PATTERN.findall(text))
+
+
+def _clip(text: str, limit: int) -> str:
+    if limit and len(text) > limit:
+        return text[:limit].rstrip() + "…"
+    return text
+
+
+def _compact_value(value, limit: int) -> str:
+    if value is None or value == "" or value == [] or value == {}:
+        return MISSING_VALUE
+    if isinstance(value, bool):
+        text = "sí" if value else "no"
+    elif isinstance(value, float):
+        text = str(int(value)) if value.is_integer() else f"{value:.2f}"
+    elif isinstance(value, (dict, list)):
+        text = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = " ".join(str(value).split())
+    # El separador de columnas no puede aparecer dentro de un valor
+    return _clip(text.replace("|", "/"), limit)
+
+
+def _evaluation_fields(raw) -> dict:
+    """Campos de la evaluación; un texto que no es JSON se conserva completo como 'evaluacion'."""
+
+    if isinstance(raw, str):
+        try:
+            parsed = json.loads(raw)
+        except ValueError:
+            return {"evaluacion": raw}
+        return parsed if isinstance(parsed, dict) else {"evaluacion": parsed}
+    return parse_evaluation(raw)
+
+
+@dataclass
+class PackedContext:
+    """Contexto compacto listo para el prompt y cuántos registros entraron en el presupuesto."""
+
+    text: str
+    included: int
+    total: int
+    tokens: int
+    start: int = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.included < self.total
+
+
+class _Packer:
+    """Serializa registros de evaluación en filas compactas con un encabezado de columnas común."""
+
+    def __init__(self, single_dataset: Optional[str], transcript_chars: int, field_chars: int, drop_fields=CONTEXT_DROP_FIELDS):
+        self.single_dataset = single_dataset
+        self.transcript_chars = transcript_chars
+        self.field_chars = field_chars
+        self.excluded = set(drop_fields) | {TRANSCRIPT_FIELD}
+        self.include_transcripts = TRANSCRIPT_FIELD not in drop_fields
+        self.columns: List[str] = [field for field in PRECISION_FIELDS]
+        self._positions: Dict[str, int] = {field: position for position, field in enumerate(self.columns)}
+        self.has_transcripts = False
+
+    def discard_columns_from(self, count: int) -> None:
+        """Retira las columnas agregadas por una fila que finalmente no entró."""
+
+        for field in self.columns[count:]:
+            del self._positions[field]
+        del self.columns[count:]
+
+    def header(self) -> str:
+        fixed = ["id"] if self.single_dataset else ["id", "dataset"]
+        scope = f" del dataset '{self.single_dataset}'" if self.single_dataset else ""
+        lines = [
+            f"Evaluaciones de llamadas{scope}: una por línea, campos separados por \"{FIELD_SEPARATOR.strip()}\" "
+            f"en el orden indicado; \"{MISSING_VALUE}\" indica un dato ausente.",
+            "Columnas: " + FIELD_SEPARATOR.join(fixed + self.columns),
+        ]
+        if self.has_transcripts:
+            lines.append(f"La línea siguiente que empieza con \"{TRANSCRIPT_PREFIX.strip()}\" es la transcripción de la llamada.")
+        return "\n".join(lines)
+
+    def row(self, record: dict) -> str:
+        evaluation = _evaluation_fields(record.get("evaluacion_llamada"))
+        values: List[str] = [MISSING_VALUE] * len(self.columns)
+        for field, value in evaluation.items():
+            if field in self.excluded:
+                continue
+            position = self._positions.get(field)
+            if position is None:
+                # Campo nuevo: se agrega al final del encabezado; las filas previas lo omiten
+                position = self._positions[field] = len(self.columns)
+                self.columns.append(field)
+                values.append(MISSING_VALUE)
+            values[position] = _compact_value(value, self.field_chars)
+        while values and values[-1] == MISSING_VALUE:
+            values.pop()
+
+        prefix = [_compact_value(record.get("id_llamada_procesada"), 0)]
+        if not self.single_dataset:
+            prefix.append(_compact_value(record.get("dataset"), 0))
+        line = FIELD_SEPARATOR.join(prefix + values)
+
+        transcript = evaluation.get(TRANSCRIPT_FIELD)
+        if transcript and self.include_transcripts:
+            self.has_transcripts = True
+            line += "\n" + TRANSCRIPT_PREFIX + _compact_value(transcript, self.transcript_chars)
+        return line
+
+
+def _single_dataset(records: Sequence[dict]) -> Optional[str]:
+    datasets = {record.get("dataset") for record in records}
+    return next(iter(datasets)) if len(datasets) == 1 else None
+
+
+def _pack_from(
+    records: Sequence[dict],
+    start: int,
+    token_budget: Optional[int],
+    single_dataset: Optional[str],
+    transcript_chars: int,
+    field_chars: int,
+) -> PackedContext:
+    packer = _Packer(single_dataset, transcript_chars, field_chars)
+    # Se cuenta el encabezado con la nota de transcripciones: cota superior de su tamaño final
+    packer.has_transcripts = True
+    tokens = estimate_tokens(packer.header())
+    packer.has_transcripts = False
+
+    rows: List[str] = []
+    for position in range(start, len(records)):
+        columns_before = len(packer.columns)
+        had_transcripts = packer.has_transcripts
+        row = packer.row(records[position])
+        row_tokens = estimate_tokens(row) + 1
+        # Las columnas nuevas también ocupan lugar en el encabezado
+        header_tokens = sum(estimate_tokens(column) + 1 for column in packer.columns[columns_before:])
+        if token_budget is not None and rows and tokens + row_tokens + header_tokens > token_budget:
+            packer.discard_columns_from(columns_before)
+            packer.has_transcripts = had_transcripts
+            break
+        rows.append(row)
+        tokens += row_tokens + header_tokens
+
+    if not rows:
+        return PackedContext(text="", included=0, total=len(records) - start, tokens=0, start=start)
+    text = packer.header() + "\n" + "\n".join(rows)
+    return PackedContext(text=text, included=len(rows), total=len(records) - start, tokens=tokens, start=start)
+
+
+def pack_evaluations(
+    records: Sequence[dict],
+    token_budget: Optional[int] = None,
+    transcript_chars: int = CONTEXT_TRANSCRIPT_CHARS,
+    field_chars: int = CONTEXT_FIELD_CHARS,
+) -> PackedContext:
+    """Empaqueta tantos registros como quepan en `token_budget` (sin límite si es None), en orden."""
+
+    return _pack_from(records, 0, token_budget, _single_dataset(records), transcript_chars, field_chars)
+
+
+def pack_shards(
+    records: Sequence[dict],
+    token_budget: int,
+    transcript_chars: int = CONTEXT_TRANSCRIPT_CHARS,
+    field_chars: int = CONTEXT_FIELD_CHARS,
+) -> List[PackedContext]:
+    """Reparte todos los registros, en orden, en bloques que respetan `token_budget`.
+
+    Un registro que por sí solo excede el presupuesto forma su propio bloque.
+    """
+
+    single_dataset = _single_dataset(records)
+    shards: List[PackedContext] = []
+    start = 0
+    while start < len(records):
+        shard = _pack_from(records, start, token_budget, single_dataset, transcript_chars, field_chars)
+        # En un bloque, el total son los registros del propio bloque
+        shard.total = shard.included
+        shards.append(shard)
+        start += shard.included
+    return shards
@@ -0,0 +1,456 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from telemetry import span
+
+try:
+    import pyarrow  # noqa: F401  pylint: disable=unused-import
+
+    CACHE_FORMAT = "parquet"
+except ImportError:  # pragma: no cover - depende del entorno
+    CACHE_FORMAT = "pickle"
+
+# --- CONFIGURACIÓN DE LA CACHÉ COLUMNAR ---
+CACHE_DIR = os.environ.get(
+    "AUDITBOT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "auditbot-cx"),
+)
+# Incrementar cuando cambie la forma en que se construye la caché
+CACHE_SCHEMA_VERSION = 1
+
+# Métricas de precisión que se extraen como columnas numéricas
+PRECISION_FIELDS = (
+    "precision_llamada",
+    "precision_error_critico_cliente",
+    "precision_error_critico_negocio",
+    "precision_error_critico_cumplimiento",
+    "precision_error_no_critico",
+)
+TRANSCRIPT_FIELD = "transcripcion"
+DETAIL_FIELD = "evaluacion_detalle"
+
+# Tamaño de lectura del lector incremental de JSON
+STREAM_CHUNK_SIZE = 1 << 20
+# Datasets que se cargan a la vez cuando se piden varios (hilos, o procesos para construir cachés)
+DATASET_LOAD_WORKERS = int(os.environ.get("AUDITBOT_DATASET_LOAD_WORKERS", "4"))
+# Volumen mínimo de JSON por reconstruir para usar procesos: por debajo, arrancarlos cuesta más que leer en serie
+PROCESS_WARM_MIN_BYTES = int(os.environ.get("AUDITBOT_PROCESS_WARM_MIN_BYTES", str(64 << 20)))
+
+_WHITESPACE = re.compile(r"\s*")
+
+_build_locks: Dict[str, threading.Lock] = {}
+_build_locks_guard = threading.Lock()
+
+# Filas evaluadas por (archivo, dataset): firma con la que se leyeron, filas y si están completas
+# (si no, son el prefijo leído en streaming para un límite)
+_rows_memo: Dict[Tuple[str, str], Tuple[dict, List[dict], bool]] = {}
+_rows_memo_lock = threading.Lock()
+
+
+def source_signature(path: str) -> dict:
+    """Firma del archivo fuente usada para invalidar la caché (tamaño y mtime)."""
+
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "schema": CACHE_SCHEMA_VERSION,
+        "format": CACHE_FORMAT,
+    }
+
+
+def _cache_paths(path: str) -> tuple:
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    base = os.path.join(CACHE_DIR, "evaluaciones", digest)
+    extension = "parquet" if CACHE_FORMAT == "parquet" else "pkl"
+    return f"{base}.{extension}", f"{base}.meta.json"
+
+
+def _build_lock(path: str) -> threading.Lock:
+    with _build_locks_guard:
+        return _build_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def _to_cell(value):
+    """Normaliza celdas de columnas mixtas para que el formato columnar las acepte."""
+
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, float) and pd.isna(value):
+        return None
+    return str(value)
+
+
+def _evaluation_cell(value) -> Optional[str]:
+    """Evaluación en la forma en que se guarda en la caché (texto JSON); None si falta o está vacía.
+
+    Es la regla común de la carga en streaming y de la caché columnar: las dos devuelven
+    las mismas filas con el mismo texto, de modo que huellas y prefijos no dependen de la ruta.
+    """
+
+    cell = _to_cell(value)
+    if cell is None or cell.strip() in ("", "{}", "[]"):
+        return None
+    return cell
+
+
+def records_to_frame(records: list) -> pd.DataFrame:
+    """Convierte la lista de registros JSON en un DataFrame apto para la caché.
+
+    Los elementos que no son objetos se omiten, igual que en la lectura en streaming.
+    """
+
+    frame = pd.DataFrame([record for record in records if isinstance(record, dict)])
+    for column in frame.columns:
+        if frame[column].dtype == object:
+            frame[column] = frame[column].map(_to_cell).astype(object)
+    return frame
+
+
+def _read_cache(data_path: str) -> pd.DataFrame:
+    if CACHE_FORMAT == "parquet":
+        return pd.read_parquet(data_path)
+    return pd.read_pickle(data_path)
+
+
+def _write_cache(frame: pd.DataFrame, data_path: str) -> None:
+    tmp_path = f"{data_path}.{os.getpid()}.tmp"
+    if CACHE_FORMAT == "parquet":
+        frame.to_parquet(tmp_path, index=False)
+    else:
+        frame.to_pickle(tmp_path)
+    os.replace(tmp_path, data_path)
+
+
+def _load_cached(data_path: str, meta_path: str, signature: dict) -> Optional[pd.DataFrame]:
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta != signature:
+            return None
+        return _read_cache(data_path)
+    except (OSError, ValueError):
+        return None
+
+
+def is_cache_fresh(path: str) -> bool:
+    """Indica si existe una caché columnar vigente para el archivo."""
+
+    try:
+        signature = source_signature(path)
+    except OSError:
+        return False
+    _, meta_path = _cache_paths(path)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f) == signature
+    except (OSError, ValueError):
+        return False
+
+
+def load_records_frame(path: str) -> pd.DataFrame:
+    """Devuelve el dataset como DataFrame, usando la caché columnar si sigue vigente.
+
+    La caché se reconstruye solo cuando cambia el tamaño o el mtime del JSON fuente.
+    Lanza FileNotFoundError si el archivo no existe y ValueError si el JSON es inválido.
+    """
+
+    signature = source_signature(path)
+    data_path, meta_path = _cache_paths(path)
+
+    with span("dataset.read_cache", file=os.path.basename(path)) as current:
+        frame = _load_cached(data_path, meta_path, signature)
+        current.set(hit=frame is not None, records=None if frame is None else len(frame))
+    if frame is not None:
+        return frame
+
+    with _build_lock(path):
+        # Otro hilo pudo haber reconstruido la caché mientras esperábamos
+        frame = _load_cached(data_path, meta_path, signature)
+        if frame is not None:
+            return frame
+
+        with span("dataset.load_json", file=os.path.basename(path), bytes=signature["size"]) as current:
+            with open(path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            frame = records_to_frame(records)
+            current.set(records=len(frame))
+
+        try:
+            os.makedirs(os.path.dirname(data_path), exist_ok=True)
+            _write_cache(frame, data_path)
+            tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump(signature, f)
+            os.replace(tmp_meta, meta_path)
+        except Exception:  # pylint: disable=broad-except
+            # Una caché no escribible no debe impedir la carga de datos
+            pass
+
+    return frame
+
+
+def evaluation_series(frame: pd.DataFrame) -> pd.Series:
+    """Evaluación de cada fila, priorizando 'evaluacion_llamada_raw' sobre 'evaluacion_llamada'.
+
+    Los valores ausentes o vacíos ('', {}, []) quedan en None (ver _evaluation_cell).
+    """
+
+    result = pd.Series([None] * len(frame), index=frame.index, dtype=object)
+    for column in ("evaluacion_llamada", "evaluacion_llamada_raw"):
+        if column not in frame.columns:
+            continue
+        values = frame[column].map(_evaluation_cell).astype(object)
+        result = values.where(values.notna(), result)
+    return result
+
+
+def parse_evaluation(raw) -> dict:
+    """Convierte la evaluación (texto JSON o dict) en un dict."""
+
+    if isinstance(raw, dict):
+        return raw
+    if isinstance(raw, str):
+        try:
+            parsed = json.loads(raw)
+        except ValueError:
+            return {"error": "Texto de evaluación no es JSON válido"}
+        return parsed if isinstance(parsed, dict) else {"evaluacion": parsed}
+    return {}
+
+
+def normalize_evaluations(frame: pd.DataFrame) -> pd.DataFrame:
+    """Parsea cada evaluación una sola vez y la expande en columnas tipadas.
+
+    Agrega las métricas de PRECISION_FIELDS como columnas numéricas, la transcripción
+    en TRANSCRIPT_FIELD y el resto de la evaluación ya parseada en DETAIL_FIELD.
+    """
+
+    with span("evaluations.parse", records=len(frame)):
+        parsed = [parse_evaluation(raw) for raw in evaluation_series(frame).tolist()]
+    frame = frame.copy()
+
+    for field in PRECISION_FIELDS:
+        values = pd.Series([item.get(field) for item in parsed], index=frame.index, dtype=object)
+        frame[field] = pd.to_numeric(
+            values.map(lambda value: value.strip().rstrip("%") if isinstance(value, str) else value),
+            errors="coerce",
+        )
+
+    frame[TRANSCRIPT_FIELD] = pd.Series(
+        [item.get(TRANSCRIPT_FIELD) for item in parsed], index=frame.index, dtype=object
+    )
+
+    excluded = set(PRECISION_FIELDS) | {TRANSCRIPT_FIELD}
+    frame[DETAIL_FIELD] = pd.Series(
+        [{k: v for k, v in item.items() if k not in excluded} for item in parsed],
+        index=frame.index,
+        dtype=object,
+    )
+    return frame
+
+
+def build_call_index(frame: pd.DataFrame, column: str = "id_llamada_procesada") -> Dict[str, int]:
+    """Índice id de llamada → posición de fila (se conserva la primera aparición)."""
+
+    index: Dict[str, int] = {}
+    for position, call_id in enumerate(frame[column].tolist()):
+        if call_id is None or (isinstance(call_id, float) and pd.isna(call_id)):
+            continue
+        index.setdefault(call_id, position)
+    return index
+
+
+def iter_json_array(path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator:
+    """Recorre de forma incremental los elementos de un arreglo JSON sin cargar el archivo completo."""
+
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def _next_token() -> Optional[str]:
+            nonlocal buffer, pos, eof
+            while True:
+                pos = _WHITESPACE.match(buffer, pos).end()
+                if pos < len(buffer):
+                    return buffer[pos]
+                if eof:
+                    return None
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+
+        if _next_token() != "[":
+            raise ValueError(f"El archivo {path} no contiene un arreglo JSON en la raíz.")
+        pos += 1
+
+        expect_comma = False
+        while True:
+            token = _next_token()
+            if token is None:
+                raise ValueError(f"El archivo {path} está truncado: falta cerrar el arreglo JSON.")
+            if token == "]":
+                return
+            if expect_comma:
+                if token != ",":
+                    raise ValueError(f"Separador inesperado {token!r} en {path} (posición relativa {pos}).")
+                pos += 1
+                expect_comma = False
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # Un valor que termina justo en el borde del buffer puede estar incompleto
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+
+            if not complete:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+
+            yield item
+            pos = end
+            expect_comma = True
+            if pos >= chunk_size:
+                buffer, pos = buffer[pos:], 0
+
+
+def iter_evaluation_rows(path: str, dataset_key: str, limit: Optional[int] = None) -> Iterator[dict]:
+    """Genera las filas evaluadas del archivo, deteniéndose al alcanzar `limit`."""
+
+    if limit is not None and limit <= 0:
+        return
+    produced = 0
+    for item in iter_json_array(path):
+        if not isinstance(item, dict):
+            continue
+        # Misma regla y representación que la caché columnar (ver evaluation_series)
+        evaluation = _evaluation_cell(item.get("evaluacion_llamada_raw")) or _evaluation_cell(item.get("evaluacion_llamada"))
+        if evaluation is None:
+            continue
+        yield {
+            "dataset": dataset_key,
+            "id_llamada_procesada": _to_cell(item.get("id_llamada_procesada")) or "",
+            "evaluacion_llamada": evaluation,
+        }
+        produced += 1
+        if limit and produced >= limit:
+            return
+
+
+def _frame_evaluation_rows(frame: pd.DataFrame, dataset_key: str, limit: Optional[int]) -> List[dict]:
+    evaluations = evaluation_series(frame)
+    evaluations = evaluations[evaluations.notna()]
+    if limit:
+        evaluations = evaluations.iloc[:limit]
+
+    if "id_llamada_procesada" in frame.columns:
+        ids = frame.loc[evaluations.index, "id_llamada_procesada"].map(lambda value: _to_cell(value) or "")
+    else:
+        ids = pd.Series("", index=evaluations.index)
+
+    return [
+        {
+            "dataset": dataset_key,
+            "id_llamada_procesada": call_id,
+            "evaluacion_llamada": evaluation,
+        }
+        for call_id, evaluation in zip(ids.tolist(), evaluations.tolist())
+    ]
+
+
+def _memoized_rows(path: str, dataset_key: str, signature: dict, limit: Optional[int]) -> Optional[List[dict]]:
+    """Filas en memoria de esta versión del archivo que alcanzan para `limit` (None = todas)."""
+
+    with _rows_memo_lock:
+        entry = _rows_memo.get((os.path.abspath(path), dataset_key))
+    if entry is None or entry[0] != signature:
+        return None
+    _, rows, complete = entry
+    return rows if complete or (limit and len(rows) >= limit) else None
+
+
+def _remember_rows(path: str, dataset_key: str, signature: dict, rows: List[dict], complete: bool) -> None:
+    key = (os.path.abspath(path), dataset_key)
+    with _rows_memo_lock:
+        entry = _rows_memo.get(key)
+        # Un prefijo no reemplaza filas de la misma versión que ya cubren más
+        if not complete and entry and entry[0] == signature and (entry[2] or len(entry[1]) >= len(rows)):
+            return
+        _rows_memo[key] = (signature, rows, complete)
+
+
+def load_evaluation_rows(path: str, dataset_key: str, limit: Optional[int] = None) -> List[dict]:
+    """Filas evaluadas de un dataset para chat e informes.
+
+    Las filas de cada versión del archivo se guardan una sola vez en memoria y cualquier
+    `limit` es un prefijo de ellas, así distintos límites no duplican datos ni se releen.
+    Si aún no están en memoria, no hay caché columnar vigente y hay límite, se recorre el
+    JSON en streaming hasta `limit` registros y se guarda ese prefijo.
+    """
+
+    limit = int(limit) if limit else None
+    with span("dataset.rows", dataset=dataset_key, limit=limit) as current:
+        signature = source_signature(path)
+        rows = _memoized_rows(path, dataset_key, signature, limit)
+        if rows is not None:
+            current.set(source="memory")
+        elif limit and not is_cache_fresh(path):
+            rows = list(iter_evaluation_rows(path, dataset_key, limit))
+            # Menos filas que el límite: el archivo se leyó completo
+            _remember_rows(path, dataset_key, signature, rows, complete=len(rows) < limit)
+            current.set(source="stream")
+        else:
+            rows = _frame_evaluation_rows(load_records_frame(path), dataset_key, None)
+            _remember_rows(path, dataset_key, signature, rows, complete=True)
+            current.set(source="frame")
+        rows = rows[:limit] if limit else list(rows)
+        current.set(records=len(rows))
+        return rows
+
+
+def _build_record_cache(path: str) -> None:
+    load_records_frame(path)
+
+
+def warm_record_caches(paths: Iterable[str], workers: int = DATASET_LOAD_WORKERS) -> None:
+    """Construye en paralelo, en procesos separados, las cachés columnares vencidas.
+
+    Interpretar el JSON retiene el GIL, así que con hilos varios archivos se leerían en serie;
+    en procesos, el tiempo total es el del archivo más grande. Solo compensa con varios núcleos
+    y archivos grandes (PROCESS_WARM_MIN_BYTES). Ante cualquier error se omite: quien cargue
+    después reconstruye lo que falte en su propio hilo.
+    """
+
+    stale = [path for path in paths if os.path.exists(path) and not is_cache_fresh(path)]
+    workers = min(workers, len(stale), os.cpu_count() or 1)
+    if workers < 2 or sum(os.path.getsize(path) for path in stale) < PROCESS_WARM_MIN_BYTES:
+        return
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            futures = [pool.submit(_build_record_cache, path) for path in stale]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception:  # pylint: disable=broad-except
+                    pass
+    except Exception:  # pylint: disable=broad-except
+        pass
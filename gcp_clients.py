@@ -0,0 +1,103 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from google import genai
+from google.genai import types
+
+from local_storage import FAKE_GCS_DIR, LocalStorageClient
+
+# --- CONFIGURACIÓN DE CLIENTES COMPARTIDOS ---
+VERTEX_PROJECT = "augusta-bbog-dev-activo"
+VERTEX_LOCATION = "global"
+# Conexiones keep-alive por cliente; debe cubrir la concurrencia máxima esperada
+HTTP_POOL_SIZE = int(os.environ.get("AUDITBOT_HTTP_POOL_SIZE", "32"))
+# Llamadas simultáneas al modelo en todo el proceso (chat, informes y trabajos en segundo plano)
+MODEL_CALL_CONCURRENCY = int(os.environ.get("AUDITBOT_MODEL_CALL_CONCURRENCY", "8"))
+
+_clients: Dict[str, object] = {}
+_lock = threading.Lock()
+_model_calls = threading.BoundedSemaphore(MODEL_CALL_CONCURRENCY)
+
+
+def _pooled_http_options(pool_size: int, **options) -> types.HttpOptions:
+    """Opciones HTTP con el pool de conexiones; `options` agrega otras (p. ej. api_version)."""
+
+    import httpx  # pylint: disable=import-outside-toplevel
+
+    return types.HttpOptions(
+        **options,
+        client_args={
+            "limits": httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        },
+    )
+
+
+def _build_genai_client(vertexai: bool, pool_size: int) -> genai.Client:
+    if vertexai:
+        return genai.Client(
+            vertexai=True,
+            project=VERTEX_PROJECT,
+            location=VERTEX_LOCATION,
+            http_options=_pooled_http_options(pool_size, api_version="v1"),
+        )
+    # Configuración tomada de variables de entorno (GOOGLE_API_KEY, GOOGLE_GENAI_USE_VERTEXAI, ...);
+    # la versión de la API queda en la predeterminada del SDK
+    return genai.Client(http_options=_pooled_http_options(pool_size))
+
+
+def _build_storage_client(pool_size: int):
+    if FAKE_GCS_DIR:
+        return LocalStorageClient(FAKE_GCS_DIR)
+
+    import google.auth  # pylint: disable=import-outside-toplevel
+    from google.auth.transport.requests import AuthorizedSession  # pylint: disable=import-outside-toplevel
+    from google.cloud import storage  # pylint: disable=import-outside-toplevel
+    from requests.adapters import HTTPAdapter  # pylint: disable=import-outside-toplevel
+
+    credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    # `_http` es el único punto para inyectar el transporte en google-cloud-storage: es privado
+    # pero está documentado en google.cloud.client.Client (verificado con google-cloud-storage 3.x).
+    # Si una versión futura lo retira, se usa el cliente estándar con su pool por defecto.
+    try:
+        return storage.Client(project=project, credentials=credentials, _http=session)
+    except TypeError:
+        return storage.Client(project=project, credentials=credentials)
+
+
+def _get_or_create(key: str, factory):
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = factory()
+            _clients[key] = client
+        return client
+
+
+def get_genai_client(vertexai: bool = True) -> genai.Client:
+    """Cliente GenAI único del proceso, con pool de conexiones keep-alive.
+
+    Con `vertexai=True` usa el proyecto de Vertex AI del equipo; con `False`, la
+    configuración de las variables de entorno.
+    """
+
+    key = "genai:vertex" if vertexai else "genai:env"
+    return _get_or_create(key, lambda: _build_genai_client(vertexai, HTTP_POOL_SIZE))
+
+
+def get_storage_client():
+    """Cliente de Cloud Storage único del proceso (o el bucket local si AUDITBOT_FAKE_GCS_DIR está definido)."""
+
+    return _get_or_create("storage", lambda: _build_storage_client(HTTP_POOL_SIZE))
+
+
+@contextmanager
+def model_call_slot():
+    """Reserva un cupo del límite global de llamadas simultáneas al modelo mientras dura el bloque."""
+
+    with _model_calls:
+        yield
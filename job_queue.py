@@ -0,0 +1,308 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set
+
+from evaluation_store import CACHE_DIR
+
+# --- CONFIGURACIÓN DE LA COLA DE TRABAJOS ---
+JOBS_DB_PATH = os.environ.get("AUDITBOT_JOBS_DB", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+# Trabajos en ejecución simultánea (cada uno puede hacer varias llamadas al modelo)
+JOB_WORKERS = int(os.environ.get("AUDITBOT_JOB_WORKERS", "2"))
+# Los trabajos terminados se conservan este tiempo para que otras sesiones puedan verlos
+JOB_RETENTION_DAYS = float(os.environ.get("AUDITBOT_JOB_RETENTION_DAYS", "7"))
+# Un trabajo en ejecución pertenece a la cola que lo tomó mientras esta renueve su concesión;
+# si el proceso muere, otra cola sobre la misma base lo retoma cuando la concesión vence
+JOB_LEASE_SECONDS = float(os.environ.get("AUDITBOT_JOB_LEASE_SECONDS", "60"))
+# Frecuencia máxima con la que se persiste el texto parcial de un trabajo
+_PARTIAL_FLUSH_SECONDS = 1.0
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    dedupe_key TEXT,
+    label TEXT,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    partial TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (kind, dedupe_key, status);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at);
+"""
+
+
+@dataclass
+class Job:
+    """Estado persistido de un trabajo en segundo plano."""
+
+    id: str
+    kind: str
+    dedupe_key: Optional[str]
+    label: Optional[str]
+    params: dict
+    status: str
+    progress: float
+    message: Optional[str]
+    partial: Optional[str]
+    result: Optional[str]
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+    owner: Optional[str] = None
+    lease_until: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+
+class JobContext:
+    """Lo que recibe un handler para informar su avance mientras se ejecuta."""
+
+    def __init__(self, queue: "JobQueue", job: Job):
+        self._queue = queue
+        self.job = job
+        self._last_flush = 0.0
+
+    @property
+    def params(self) -> dict:
+        return self.job.params
+
+    def update(self, progress: Optional[float] = None, message: Optional[str] = None) -> None:
+        self._queue._update(self.job.id, progress=progress, message=message)  # pylint: disable=protected-access
+
+    def partial_due(self) -> bool:
+        """True si ya pasó el intervalo mínimo desde la última escritura del texto parcial.
+
+        Permite armar el texto (p. ej. unir los fragmentos recibidos) solo cuando se va a guardar.
+        """
+
+        return time.time() - self._last_flush >= _PARTIAL_FLUSH_SECONDS
+
+    def partial(self, text: str, force: bool = False) -> None:
+        """Guarda el texto generado hasta ahora (limitado a una escritura por segundo)."""
+
+        if force or self.partial_due():
+            self._last_flush = time.time()
+            self._queue._update(self.job.id, partial=text)  # pylint: disable=protected-access
+
+
+class JobQueue:
+    """Cola local de trabajos persistida en SQLite y ejecutada por un pool de hilos.
+
+    Los trabajos se identifican por tipo; cada tipo tiene un handler registrado que recibe
+    un JobContext y devuelve el resultado (texto). Un trabajo con la misma `dedupe_key`
+    que otro aún activo no se duplica: se devuelve el existente para que la sesión se acople.
+
+    Varias colas (o procesos) pueden compartir la base: cada trabajo se toma de forma atómica
+    con una concesión que su dueño renueva mientras vive, así que nunca se ejecuta dos veces.
+    """
+
+    def __init__(
+        self, db_path: str = JOBS_DB_PATH, workers: int = JOB_WORKERS, lease_seconds: float = JOB_LEASE_SECONDS
+    ):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.executescript(_SCHEMA)
+        self._handlers: Dict[str, Callable[[JobContext], str]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="jobs")
+        self._lock = threading.Lock()
+        # Trabajos ya enviados al pool de esta cola que aún no terminan
+        self._scheduled: Set[str] = set()
+        self._purge_expired()
+        self._heartbeat = threading.Thread(target=self._renew_leases, name="jobs-lease", daemon=True)
+        self._heartbeat.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Job:
+        data = dict(row)
+        data["params"] = json.loads(data["params"])
+        return Job(**data)
+
+    def register(self, kind: str, handler: Callable[[JobContext], str]) -> None:
+        """Registra el handler de un tipo y retoma los trabajos de ese tipo que quedaron pendientes.
+
+        Se retoman los trabajos en cola y los que estaban en ejecución en un proceso que ya no
+        renueva su concesión; los que otro proceso vivo está ejecutando no se tocan.
+        """
+
+        with self._lock:
+            if kind in self._handlers:
+                self._handlers[kind] = handler
+                return
+            self._handlers[kind] = handler
+        self._resume_orphans([kind])
+
+    def _resume_orphans(self, kinds: List[str]) -> None:
+        """Encola los trabajos de `kinds` sin dueño vivo; _run decide quién los toma."""
+
+        placeholders = ", ".join("?" for _ in kinds)
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                f"SELECT id FROM jobs WHERE kind IN ({placeholders}) "
+                "AND (status = ? OR (status = ? AND COALESCE(lease_until, 0) < ?)) ORDER BY created_at",
+                (*kinds, QUEUED, RUNNING, time.time()),
+            ).fetchall()
+        for row in rows:
+            self._schedule(row["id"])
+
+    def _schedule(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._scheduled:
+                return
+            self._scheduled.add(job_id)
+        self._pool.submit(self._run, job_id)
+
+    def _renew_leases(self) -> None:
+        """Renueva las concesiones de esta cola y retoma trabajos de procesos que murieron."""
+
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                with closing(self._connect()) as connection:
+                    connection.execute(
+                        "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = ?",
+                        (time.time() + self.lease_seconds, self.owner, RUNNING),
+                    )
+                with self._lock:
+                    kinds = list(self._handlers)
+                if kinds:
+                    self._resume_orphans(kinds)
+            except Exception:  # pylint: disable=broad-except
+                # Base bloqueada o no disponible: se reintenta en la próxima vuelta
+                continue
+
+    def submit(self, kind: str, params: dict, dedupe_key: Optional[str] = None, label: Optional[str] = None) -> Job:
+        """Encola un trabajo, o devuelve el activo con la misma `dedupe_key`."""
+
+        if kind not in self._handlers:
+            raise ValueError(f"No hay un handler registrado para trabajos '{kind}'.")
+        with self._lock:
+            if dedupe_key is not None:
+                existing = self.active_for(kind, dedupe_key)
+                if existing is not None:
+                    return existing
+            now = time.time()
+            job_id = uuid.uuid4().hex
+            with closing(self._connect()) as connection:
+                connection.execute(
+                    "INSERT INTO jobs (id, kind, dedupe_key, label, params, status, message, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, dedupe_key, label, json.dumps(params, ensure_ascii=False), QUEUED, "En cola", now, now),
+                )
+        self._schedule(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def active_for(self, kind: str, dedupe_key: str) -> Optional[Job]:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND dedupe_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                (kind, dedupe_key, QUEUED, RUNNING),
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def recent(self, kind: str, limit: int = 20, active_only: bool = False) -> List[Job]:
+        query = "SELECT * FROM jobs WHERE kind = ?"
+        args: list = [kind]
+        if active_only:
+            query += " AND status IN (?, ?)"
+            args += [QUEUED, RUNNING]
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with closing(self._connect()) as connection:
+            rows = connection.execute(query, args).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields = {name: value for name, value in fields.items() if value is not None}
+        if not fields:
+            return
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with closing(self._connect()) as connection:
+            connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _claim(self, job_id: str) -> bool:
+        """Toma el trabajo si está en cola o si su dueño dejó vencer la concesión (atómico en SQLite)."""
+
+        now = time.time()
+        with closing(self._connect()) as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, message = ?, owner = ?, lease_until = ?, updated_at = ? "
+                "WHERE id = ? AND (status = ? OR (status = ? AND COALESCE(lease_until, 0) < ?))",
+                (RUNNING, "En ejecución", self.owner, now + self.lease_seconds, now, job_id, QUEUED, RUNNING, now),
+            )
+            return cursor.rowcount == 1
+
+    def _run(self, job_id: str) -> None:
+        try:
+            self._execute(job_id)
+        finally:
+            with self._lock:
+                self._scheduled.discard(job_id)
+
+    def _execute(self, job_id: str) -> None:
+        if not self._claim(job_id):
+            return
+        job = self.get(job_id)
+        handler = self._handlers.get(job.kind)
+        try:
+            result = handler(JobContext(self, job))
+        except Exception as exc:  # pylint: disable=broad-except
+            self._update(job_id, status=FAILED, error=str(exc), message="Falló")
+            return
+        self._update(job_id, status=DONE, result=result, progress=1.0, message="Completado")
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - JOB_RETENTION_DAYS * 24 * 3600
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, cutoff),
+            )
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Cola única del proceso, compartida por todas las sesiones."""
+
+    global _queue  # pylint: disable=global-statement
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
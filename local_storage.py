@@ -0,0 +1,114 @@
+import os
+import shutil
+from datetime import timedelta
+from typing import Optional
+from urllib.parse import quote
+
+# Si se define, todas las operaciones de GCS se resuelven contra este directorio local
+FAKE_GCS_DIR = os.environ.get("AUDITBOT_FAKE_GCS_DIR")
+
+
+class LocalBlob:
+    """Subconjunto de la API de `google.cloud.storage.Blob` respaldado por un archivo local."""
+
+    def __init__(self, bucket: "LocalBucket", name: str, chunk_size: Optional[int] = None, generation: Optional[int] = None):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = chunk_size
+        self.generation = generation
+        self.size: Optional[int] = None
+        self.content_type: Optional[str] = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.bucket.root, self.name)
+
+    def _refresh(self) -> None:
+        stat = os.stat(self.path)
+        self.size = stat.st_size
+        self.generation = stat.st_mtime_ns
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def reload(self) -> None:
+        self._refresh()
+
+    def open(self, mode: str = "rb"):
+        if "w" in mode:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        return open(self.path, mode)  # pylint: disable=unspecified-encoding
+
+    def download_as_bytes(self, start: Optional[int] = None, end: Optional[int] = None, **_kwargs) -> bytes:
+        """Descarga el contenido; `end` es inclusivo, igual que en GCS."""
+
+        with open(self.path, "rb") as f:
+            f.seek(start or 0)
+            length = -1 if end is None else end - (start or 0) + 1
+            data = f.read(length)
+        self._refresh()
+        return data
+
+    def download_to_file(self, file_obj, start: Optional[int] = None, end: Optional[int] = None, **_kwargs) -> None:
+        """Copia el contenido (o el rango inclusivo `start`-`end`) en `file_obj` por bloques."""
+
+        with open(self.path, "rb") as f:
+            f.seek(start or 0)
+            remaining = None if end is None else end - (start or 0) + 1
+            while remaining is None or remaining > 0:
+                block = f.read(1024 * 1024 if remaining is None else min(1024 * 1024, remaining))
+                if not block:
+                    break
+                file_obj.write(block)
+                if remaining is not None:
+                    remaining -= len(block)
+        self._refresh()
+
+    def upload_from_string(self, data, content_type: Optional[str] = None, **_kwargs) -> None:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self.open("wb") as f:
+            f.write(data)
+        self.content_type = content_type
+        self._refresh()
+
+    def upload_from_file(self, file_obj, rewind: bool = False, content_type: Optional[str] = None, **_kwargs) -> None:
+        if rewind:
+            file_obj.seek(0)
+        with self.open("wb") as f:
+            shutil.copyfileobj(file_obj, f, length=self.chunk_size or 1024 * 1024)
+        self.content_type = content_type
+        self._refresh()
+
+    def generate_signed_url(self, expiration: timedelta, **_kwargs) -> str:
+        seconds = int(expiration.total_seconds()) if isinstance(expiration, timedelta) else int(expiration)
+        return f"file://{quote(os.path.abspath(self.path))}?X-Goog-Expires={seconds}"
+
+
+class LocalBucket:
+    """Bucket de GCS simulado como un subdirectorio de la raíz local."""
+
+    def __init__(self, client: "LocalStorageClient", name: str):
+        self.client = client
+        self.name = name
+        self.root = os.path.join(client.root, name)
+
+    def blob(self, blob_name: str, chunk_size: Optional[int] = None, generation: Optional[int] = None, **_kwargs) -> LocalBlob:
+        return LocalBlob(self, blob_name, chunk_size=chunk_size, generation=generation)
+
+    def get_blob(self, blob_name: str, **_kwargs) -> Optional[LocalBlob]:
+        blob = self.blob(blob_name)
+        if not blob.exists():
+            return None
+        blob.reload()
+        return blob
+
+
+class LocalStorageClient:
+    """Sustituto offline de `storage.Client` para desarrollo y pruebas sin red."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def bucket(self, bucket_name: str) -> LocalBucket:
+        return LocalBucket(self, bucket_name)
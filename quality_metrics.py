@@ -0,0 +1,195 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from evaluation_store import PRECISION_FIELDS
+
+# --- CONFIGURACIÓN DEL TABLERO DE CALIDAD ---
+# Una llamada cuenta con el error de un tipo cuando su precisión en ese tipo es menor a este valor
+ERROR_PRECISION_THRESHOLD = float(os.environ.get("AUDITBOT_QUALITY_ERROR_THRESHOLD", "100"))
+# Llamadas con peor precisión que se listan en el tablero
+WORST_CALLS_LIMIT = int(os.environ.get("AUDITBOT_QUALITY_WORST_CALLS", "20"))
+PERCENTILES = (10, 25, 50, 75, 90)
+# Intervalos de 10 puntos sobre la escala 0-100 de las métricas de precisión
+HISTOGRAM_BINS = np.linspace(0, 100, 11)
+
+METRIC_LABELS = {
+    "precision_llamada": "Precisión Total",
+    "precision_error_critico_cliente": "Error Crítico Cliente",
+    "precision_error_critico_negocio": "Error Crítico Negocio",
+    "precision_error_critico_cumplimiento": "Error Crítico Cumplimiento",
+    "precision_error_no_critico": "Error No Crítico",
+}
+ERROR_FIELDS = tuple(field for field in PRECISION_FIELDS if field != "precision_llamada")
+CRITICAL_FIELDS = tuple(field for field in ERROR_FIELDS if "critico" in field and "no_critico" not in field)
+DATE_FIELDS = ("fecha_llamada", "fecha")
+
+
+@dataclass
+class QualitySummary:
+    """Agregados de calidad de un dataset, listos para graficar."""
+
+    total_calls: int
+    evaluated_calls: int
+    mean_precision: float
+    median_precision: float
+    critical_error_rate: float
+    percentiles: pd.DataFrame
+    distributions: pd.DataFrame
+    error_rates: pd.Series
+    daily: Optional[pd.DataFrame]
+    worst_calls: pd.DataFrame
+
+
+def _metric_matrix(frame: pd.DataFrame) -> np.ndarray:
+    """Métricas de precisión como matriz float (filas = llamadas); NaN si falta el dato."""
+
+    columns = [
+        pd.to_numeric(frame[field], errors="coerce").to_numpy(dtype=float) if field in frame.columns
+        else np.full(len(frame), np.nan)
+        for field in PRECISION_FIELDS
+    ]
+    return np.column_stack(columns) if columns else np.empty((len(frame), 0))
+
+
+def _call_days(frame: pd.DataFrame) -> Optional[Tuple[np.ndarray, pd.DatetimeIndex]]:
+    """Día de cada llamada como (código por fila, días únicos ordenados); -1 si no tiene fecha.
+
+    Las fechas se repiten mucho: se interpretan solo los valores distintos y se reparten por código.
+    """
+
+    for field in DATE_FIELDS:
+        if field not in frame.columns:
+            continue
+        codes, values = pd.factorize(frame[field])
+        parsed = pd.DatetimeIndex(pd.to_datetime(pd.Series(values, dtype=object), errors="coerce", format="mixed")).normalize()
+        if not parsed.notna().any():
+            continue
+        days, day_codes = np.unique(parsed[parsed.notna()], return_inverse=True)
+        value_to_day = np.full(len(values), -1)
+        value_to_day[np.flatnonzero(parsed.notna())] = day_codes
+        row_days = np.where(codes >= 0, value_to_day[codes], -1)
+        return row_days, pd.DatetimeIndex(days)
+    return None
+
+
+def _nan_mean(values: np.ndarray) -> float:
+    return float(np.nanmean(values)) if np.isfinite(values).any() else float("nan")
+
+
+def compute_quality_summary(frame: pd.DataFrame, worst_limit: int = WORST_CALLS_LIMIT) -> QualitySummary:
+    """Calcula los agregados sobre las columnas ya normalizadas (ver normalize_evaluations).
+
+    Todo se resuelve con operaciones vectorizadas sobre la matriz de métricas, sin recorrer
+    las llamadas una a una, para que escale a cientos de miles de filas.
+    """
+
+    metrics = _metric_matrix(frame)
+    labels = [METRIC_LABELS[field] for field in PRECISION_FIELDS]
+    present = np.isfinite(metrics)
+    evaluated = present.any(axis=1)
+    call_precision = metrics[:, PRECISION_FIELDS.index("precision_llamada")]
+
+    # Percentiles de todas las métricas en una sola pasada (las columnas vacías quedan en NaN)
+    with np.errstate(all="ignore"):
+        valid_columns = present.any(axis=0)
+        percentile_values = np.full((len(PERCENTILES), metrics.shape[1]), np.nan)
+        if valid_columns.any():
+            percentile_values[:, valid_columns] = np.nanpercentile(metrics[:, valid_columns], PERCENTILES, axis=0)
+        means = np.where(valid_columns, np.nansum(metrics, axis=0) / np.maximum(present.sum(axis=0), 1), np.nan)
+    percentiles = pd.DataFrame(percentile_values.T, index=labels, columns=[f"p{p}" for p in PERCENTILES])
+    percentiles.insert(0, "media", means)
+    percentiles.insert(0, "llamadas", present.sum(axis=0))
+
+    distributions = pd.DataFrame(
+        {
+            label: np.histogram(metrics[present[:, column], column], bins=HISTOGRAM_BINS)[0]
+            for column, label in enumerate(labels)
+        },
+        index=[f"{int(low)}-{int(high)}" for low, high in zip(HISTOGRAM_BINS[:-1], HISTOGRAM_BINS[1:])],
+    )
+
+    # Tasa de error por tipo: llamadas con precisión bajo el umbral sobre las que tienen la métrica
+    error_columns = [PRECISION_FIELDS.index(field) for field in ERROR_FIELDS]
+    critical_columns = [PRECISION_FIELDS.index(field) for field in CRITICAL_FIELDS]
+    with np.errstate(invalid="ignore"):
+        errors = metrics < ERROR_PRECISION_THRESHOLD
+    error_counts = (errors & present).sum(axis=0)
+    error_rates = pd.Series(
+        error_counts[error_columns] / np.maximum(present[:, error_columns].sum(axis=0), 1),
+        index=[METRIC_LABELS[field] for field in ERROR_FIELDS],
+    )
+    has_critical = errors[:, critical_columns].any(axis=1)
+    critical_error_rate = float(has_critical[evaluated].mean()) if evaluated.any() else float("nan")
+
+    daily = None
+    call_days = _call_days(frame)
+    if call_days is not None:
+        row_days, days = call_days
+        dated = row_days >= 0
+        day_index = row_days[dated]
+
+        def _per_day(weights: np.ndarray) -> np.ndarray:
+            return np.bincount(day_index, weights=weights[dated], minlength=len(days))
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            with_precision = np.isfinite(call_precision)
+            daily = pd.DataFrame(
+                {
+                    "llamadas": _per_day(evaluated.astype(float)).astype(int),
+                    "precision_media": _per_day(np.where(with_precision, call_precision, 0.0))
+                    / _per_day(with_precision.astype(float)),
+                    "tasa_error_critico": _per_day((has_critical & evaluated).astype(float))
+                    / _per_day(evaluated.astype(float)),
+                },
+                index=pd.Index(days, name="fecha"),
+            )
+
+    worst_calls = _worst_calls(frame, metrics, call_precision, has_critical, call_days, worst_limit)
+
+    return QualitySummary(
+        total_calls=len(frame),
+        evaluated_calls=int(evaluated.sum()),
+        mean_precision=_nan_mean(call_precision),
+        median_precision=float(percentiles.at[METRIC_LABELS["precision_llamada"], "p50"]),
+        critical_error_rate=critical_error_rate,
+        percentiles=percentiles,
+        distributions=distributions,
+        error_rates=error_rates,
+        daily=daily,
+        worst_calls=worst_calls,
+    )
+
+
+def _worst_calls(
+    frame: pd.DataFrame,
+    metrics: np.ndarray,
+    call_precision: np.ndarray,
+    has_critical: np.ndarray,
+    call_days: Optional[Tuple[np.ndarray, pd.DatetimeIndex]],
+    limit: int,
+) -> pd.DataFrame:
+    """Las `limit` llamadas de menor precisión total; a igual precisión, primero las con error crítico."""
+
+    candidates = np.flatnonzero(np.isfinite(call_precision))
+    if limit <= 0 or not len(candidates):
+        return pd.DataFrame(columns=["id_llamada_procesada", "fecha", *METRIC_LABELS.values()])
+    if len(candidates) > limit:
+        # Selección parcial O(n): solo se ordenan las candidatas, no todo el dataset
+        candidates = candidates[np.argpartition(call_precision[candidates], limit - 1)[:limit]]
+    order = np.lexsort((~has_critical[candidates], call_precision[candidates]))
+    rows = candidates[order]
+
+    columns: Dict[str, object] = {}
+    if "id_llamada_procesada" in frame.columns:
+        columns["id_llamada_procesada"] = frame["id_llamada_procesada"].to_numpy()[rows]
+    if call_days is not None:
+        row_days, days = call_days
+        picked = row_days[rows]
+        columns["fecha"] = np.where(picked >= 0, days.to_numpy()[np.maximum(picked, 0)], np.datetime64("NaT"))
+    for column, field in enumerate(PRECISION_FIELDS):
+        columns[METRIC_LABELS[field]] = metrics[rows, column]
+    return pd.DataFrame(columns)
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Iterable, List, Optional
+
+from evaluation_store import CACHE_DIR
+from transcription_cache import TranscriptionCache
+
+# --- CONFIGURACIÓN DE LA CACHÉ DE INFORMES ---
+REPORT_CACHE_DIR = os.environ.get("AUDITBOT_REPORT_CACHE_DIR", os.path.join(CACHE_DIR, "informes"))
+REPORT_CACHE_MAX_ENTRIES = int(os.environ.get("AUDITBOT_REPORT_CACHE_MAX_ENTRIES", "200"))
+# Un informe se regenera como máximo tras este tiempo aunque los datos no cambien
+REPORT_CACHE_TTL_DAYS = float(os.environ.get("AUDITBOT_REPORT_CACHE_TTL_DAYS", "7"))
+
+
+def records_digest(records: Iterable[dict]) -> str:
+    """Huella del contenido de los registros evaluados (id y evaluación, en orden)."""
+
+    digest = hashlib.sha256()
+    for record in records:
+        evaluation = record.get("evaluacion_llamada", "")
+        if not isinstance(evaluation, str):
+            evaluation = json.dumps(evaluation, ensure_ascii=False, sort_keys=True)
+        digest.update(str(record.get("id_llamada_procesada", "")).encode("utf-8"))
+        digest.update(b"\x1f")
+        digest.update(evaluation.encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def report_cache_key(dataset_key: str, data_digest: str, questions: List[str], prompt_version: int, model_config: dict) -> str:
+    """Clave del informe: dataset, huella de los datos, preguntas, versión del prompt y configuración del modelo."""
+
+    payload = json.dumps(
+        {
+            "dataset": dataset_key,
+            "data": data_digest,
+            "questions": questions,
+            "prompt_version": prompt_version,
+            "model": model_config,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def section_cache_key(report_key: str, number: int) -> str:
+    """Clave de una sección del informe por pregunta: lo ya generado se reutiliza al reintentar."""
+
+    return hashlib.sha256(f"{report_key}:seccion:{number}".encode("utf-8")).hexdigest()
+
+
+class ReportCache(TranscriptionCache):
+    """Informes generados, un JSON por clave.
+
+    Misma política que la caché de transcripciones: cualquier cambio en la clave invalida la
+    entrada (datos, preguntas, prompt o modelo); además vencen por TTL y, al superar el
+    máximo de entradas, se expulsan las de uso menos reciente.
+    """
+
+    def __init__(
+        self,
+        directory: str = REPORT_CACHE_DIR,
+        max_entries: int = REPORT_CACHE_MAX_ENTRIES,
+        ttl_days: float = REPORT_CACHE_TTL_DAYS,
+    ):
+        super().__init__(directory=directory, max_entries=max_entries, ttl_days=ttl_days)
+
+    def invalidate(self, key: str) -> None:
+        self._remove(self._path(key))
+
+
+_shared_cache: Optional[ReportCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_report_cache() -> ReportCache:
+    """Caché de informes compartida por todas las sesiones del proceso."""
+
+    global _shared_cache  # pylint: disable=global-statement
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ReportCache()
+        return _shared_cache
@@ -0,0 +1,226 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+from context_packer import PackedContext, pack_shards
+
+# --- CONFIGURACIÓN DEL MOTOR MAP-REDUCE DE INFORMES ---
+# Presupuesto de tokens de evaluaciones por bloque (fase map)
+REPORT_CHUNK_TOKENS = int(os.environ.get("AUDITBOT_REPORT_CHUNK_TOKENS", "120000"))
+# Análisis parciales simultáneos; acotado para no agotar la cuota del modelo
+REPORT_MAP_WORKERS = int(os.environ.get("AUDITBOT_REPORT_MAP_WORKERS", "8"))
+# Intentos por bloque antes de darlo por fallido
+REPORT_MAP_ATTEMPTS = 2
+# Secciones (una por pregunta) generadas simultáneamente en el modo por pregunta
+REPORT_SECTION_WORKERS = int(os.environ.get("AUDITBOT_REPORT_SECTION_WORKERS", "8"))
+# Intentos por sección antes de darla por fallida
+REPORT_SECTION_ATTEMPTS = 2
+# Línea con la que la síntesis separa el resumen ejecutivo de la tabla de insights
+SYNTHESIS_TABLE_MARKER = "===TABLA==="
+
+
+def shard_records(records: List[dict], max_tokens: int = REPORT_CHUNK_TOKENS) -> List[PackedContext]:
+    """Divide los registros, en orden, en bloques compactos de a lo sumo `max_tokens` (estimados)."""
+
+    return pack_shards(records, max_tokens)
+
+
+def build_map_prompt(source_name: str, shard_context: str, questions: List[str], shard_number: int, total_shards: int, record_count: int) -> str:
+    """Prompt de análisis parcial de un bloque de evaluaciones."""
+
+    formatted_questions = "\n".join([f"- {question}" for question in questions])
+    return f"""
+**Rol y Objetivo:**
+Asume el rol de un **Analista de Experiencia del Cliente (CX)**. Estás analizando el bloque {shard_number} de {total_shards} del dataset '{source_name}' ({record_count} evaluaciones de llamadas). Otro analista combinará tu resultado con el de los demás bloques para redactar el informe final.
+
+**Evaluaciones del bloque:**
+---
+{shard_context}
+---
+
+**Instrucciones:**
+* Para cada pregunta, resume los hallazgos de este bloque en viñetas con **conteos explícitos** (ej. "12 de {record_count} llamadas").
+* Incluye hasta 3 citas textuales anónimas representativas por pregunta, indicando el ID de la llamada.
+* Si el bloque no aporta información para una pregunta, escribe "Sin evidencia en este bloque".
+* No redactes resumen ejecutivo, conclusiones ni tablas: solo los hallazgos por pregunta.
+* No inventes datos.
+
+**Preguntas:**
+{formatted_questions}
+"""
+
+
+@dataclass
+class PartialAnalysis:
+    """Resultado de la fase map para un bloque."""
+
+    shard_number: int
+    record_count: int
+    text: Optional[str] = None
+    error: Optional[str] = None
+
+
+def run_map_phase(
+    source_name: str,
+    shards: List[PackedContext],
+    questions: List[str],
+    generate: Callable[[str], str],
+    max_workers: int = REPORT_MAP_WORKERS,
+) -> Iterator[PartialAnalysis]:
+    """Analiza los bloques en paralelo (como máximo `max_workers` a la vez).
+
+    Entrega cada PartialAnalysis a medida que termina, para que quien llama pueda mostrar
+    el progreso desde el hilo principal.
+    """
+
+    total = len(shards)
+
+    def _analyze(shard_number: int, shard: PackedContext) -> PartialAnalysis:
+        prompt = build_map_prompt(source_name, shard.text, questions, shard_number, total, shard.included)
+        error = None
+        for _ in range(REPORT_MAP_ATTEMPTS):
+            try:
+                return PartialAnalysis(shard_number, shard.included, text=generate(prompt))
+            except Exception as exc:  # pylint: disable=broad-except
+                error = str(exc)
+        return PartialAnalysis(shard_number, shard.included, error=error)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total or 1)), thread_name_prefix="report-map") as pool:
+        futures = [pool.submit(_analyze, number, shard) for number, shard in enumerate(shards, start=1)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def build_reduce_context(partials: List[PartialAnalysis]) -> str:
+    """Contexto de la fase reduce: los análisis parciales en orden de bloque."""
+
+    partials = sorted(partials, key=lambda partial: partial.shard_number)
+    total_records = sum(partial.record_count for partial in partials)
+    sections = [
+        f"Análisis parciales de {len(partials)} bloques que cubren {total_records} evaluaciones en total. "
+        "Consolida los hallazgos sumando los conteos entre bloques y conserva las citas más representativas."
+    ]
+    for partial in partials:
+        header = f"### Bloque {partial.shard_number} ({partial.record_count} evaluaciones)"
+        body = partial.text if partial.text is not None else f"[No se pudo analizar este bloque: {partial.error}]"
+        sections.append(f"{header}\n{body}")
+    return "\n\n".join(sections)
+
+
+# --- INFORME POR PREGUNTA ---
+def build_section_prompt(source_name: str, report_context: str, question: str, number: int, total: int) -> str:
+    """Prompt de la sección de una sola pregunta del análisis detallado."""
+
+    return f"""
+**Rol y Objetivo:**
+Asume el rol de un **Analista Estratégico Senior de Experiencia del Cliente (CX)**. Estás redactando la sección {number} de {total} del análisis detallado de un informe ejecutivo sobre el dataset '{source_name}'. Otras secciones, el resumen ejecutivo y la tabla de recomendaciones los redactan otros analistas: responde solo tu pregunta.
+
+**Contexto de Análisis (Evaluaciones de Llamadas de '{source_name}')**
+---
+{report_context}
+---
+
+**Pregunta:**
+{question}
+
+**Instrucciones:**
+* Responde usando viñetas para los puntos clave; cuantifica los hallazgos cuando sea posible.
+* Sustenta afirmaciones con ejemplos o citas textuales anónimas.
+* Usa **negritas** para conceptos clave.
+* Si la información no es suficiente, indícalo explícitamente sin inventar datos.
+* No repitas la pregunta ni agregues títulos, introducción ni conclusiones: inicia directamente con las viñetas.
+"""
+
+
+def build_synthesis_prompt(source_name: str, sections: List["ReportSection"]) -> str:
+    """Prompt de la síntesis: resumen ejecutivo y tabla de insights a partir de las secciones ya redactadas."""
+
+    analysis = "\n\n".join(f"### {section.number}. {section.question}\n{section.text}" for section in sections)
+    return f"""
+**Rol y Objetivo:**
+Asume el rol de un **Analista Estratégico Senior de Experiencia del Cliente (CX)**. A continuación está el análisis detallado por pregunta de las evaluaciones de llamadas del dataset '{source_name}'. Redacta las partes ejecutivas del informe para la gerencia del banco, basándote ÚNICA Y EXCLUSIVAMENTE en ese análisis.
+
+**Análisis detallado:**
+---
+{analysis}
+---
+
+**Formato de Salida Obligatorio:**
+1. Un párrafo de **Resumen Ejecutivo** que sintetice los 3-4 hallazgos más críticos y la principal recomendación estratégica (sin título).
+2. Una línea que contenga únicamente `{SYNTHESIS_TABLE_MARKER}`.
+3. Una tabla en Markdown con columnas: "Hallazgo Clave", "Impacto Potencial (Cliente/Negocio)", "Recomendación Estratégica".
+
+No agregues ningún otro texto.
+"""
+
+
+@dataclass
+class ReportSection:
+    """Respuesta de una pregunta del informe (modo por pregunta)."""
+
+    number: int
+    question: str
+    text: Optional[str] = None
+    error: Optional[str] = None
+
+
+def run_section_phase(
+    questions: List[str],
+    generate: Callable[[int, str], str],
+    completed: Optional[Dict[int, str]] = None,
+    max_workers: int = REPORT_SECTION_WORKERS,
+) -> Iterator[ReportSection]:
+    """Responde cada pregunta en paralelo con `generate(numero, pregunta)`.
+
+    Las secciones en `completed` (por número) no se vuelven a generar; así un reintento
+    solo repite las que fallaron. Entrega cada ReportSection a medida que termina.
+    """
+
+    completed = completed or {}
+
+    def _answer(number: int, question: str) -> ReportSection:
+        error = None
+        for _ in range(REPORT_SECTION_ATTEMPTS):
+            try:
+                return ReportSection(number, question, text=generate(number, question))
+            except Exception as exc:  # pylint: disable=broad-except
+                error = str(exc)
+        return ReportSection(number, question, error=error)
+
+    pending = []
+    for number, question in enumerate(questions, start=1):
+        if number in completed:
+            yield ReportSection(number, question, text=completed[number])
+        else:
+            pending.append((number, question))
+    if not pending:
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending))), thread_name_prefix="report-section") as pool:
+        futures = [pool.submit(_answer, number, question) for number, question in pending]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def assemble_report(sections: List[ReportSection], synthesis: Optional[str] = None) -> str:
+    """Informe final en el formato del modo clásico, con las secciones en el orden de las preguntas.
+
+    Sin `synthesis` (aún en curso) solo se incluye el análisis detallado disponible.
+    """
+
+    summary, table = "", ""
+    if synthesis:
+        summary, _, table = synthesis.partition(SYNTHESIS_TABLE_MARKER)
+    parts = []
+    if summary.strip():
+        parts.append(f"## 1. Resumen Ejecutivo\n\n{summary.strip()}")
+    details = [
+        f"### {section.number}. {section.question}\n\n{section.text.strip()}"
+        for section in sorted(sections, key=lambda section: section.number)
+        if section.text is not None
+    ]
+    parts.append("## 2. Análisis Detallado por Pregunta\n\n" + "\n\n".join(details))
+    if table.strip():
+        parts.append(f"## 3. Tabla de Insights y Recomendaciones Estratégicas\n\n{table.strip()}")
+    return "\n\n".join(parts)
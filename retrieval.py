@@ -0,0 +1,412 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from google.genai import types
+
+from evaluation_store import (
+    CACHE_DIR,
+    PRECISION_FIELDS,
+    TRANSCRIPT_FIELD,
+    load_evaluation_rows,
+    parse_evaluation,
+    source_signature,
+)
+from gcp_clients import get_genai_client, model_call_slot
+from telemetry import span
+from text_index import BM25Index, snippet
+
+# --- CONFIGURACIÓN DE RECUPERACIÓN (RAG) ---
+# "lexical": solo BM25 (local, sin costo); "hybrid": además embeddings, que se calculan para todo
+# el dataset con el servicio de Vertex AI; "off": contexto con los primeros N registros
+RETRIEVAL_MODE = os.environ.get("AUDITBOT_RETRIEVAL_MODE", "lexical").lower()
+RETRIEVAL_TOP_K = int(os.environ.get("AUDITBOT_RETRIEVAL_TOP_K", "40"))
+# Resultados que muestra la búsqueda del Monitor
+SEARCH_RESULTS_LIMIT = int(os.environ.get("AUDITBOT_SEARCH_RESULTS_LIMIT", "50"))
+INDEX_DIR = os.environ.get("AUDITBOT_INDEX_DIR", os.path.join(CACHE_DIR, "indices"))
+EMBEDDING_MODEL = os.environ.get("AUDITBOT_EMBEDDING_MODEL", "text-embedding-005")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("AUDITBOT_EMBEDDING_BATCH_SIZE", "8"))
+# En modo "hybrid", los datasets con más registros que este tope se buscan solo con BM25
+EMBEDDING_MAX_RECORDS = int(os.environ.get("AUDITBOT_EMBEDDING_MAX_RECORDS", "20000"))
+# El modelo de embeddings trunca cerca de 2k tokens; no tiene sentido enviar más texto
+EMBEDDING_MAX_CHARS = 6000
+# Constante de la fusión por rango recíproco (RRF) entre el ranking léxico y el semántico
+RRF_K = 60
+# Tras un error del servicio de embeddings, usar solo BM25 durante este tiempo
+_EMBEDDING_BACKOFF_SECONDS = 300
+# Guardar el avance de embeddings cada tantos lotes
+_EMBEDDING_SAVE_EVERY = 20
+
+Document = Tuple[str, str, str]
+
+
+@dataclass
+class SearchHit:
+    """Llamada encontrada por la búsqueda de texto completo."""
+
+    call_id: str
+    score: float
+    snippet: str
+
+
+def record_text(record: dict) -> str:
+    """Texto indexable de un registro: id y evaluación completa (incluye la transcripción)."""
+
+    evaluation = record.get("evaluacion_llamada", "")
+    if isinstance(evaluation, (dict, list)):
+        evaluation = json.dumps(evaluation, ensure_ascii=False)
+    return f"ID: {record.get('id_llamada_procesada', '')}\n{evaluation}"
+
+
+def record_display_text(record: dict) -> str:
+    """Texto legible del registro para mostrar fragmentos: transcripción y luego el resto de campos."""
+
+    evaluation = parse_evaluation(record.get("evaluacion_llamada"))
+    lines = [str(evaluation.get(TRANSCRIPT_FIELD) or "")]
+    for field, value in evaluation.items():
+        if field in PRECISION_FIELDS or field == TRANSCRIPT_FIELD or value in (None, ""):
+            continue
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, ensure_ascii=False)
+        lines.append(f"{field}: {value}")
+    return "\n".join(line for line in lines if line)
+
+
+def record_documents(records: Sequence[dict]) -> Tuple[List[Document], Dict[str, dict]]:
+    """Documentos (clave, texto, huella) y el registro de cada clave.
+
+    La clave es el id de la llamada; los ids repetidos o vacíos se desambiguan por aparición.
+    """
+
+    documents: List[Document] = []
+    by_key: Dict[str, dict] = {}
+    for position, record in enumerate(records):
+        key = str(record.get("id_llamada_procesada") or f"#{position}")
+        if key in by_key:
+            key = f"{key}#{position}"
+        text = record_text(record)
+        fingerprint = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        documents.append((key, text, fingerprint))
+        by_key[key] = record
+    return documents, by_key
+
+
+class EmbeddingIndex:
+    """Matriz de embeddings normalizados, persistida en .npz y actualizable por documento."""
+
+    def __init__(self, keys: Optional[List[str]] = None, fingerprints: Optional[List[str]] = None, vectors=None):
+        self.keys: List[str] = list(keys or [])
+        self.fingerprints: List[str] = list(fingerprints or [])
+        self.vectors = vectors if vectors is not None else np.zeros((0, 0), dtype=np.float32)
+        self._positions = {key: row for row, key in enumerate(self.keys)}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def pending(self, documents: Sequence[Document]) -> List[Document]:
+        """Documentos sin embedding o cuyo contenido cambió desde que se calculó."""
+
+        with self._lock:
+            result = []
+            for document in documents:
+                row = self._positions.get(document[0])
+                if row is None or self.fingerprints[row] != document[2]:
+                    result.append(document)
+            return result
+
+    def retain(self, keys: set) -> None:
+        """Descarta los embeddings de documentos que ya no existen."""
+
+        with self._lock:
+            rows = [row for row, key in enumerate(self.keys) if key in keys]
+            if len(rows) == len(self.keys):
+                return
+            self.keys = [self.keys[row] for row in rows]
+            self.fingerprints = [self.fingerprints[row] for row in rows]
+            self.vectors = self.vectors[rows] if len(self.vectors) else self.vectors
+            self._positions = {key: row for row, key in enumerate(self.keys)}
+
+    def add(self, documents: Sequence[Document], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self._lock:
+            if not len(self.vectors):
+                self.vectors = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            appended = []
+            for (key, _, fingerprint), vector in zip(documents, vectors):
+                row = self._positions.get(key)
+                if row is None:
+                    self._positions[key] = len(self.keys) + len(appended)
+                    self.keys.append(key)
+                    self.fingerprints.append(fingerprint)
+                    appended.append(vector)
+                else:
+                    self.fingerprints[row] = fingerprint
+                    self.vectors[row] = vector
+            if appended:
+                self.vectors = np.vstack([self.vectors, np.stack(appended)])
+
+    def search(self, query_vector: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        with self._lock:
+            if not len(self.keys):
+                return []
+            query_vector = np.asarray(query_vector, dtype=np.float32)
+            query_vector = query_vector / (np.linalg.norm(query_vector) or 1)
+            scores = self.vectors @ query_vector
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.keys[row], float(scores[row])) for row in top]
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    keys=np.array(self.keys, dtype=str),
+                    fingerprints=np.array(self.fingerprints, dtype=str),
+                    vectors=self.vectors,
+                )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingIndex":
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls(data["keys"].tolist(), data["fingerprints"].tolist(), data["vectors"])
+        except (OSError, ValueError, KeyError):
+            return cls()
+
+
+def gemini_embedder(texts: List[str], task_type: str) -> np.ndarray:
+    """Embeddings de `texts` con el modelo configurado en Vertex AI."""
+
+    with model_call_slot(), span("gemini.embed", model=EMBEDDING_MODEL, records=len(texts)):
+        response = get_genai_client().models.embed_content(
+            model=EMBEDDING_MODEL,
+            contents=[text[:EMBEDDING_MAX_CHARS] for text in texts],
+            config=types.EmbedContentConfig(task_type=task_type, auto_truncate=True),
+        )
+    return np.array([embedding.values for embedding in response.embeddings], dtype=np.float32)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[str]:
+    """Combina varios rankings de claves sumando 1 / (k + posición)."""
+
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class EvaluationRetriever:
+    """Índice de recuperación de un dataset: BM25 sobre todo el texto y embeddings en segundo plano.
+
+    El índice léxico está disponible en cuanto se sincroniza; los embeddings (solo en modo
+    "hybrid" y hasta EMBEDDING_MAX_RECORDS registros) se calculan en un hilo aparte y, mientras
+    tanto (o si el servicio falla), la búsqueda usa solo BM25.
+    """
+
+    def __init__(
+        self,
+        dataset_key: str,
+        path: str,
+        directory: str = INDEX_DIR,
+        mode: str = RETRIEVAL_MODE,
+        embedder: Callable[[List[str], str], np.ndarray] = gemini_embedder,
+    ):
+        self.dataset_key = dataset_key
+        self.path = path
+        self.mode = mode
+        self.embedder = embedder
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        self.directory = os.path.join(directory, digest)
+        self.lexical = BM25Index.load(os.path.join(self.directory, "bm25.pkl"))
+        self.embeddings = EmbeddingIndex.load(os.path.join(self.directory, "embeddings.npz"))
+        self.records: Dict[str, dict] = {}
+        self.signature: Optional[dict] = None
+        self._documents: List[Document] = []
+        self._embedding_disabled_until = 0.0
+        self._embedding_signature: Optional[dict] = None
+        self._embedding_thread: Optional[threading.Thread] = None
+        self._sync_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._sync_thread_lock = threading.Lock()
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return (
+            self.mode == "hybrid"
+            and len(self._documents) <= EMBEDDING_MAX_RECORDS
+            and time.time() >= self._embedding_disabled_until
+        )
+
+    @property
+    def ready(self) -> bool:
+        """True cuando el índice ya se sincronizó al menos una vez con el archivo."""
+
+        return self.signature is not None
+
+    def refresh(self, embeddings: bool = True) -> None:
+        """Sincroniza los índices con el archivo fuente si cambió desde la última vez.
+
+        Con `embeddings=False` solo se actualiza el índice léxico (búsqueda del Monitor).
+        """
+
+        signature = source_signature(self.path)
+        with self._lock:
+            if signature != self.signature:
+                self._sync(signature)
+        if embeddings:
+            self._start_embedding()
+
+    def refresh_in_background(self) -> bool:
+        """Como refresh, pero en un hilo aparte si el archivo cambió; indica si ya hay índice utilizable.
+
+        La primera sincronización de un dataset grande no bloquea la petición que la dispara.
+        """
+
+        if source_signature(self.path) == self.signature:
+            self._start_embedding()
+            return True
+        with self._sync_thread_lock:
+            if self._sync_thread is None or not self._sync_thread.is_alive():
+                self._sync_thread = threading.Thread(
+                    target=self._refresh_quietly, name=f"retrieval-sync-{self.dataset_key}", daemon=True
+                )
+                self._sync_thread.start()
+        return self.ready
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception:  # pylint: disable=broad-except
+            # Archivo ausente o ilegible: la próxima búsqueda lo vuelve a intentar
+            pass
+
+    def _sync(self, signature: dict) -> None:
+        with span("retrieval.sync", dataset=self.dataset_key) as current:
+            rows = load_evaluation_rows(self.path, self.dataset_key, None)
+            documents, records = record_documents(rows)
+            added, removed = self.lexical.sync(documents)
+            current.set(records=len(records), added=added, removed=removed)
+        if added or removed:
+            try:
+                self.lexical.save(os.path.join(self.directory, "bm25.pkl"))
+            except OSError:
+                pass
+        self.embeddings.retain(set(records))
+        self.records = records
+        self._documents = documents
+        self.signature = signature
+
+    def _start_embedding(self) -> None:
+        if not self.semantic_enabled:
+            return
+        with self._lock:
+            if self._embedding_signature == self.signature:
+                return
+            self._embedding_signature = self.signature
+            if self._embedding_thread is not None and self._embedding_thread.is_alive():
+                # El hilo en curso vuelve a revisar los pendientes al terminar cada pasada
+                return
+            pending = self.embeddings.pending(self._documents)
+            if not pending:
+                return
+            self._embedding_thread = threading.Thread(
+                target=self._embed_pending,
+                args=(pending,),
+                name=f"embeddings-{self.dataset_key}",
+                daemon=True,
+            )
+            self._embedding_thread.start()
+
+    def _embed_pending(self, pending: List[Document]) -> None:
+        path = os.path.join(self.directory, "embeddings.npz")
+        try:
+            while pending:
+                for batch_number, start in enumerate(range(0, len(pending), EMBEDDING_BATCH_SIZE), start=1):
+                    batch = pending[start : start + EMBEDDING_BATCH_SIZE]
+                    vectors = self.embedder([text for _, text, _ in batch], "RETRIEVAL_DOCUMENT")
+                    self.embeddings.add(batch, vectors)
+                    if batch_number % _EMBEDDING_SAVE_EVERY == 0:
+                        self.embeddings.save(path)
+                # El dataset pudo cambiar mientras se calculaban los embeddings
+                pending = self.embeddings.pending(self._documents)
+        except Exception:  # pylint: disable=broad-except
+            self._embedding_disabled_until = time.time() + _EMBEDDING_BACKOFF_SECONDS
+            # Reintentar en la primera búsqueda después del backoff
+            self._embedding_signature = None
+        try:
+            self.embeddings.save(path)
+        except OSError:
+            pass
+
+    def _semantic_ranking(self, query: str, k: int) -> List[str]:
+        if not self.semantic_enabled or not len(self.embeddings):
+            return []
+        try:
+            query_vector = self.embedder([query], "RETRIEVAL_QUERY")[0]
+        except Exception:  # pylint: disable=broad-except
+            self._embedding_disabled_until = time.time() + _EMBEDDING_BACKOFF_SECONDS
+            return []
+        return [key for key, _ in self.embeddings.search(query_vector, k)]
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[dict]:
+        """Los `k` registros más relevantes para `query` (fusión BM25 + embeddings si hay).
+
+        Mientras el índice se construye por primera vez devuelve una lista vacía: el chat usa
+        entonces el contexto fijo.
+        """
+
+        if not self.refresh_in_background():
+            return []
+        with span("retrieval.search", dataset=self.dataset_key) as current:
+            # Se toma un margen por encima de k para que la fusión tenga candidatos de ambos rankings
+            candidates = max(k * 2, k + 10)
+            lexical = [key for key, _ in self.lexical.search(query, candidates)]
+            semantic = self._semantic_ranking(query, candidates)
+            ranking = reciprocal_rank_fusion([lexical, semantic]) if semantic else lexical
+            records = self.records
+            results = [records[key] for key in ranking if key in records][:k]
+            current.set(records=len(results), semantic=bool(semantic))
+        return results
+
+    def search_calls(self, query: str, k: int = SEARCH_RESULTS_LIMIT) -> List[SearchHit]:
+        """Búsqueda de texto completo (BM25) con fragmentos resaltados, sin calcular embeddings."""
+
+        self.refresh(embeddings=False)
+        records = self.records
+        hits = []
+        for key, score in self.lexical.search(query, k):
+            record = records.get(key)
+            if record is None:
+                continue
+            hits.append(SearchHit(str(record.get("id_llamada_procesada", "")), score, snippet(record_display_text(record), query)))
+        return hits
+
+
+_retrievers: Dict[str, EvaluationRetriever] = {}
+_retrievers_lock = threading.Lock()
+
+
+def get_evaluation_retriever(dataset_key: str, path: str) -> EvaluationRetriever:
+    """Recuperador único por archivo de dataset para todo el proceso."""
+
+    key = os.path.abspath(path)
+    with _retrievers_lock:
+        retriever = _retrievers.get(key)
+        if retriever is None:
+            retriever = EvaluationRetriever(dataset_key, path)
+            _retrievers[key] = retriever
+        return retriever
@@ -0,0 +1,214 @@
+import atexit
+import contextvars
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional
+
+# --- CONFIGURACIÓN DE TELEMETRÍA ---
+# AUDITBOT_TELEMETRY=0 deja de escribir el registro (los spans de la ejecución actual se siguen midiendo)
+TELEMETRY_ENABLED = os.environ.get("AUDITBOT_TELEMETRY", "1") != "0"
+# Mismo directorio que CACHE_DIR de evaluation_store (no se importa: ese módulo también se mide)
+TELEMETRY_LOG_PATH = os.environ.get(
+    "AUDITBOT_TELEMETRY_LOG",
+    os.path.join(
+        os.environ.get("AUDITBOT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "auditbot-cx")),
+        "telemetry.jsonl",
+    ),
+)
+# Al superar este tamaño el registro se renombra a <ruta>.1 (se conserva solo esa copia); 0 = sin límite
+TELEMETRY_LOG_MAX_BYTES = int(float(os.environ.get("AUDITBOT_TELEMETRY_LOG_MAX_MB", "50")) * 1024 * 1024)
+# Valor inicial del panel de tiempos en el sidebar
+TELEMETRY_PANEL = os.environ.get("AUDITBOT_TELEMETRY_PANEL", "0") == "1"
+
+
+@dataclass
+class Span:
+    """Medición de un tramo del código: duración y atributos (bytes, registros, tokens...)."""
+
+    name: str
+    started_at: float
+    attrs: dict = field(default_factory=dict)
+    duration_ms: float = 0.0
+    error: Optional[str] = None
+    thread: str = ""
+
+    def set(self, **attrs) -> None:
+        self.attrs.update({key: value for key, value in attrs.items() if value is not None})
+
+    def to_record(self) -> dict:
+        record = {
+            "ts": round(self.started_at, 3),
+            "span": self.name,
+            "ms": round(self.duration_ms, 3),
+            "thread": self.thread,
+            "pid": os.getpid(),
+            **self.attrs,
+        }
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+# Spans de la ejecución actual del script (o None si nadie los está recolectando)
+_current_spans: contextvars.ContextVar[Optional[List[Span]]] = contextvars.ContextVar("auditbot_spans", default=None)
+
+
+class _JsonlWriter:
+    """Escribe los spans en JSONL desde un hilo propio para no bloquear el camino medido."""
+
+    def __init__(self, path: str, max_bytes: int = TELEMETRY_LOG_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._queue: "queue.Queue[dict]" = queue.Queue()
+        self._file_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name="telemetry-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def write(self, record: dict) -> None:
+        self._queue.put(record)
+
+    def _drain(self, records: List[dict]) -> None:
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not records:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._file_lock:
+                self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+        except OSError:
+            # Un registro no escribible no debe afectar a la aplicación
+            pass
+
+    def _rotate(self) -> None:
+        if not self.max_bytes:
+            return
+        try:
+            if os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+        except FileNotFoundError:
+            pass
+
+    def _loop(self) -> None:
+        while True:
+            # Espera el primer span y escribe de una vez todos los que se acumularon
+            self._drain([self._queue.get()])
+
+    def flush(self) -> None:
+        self._drain([])
+
+
+_writer: Optional[_JsonlWriter] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _JsonlWriter:
+    global _writer  # pylint: disable=global-statement
+    with _writer_lock:
+        if _writer is None:
+            _writer = _JsonlWriter(TELEMETRY_LOG_PATH)
+        return _writer
+
+
+def begin_collection() -> List[Span]:
+    """Empieza a recolectar los spans del hilo actual (una ejecución del script) y devuelve la lista."""
+
+    spans: List[Span] = []
+    _current_spans.set(spans)
+    return spans
+
+
+def bind(fn: Callable) -> Callable:
+    """Envuelve `fn` para que, ejecutada en otro hilo, sus spans cuenten en la ejecución actual."""
+
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Span]:
+    """Mide el bloque; el span queda en la ejecución actual y, si está activo, en el registro JSONL."""
+
+    current = Span(name, time.time(), {key: value for key, value in attrs.items() if value is not None})
+    current.thread = threading.current_thread().name
+    start = time.perf_counter()
+    try:
+        yield current
+    except Exception as exc:
+        current.error = f"{type(exc).__name__}: {str(exc)[:200]}"
+        raise
+    finally:
+        current.duration_ms = (time.perf_counter() - start) * 1000
+        _finish(current)
+
+
+def record(name: str, duration_ms: float, **attrs) -> Span:
+    """Registra un tramo medido por fuera de `span` (p. ej. una ejecución completa del script)."""
+
+    current = Span(name, time.time() - duration_ms / 1000, {key: value for key, value in attrs.items() if value is not None})
+    current.thread = threading.current_thread().name
+    current.duration_ms = duration_ms
+    _finish(current)
+    return current
+
+
+def _finish(current: Span) -> None:
+    spans = _current_spans.get()
+    if spans is not None:
+        spans.append(current)
+    if TELEMETRY_ENABLED:
+        _get_writer().write(current.to_record())
+
+
+def record_usage(current: Span, response) -> None:
+    """Copia al span el consumo de tokens informado por Gemini (respuesta o último fragmento del stream)."""
+
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    current.set(
+        tokens_in=getattr(usage, "prompt_token_count", None),
+        tokens_out=getattr(usage, "candidates_token_count", None),
+        tokens_cached=getattr(usage, "cached_content_token_count", None),
+    )
+
+
+def summarize(path: str = TELEMETRY_LOG_PATH):
+    """Agrega el registro JSONL por span: cantidad, p50/p95/máximo de duración, errores y totales."""
+
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    frame = pd.read_json(path, lines=True)
+    if frame.empty:
+        return frame
+    grouped = frame.groupby("span")
+    summary = pd.DataFrame(
+        {
+            "count": grouped["ms"].size(),
+            "p50_ms": grouped["ms"].quantile(0.5),
+            "p95_ms": grouped["ms"].quantile(0.95),
+            "max_ms": grouped["ms"].max(),
+        }
+    )
+    if "error" in frame.columns:
+        summary["errors"] = grouped["error"].count()
+    for column in ("bytes", "records", "tokens_in", "tokens_out", "tokens_cached"):
+        if column in frame.columns:
+            summary[column] = grouped[column].sum()
+    return summary.sort_values("p95_ms", ascending=False)
+
+
+if __name__ == "__main__":
+    print(summarize(sys.argv[1] if len(sys.argv) > 1 else TELEMETRY_LOG_PATH).round(1).to_string())
@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+import tempfile
+
+# La configuración se lee al importar los módulos: se fija antes de que las pruebas los importen
+_CACHE_DIR = tempfile.mkdtemp(prefix="auditbot-tests-")
+os.environ.setdefault("AUDITBOT_CACHE_DIR", _CACHE_DIR)
+os.environ.setdefault("AUDITBOT_TELEMETRY", "0")
+os.environ.setdefault("AUDITBOT_CONTEXT_CACHE", "local")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def evaluation(precision, critical=100, transcript="Agente: buenos días. Cliente: quiero bloquear la tarjeta.", **extra):
+    """Evaluación con la forma de los archivos reales (texto JSON en `evaluacion_llamada`)."""
+
+    payload = {
+        "precision_llamada": precision,
+        "precision_error_critico_cliente": critical,
+        "precision_error_critico_negocio": 100,
+        "precision_error_critico_cumplimiento": 100,
+        "precision_error_no_critico": 90,
+        "transcripcion": transcript,
+        "resumen": "Cliente solicita bloqueo de tarjeta.",
+        **extra,
+    }
+    return json.dumps(payload, ensure_ascii=False)
+
+
+@pytest.fixture
+def write_json(tmp_path):
+    """Escribe `records` como arreglo JSON en un archivo nuevo y devuelve su ruta."""
+
+    counter = iter(range(1_000_000))
+
+    def _write(records, indent=None, name=None):
+        path = tmp_path / (name or f"resultados_{next(counter)}.json")
+        path.write_text(json.dumps(records, ensure_ascii=False, indent=indent), encoding="utf-8")
+        return str(path)
+
+    return _write
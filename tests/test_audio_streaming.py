@@ -0,0 +1,84 @@
+import os
+import urllib.error
+import urllib.request
+
+import pytest
+
+from audio_streaming import AudioProxy, parse_range
+from local_storage import LocalStorageClient
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        (" bytes=10-20 ", (10, 20)),
+    ],
+)
+def test_parse_range_valid_headers(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize(
+    "header",
+    ["bytes=-", "bytes=500-100", "bytes=1000-", "items=0-10", "bytes=0-10,20-30", "bytes=a-b"],
+)
+def test_parse_range_rejects_unsatisfiable_or_unsupported(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.fixture
+def proxy(tmp_path):
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "x.mp3").write_bytes(os.urandom(1000))
+    server = AudioProxy(LocalStorageClient(str(tmp_path)), host="127.0.0.1", port=0)
+    yield server
+    server.shutdown()
+
+
+def _get(url, range_header=None):
+    request = urllib.request.Request(url, headers={"Range": range_header} if range_header else {})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.headers, error.read()
+
+
+def test_proxy_serves_the_requested_range(proxy, tmp_path):
+    content = (tmp_path / "b" / "x.mp3").read_bytes()
+
+    status, headers, body = _get(proxy.url_for("gs://b/x.mp3"), "bytes=100-299")
+
+    assert status == 206
+    assert body == content[100:300]
+    assert headers["Content-Range"] == "bytes 100-299/1000"
+    assert headers["Content-Length"] == "200"
+
+
+def test_proxy_serves_the_whole_file_without_range(proxy, tmp_path):
+    status, _, body = _get(proxy.url_for("gs://b/x.mp3"))
+
+    assert status == 200
+    assert body == (tmp_path / "b" / "x.mp3").read_bytes()
+
+
+def test_proxy_rejects_unsatisfiable_range(proxy):
+    status, headers, _ = _get(proxy.url_for("gs://b/x.mp3"), "bytes=5000-")
+
+    assert status == 416
+    assert headers["Content-Range"] == "bytes */1000"
+
+
+def test_proxy_rejects_tampered_signature(proxy):
+    url = proxy.url_for("gs://b/x.mp3")
+    tampered = url[:-1] + ("0" if url[-1] != "0" else "1")
+
+    assert _get(tampered)[0] == 403
+    assert _get(url.replace("x.mp3", "y.mp3"))[0] == 403
@@ -0,0 +1,169 @@
+import io
+import os
+import threading
+import time
+
+from audio_cache import AudioCache, AudioPrefetcher
+from local_storage import LocalStorageClient
+from report_cache import ReportCache, records_digest, report_cache_key, section_cache_key
+from transcription_cache import TranscriptionCache, audio_digest, config_digest
+
+
+def test_audio_digest_depends_only_on_content_and_rewinds():
+    first = io.BytesIO(b"audio" * 1000)
+    first.seek(123)
+
+    digest = audio_digest(first)
+
+    assert first.tell() == 0
+    assert digest == audio_digest(io.BytesIO(b"audio" * 1000))
+    assert digest != audio_digest(io.BytesIO(b"audio" * 999))
+
+
+def test_config_digest_changes_with_prompt_model_and_config():
+    base = config_digest("prompt", "gemini", {"temperature": 0})
+
+    assert base == config_digest("prompt", "gemini", {"temperature": 0})
+    assert base != config_digest("otro prompt", "gemini", {"temperature": 0})
+    assert base != config_digest("prompt", "otro-modelo", {"temperature": 0})
+    assert base != config_digest("prompt", "gemini", {"temperature": 1})
+
+
+def test_transcription_cache_round_trip(tmp_path):
+    cache = TranscriptionCache(directory=str(tmp_path), max_entries=10, ttl_days=1)
+
+    assert cache.get("clave") is None
+    cache.put("clave", {"text": "hola"})
+
+    record = cache.get("clave")
+    assert record["text"] == "hola"
+    assert "created_at" in record
+
+
+def test_transcription_cache_expires_entries_by_ttl(tmp_path):
+    cache = TranscriptionCache(directory=str(tmp_path), max_entries=10, ttl_days=1)
+    cache.put("vieja", {"text": "x"})
+    cache.ttl_seconds = 0.01
+    time.sleep(0.05)
+
+    assert cache.get("vieja") is None
+    assert not os.path.exists(tmp_path / "vieja.json")
+
+
+def test_transcription_cache_evicts_least_recently_used(tmp_path):
+    cache = TranscriptionCache(directory=str(tmp_path), max_entries=2, ttl_days=1)
+    cache.put("a", {"text": "a"})
+    cache.put("b", {"text": "b"})
+    # "a" pasa a ser la de uso más reciente
+    past = time.time() - 60
+    os.utime(tmp_path / "b.json", (past, past))
+    cache.get("a")
+
+    cache.put("c", {"text": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def _records(*evaluations):
+    return [{"id_llamada_procesada": f"r-{n}", "evaluacion_llamada": value} for n, value in enumerate(evaluations)]
+
+
+def test_records_digest_tracks_content_and_order():
+    base = records_digest(_records("uno", "dos"))
+
+    assert base == records_digest(_records("uno", "dos"))
+    assert base != records_digest(_records("uno", "tres"))
+    assert base != records_digest(list(reversed(_records("uno", "dos"))))
+    # Un dict se serializa con claves ordenadas: el orden de inserción no cambia la huella
+    assert records_digest(_records({"a": 1, "b": 2})) == records_digest(_records({"b": 2, "a": 1}))
+
+
+def test_report_cache_key_changes_with_every_component():
+    arguments = ("Servicios", "datos", ["¿Pregunta?"], 1, {"model": "gemini"})
+    base = report_cache_key(*arguments)
+
+    assert base == report_cache_key(*arguments)
+    for position, changed in enumerate(("Preferente", "otros datos", ["¿Otra?"], 2, {"model": "otro"})):
+        variant = list(arguments)
+        variant[position] = changed
+        assert report_cache_key(*variant) != base
+
+    assert section_cache_key(base, 1) != section_cache_key(base, 2)
+
+
+def test_report_cache_ttl_and_invalidate(tmp_path):
+    cache = ReportCache(directory=str(tmp_path), max_entries=5, ttl_days=1)
+    cache.put("informe", {"report": "texto"})
+    assert cache.get("informe")["report"] == "texto"
+
+    cache.invalidate("informe")
+    assert cache.get("informe") is None
+
+    cache.put("informe", {"report": "texto"})
+    cache.ttl_seconds = 0.01
+    time.sleep(0.05)
+    assert cache.get("informe") is None
+
+
+def _audio_cache(tmp_path, **options):
+    for name in ("a", "b", "c"):
+        (tmp_path / "gcs" / "bucket").mkdir(parents=True, exist_ok=True)
+        (tmp_path / "gcs" / "bucket" / f"{name}.mp3").write_bytes(name.encode() * 100)
+    client = LocalStorageClient(str(tmp_path / "gcs"))
+    return AudioCache(disk_dir=str(tmp_path / "audio"), client_factory=lambda: client, **options)
+
+
+def test_audio_cache_evicts_least_recently_used_files_from_disk(tmp_path):
+    cache = _audio_cache(tmp_path, memory_budget=0, disk_budget=250)
+    cache.get("gs://bucket/a.mp3")
+    cache.get("gs://bucket/b.mp3")
+    # "a" pasa a ser el de uso más reciente
+    cache.get("gs://bucket/a.mp3")
+
+    cache.get("gs://bucket/c.mp3")
+
+    assert len(list((tmp_path / "audio").glob("*.bin"))) == 2
+    assert cache.contains("gs://bucket/a.mp3") and cache.contains("gs://bucket/c.mp3")
+    assert not cache.contains("gs://bucket/b.mp3")
+
+
+def test_audio_cache_revalidates_generation_after_ttl(tmp_path):
+    stale = _audio_cache(tmp_path, generation_ttl=600)
+    fresh = _audio_cache(tmp_path, generation_ttl=0)
+    assert stale.get("gs://bucket/a.mp3") == fresh.get("gs://bucket/a.mp3") == b"a" * 100
+
+    audio = tmp_path / "gcs" / "bucket" / "a.mp3"
+    audio.write_bytes(b"nuevo")
+    os.utime(audio, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+
+    assert stale.get("gs://bucket/a.mp3") == b"a" * 100
+    assert fresh.get("gs://bucket/a.mp3") == b"nuevo"
+
+
+def test_audio_cache_get_waits_for_an_inflight_prefetch(tmp_path):
+    cache = _audio_cache(tmp_path)
+    downloads = []
+    original = cache._download
+
+    def _slow_download(*args):
+        downloads.append(args)
+        time.sleep(0.2)
+        return original(*args)
+
+    cache._download = _slow_download
+    prefetcher = AudioPrefetcher(cache, max_workers=1)
+    prefetcher.prefetch("sesion", "v1", ["gs://bucket/a.mp3"])
+    deadline = time.time() + 5
+    while not cache.loading("gs://bucket/a.mp3") and time.time() < deadline:
+        time.sleep(0.01)
+
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(cache.get("gs://bucket/a.mp3"))) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+
+    assert results == [b"a" * 100] * 3
+    assert len(downloads) == 1
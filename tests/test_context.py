@@ -0,0 +1,155 @@
+import threading
+import time
+
+import pytest
+
+from conftest import evaluation
+from context_cache import ContextCacheRegistry, LocalCacheBackend
+from context_packer import estimate_tokens, pack_evaluations, pack_shards
+
+
+class _CountingBackend(LocalCacheBackend):
+    def __init__(self, delay: float = 0.0):
+        super().__init__()
+        self.delay = delay
+        self.creates = 0
+
+    def create(self, model, text, ttl_seconds, display_name):
+        self.creates += 1
+        time.sleep(self.delay)
+        return super().create(model, text, ttl_seconds, display_name)
+
+
+def test_registry_skips_short_contexts():
+    registry = ContextCacheRegistry(LocalCacheBackend(), ttl_seconds=600, min_chars=100)
+
+    assert registry.handle_for("servicios", 50, "modelo", "corto") is None
+
+
+def test_registry_reuses_handle_and_resolves_its_text():
+    backend = _CountingBackend()
+    registry = ContextCacheRegistry(backend, ttl_seconds=600, min_chars=1)
+
+    name = registry.handle_for("servicios", 50, "modelo", "contexto")
+
+    assert registry.handle_for("servicios", 50, "modelo", "contexto") == name
+    assert backend.creates == 1
+    assert registry.resolve(name) == "contexto"
+
+
+def test_registry_replaces_stale_handle_of_the_same_scope():
+    backend = _CountingBackend()
+    registry = ContextCacheRegistry(backend, ttl_seconds=600, min_chars=1)
+    old = registry.handle_for("servicios", 50, "modelo", "datos v1")
+
+    new = registry.handle_for("servicios", 50, "modelo", "datos v2")
+
+    assert new != old
+    assert old not in backend.contents
+    with pytest.raises(KeyError):
+        registry.resolve(old)
+
+
+def test_registry_renews_handle_close_to_expiry():
+    backend = _CountingBackend()
+    # Con un TTL dentro del margen de renovación, cada pedido crea un handle nuevo
+    registry = ContextCacheRegistry(backend, ttl_seconds=30, min_chars=1)
+
+    registry.handle_for("servicios", None, "modelo", "contexto")
+    registry.handle_for("servicios", None, "modelo", "contexto")
+
+    assert backend.creates == 2
+    assert len(backend.contents) == 1
+
+
+def test_registry_invalidate_forgets_handle():
+    backend = _CountingBackend()
+    registry = ContextCacheRegistry(backend, ttl_seconds=600, min_chars=1)
+    name = registry.handle_for("servicios", 50, "modelo", "contexto")
+
+    registry.invalidate(name)
+
+    assert name not in backend.contents
+    assert registry.handle_for("servicios", 50, "modelo", "contexto") != name
+
+
+def test_registry_creates_each_key_once_under_concurrency():
+    backend = _CountingBackend(delay=0.2)
+    registry = ContextCacheRegistry(backend, ttl_seconds=600, min_chars=1)
+    names = []
+    threads = [
+        threading.Thread(target=lambda: names.append(registry.handle_for("servicios", 50, "modelo", "contexto")))
+        for _ in range(5)
+    ]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.creates == 1
+    assert len(set(names)) == 1 and names[0] is not None
+
+
+def test_registry_backs_off_after_a_failed_create():
+    class _FailingBackend(LocalCacheBackend):
+        creates = 0
+
+        def create(self, model, text, ttl_seconds, display_name):
+            self.creates += 1
+            raise RuntimeError("contexto demasiado corto")
+
+    backend = _FailingBackend()
+    registry = ContextCacheRegistry(backend, ttl_seconds=600, min_chars=1)
+
+    assert registry.handle_for("servicios", 50, "modelo", "contexto") is None
+    assert registry.handle_for("servicios", 50, "modelo", "contexto") is None
+    assert backend.creates == 1
+
+
+def _records(count):
+    return [
+        {"dataset": "servicios", "id_llamada_procesada": f"p-{n}", "evaluacion_llamada": evaluation(40 + n % 60)}
+        for n in range(count)
+    ]
+
+
+def test_pack_evaluations_respects_the_token_budget():
+    records = _records(200)
+    full = pack_evaluations(records)
+
+    packed = pack_evaluations(records, token_budget=full.tokens // 4)
+
+    assert packed.truncated
+    assert 0 < packed.included < packed.total == 200
+    assert packed.tokens <= full.tokens // 4
+    assert estimate_tokens(packed.text) <= packed.tokens
+    # Se incluye un prefijo de los registros, en orden
+    assert "p-0 |" in packed.text and f"p-{packed.included - 1} |" in packed.text
+    assert f"p-{packed.included} |" not in packed.text
+
+
+def test_pack_evaluations_without_budget_includes_everything():
+    packed = pack_evaluations(_records(20))
+
+    assert not packed.truncated
+    assert packed.included == 20
+    assert packed.text.count("\n  T: ") == 20
+
+
+def test_pack_evaluations_keeps_one_record_over_budget():
+    packed = pack_evaluations(_records(3), token_budget=1)
+
+    assert packed.included == 1
+
+
+def test_pack_shards_covers_all_records_in_order():
+    records = _records(120)
+    budget = pack_evaluations(records).tokens // 5
+
+    shards = pack_shards(records, budget)
+
+    assert len(shards) > 1
+    assert sum(shard.included for shard in shards) == 120
+    assert [shard.start for shard in shards] == [sum(s.included for s in shards[:n]) for n in range(len(shards))]
+    assert all(shard.tokens <= budget for shard in shards if shard.included > 1)
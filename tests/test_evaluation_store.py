@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from conftest import evaluation
+from evaluation_store import (
+    iter_evaluation_rows,
+    iter_json_array,
+    load_evaluation_rows,
+    load_records_frame,
+    normalize_evaluations,
+)
+
+
+def _mixed_records():
+    """Registros con las variantes que aparecen en los archivos reales."""
+
+    return [
+        {"id_llamada_procesada": "a-1", "evaluacion_llamada": evaluation(95)},
+        {"id_llamada_procesada": "a-2", "evaluacion_llamada": None},
+        {"id_llamada_procesada": "a-3", "evaluacion_llamada": ""},
+        {"id_llamada_procesada": "a-4", "evaluacion_llamada": "  {} "},
+        {"id_llamada_procesada": "a-5", "evaluacion_llamada": []},
+        {"id_llamada_procesada": 6, "evaluacion_llamada": {"precision_llamada": 80, "resumen": "dict"}},
+        {"evaluacion_llamada": evaluation(70)},
+        {"id_llamada_procesada": "a-8", "evaluacion_llamada": "texto sin formato JSON"},
+        {"id_llamada_procesada": "a-9", "evaluacion_llamada": "{}", "evaluacion_llamada_raw": evaluation(60)},
+        {"id_llamada_procesada": "a-10", "evaluacion_llamada": evaluation(50, critical=0)},
+        "no es un objeto",
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_iter_json_array_matches_json_load(write_json, chunk_size):
+    records = [{"id": number, "texto": "ñandú \"comillas\" ]} [{" * (number % 3)} for number in range(50)]
+    path = write_json(records, indent=2)
+
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == records
+
+
+def test_iter_json_array_empty_array(write_json):
+    assert list(iter_json_array(write_json([]))) == []
+
+
+def test_iter_json_array_rejects_non_array(tmp_path):
+    path = tmp_path / "objeto.json"
+    path.write_text('{"a": 1}', encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path)))
+
+
+def test_iter_json_array_rejects_truncated_file(tmp_path):
+    path = tmp_path / "truncado.json"
+    path.write_text('[{"a": 1}, {"b": 2}', encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), chunk_size=4))
+
+
+def test_stream_and_frame_paths_return_identical_rows(write_json):
+    path = write_json(_mixed_records())
+
+    streamed = list(iter_evaluation_rows(path, "servicios"))
+    from_frame = load_evaluation_rows(path, "servicios")
+
+    assert streamed == from_frame
+    assert [row["id_llamada_procesada"] for row in streamed] == ["a-1", "6", "", "a-8", "a-9", "a-10"]
+    # La evaluación cruda tiene prioridad sobre la columna normalizada
+    assert json.loads(streamed[4]["evaluacion_llamada"])["precision_llamada"] == 60
+
+
+def test_limited_loads_are_prefixes_of_the_full_load(write_json):
+    path = write_json([{"id_llamada_procesada": f"c-{n}", "evaluacion_llamada": evaluation(n)} for n in range(30)])
+
+    first = load_evaluation_rows(path, "servicios", 5)
+    larger = load_evaluation_rows(path, "servicios", 12)
+    full = load_evaluation_rows(path, "servicios")
+
+    assert len(first) == 5 and len(larger) == 12 and len(full) == 30
+    assert full[:5] == first
+    assert full[:12] == larger
+    # Un límite menor que lo ya leído se sirve desde memoria, igual que el prefijo
+    assert load_evaluation_rows(path, "servicios", 3) == full[:3]
+
+
+def test_rows_follow_changes_to_the_source_file(write_json):
+    path = write_json([{"id_llamada_procesada": "v1", "evaluacion_llamada": evaluation(90)}], name="cambia.json")
+    assert [row["id_llamada_procesada"] for row in load_evaluation_rows(path, "servicios")] == ["v1"]
+
+    write_json(
+        [
+            {"id_llamada_procesada": "v2", "evaluacion_llamada": evaluation(80)},
+            {"id_llamada_procesada": "v3", "evaluacion_llamada": evaluation(70)},
+        ],
+        name="cambia.json",
+    )
+
+    assert [row["id_llamada_procesada"] for row in load_evaluation_rows(path, "servicios")] == ["v2", "v3"]
+
+
+def test_normalize_evaluations_extracts_typed_columns(write_json):
+    path = write_json([{"id_llamada_procesada": "n-1", "evaluacion_llamada": evaluation("85%")}])
+    frame = load_records_frame(path)
+    frame["evaluacion_llamada_raw"] = frame["evaluacion_llamada"]
+
+    normalized = normalize_evaluations(frame)
+
+    assert normalized.loc[0, "precision_llamada"] == 85
+    assert normalized.loc[0, "transcripcion"].startswith("Agente:")
+    assert normalized.loc[0, "evaluacion_detalle"] == {"resumen": "Cliente solicita bloqueo de tarjeta."}
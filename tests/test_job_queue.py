@@ -0,0 +1,131 @@
+import sqlite3
+import threading
+import time
+
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _insert(db_path, job_id, status, owner=None, lease_until=None):
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    connection.execute(
+        "INSERT INTO jobs (id, kind, params, status, created_at, updated_at, owner, lease_until) "
+        "VALUES (?, 'informe', '{}', ?, ?, ?, ?, ?)",
+        (job_id, status, time.time(), time.time(), owner, lease_until),
+    )
+    connection.close()
+
+
+def test_submit_runs_handler_and_stores_result(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1)
+    queue.register("informe", lambda job: f"hola {job.params['nombre']}")
+
+    job = queue.submit("informe", {"nombre": "mundo"})
+
+    assert _wait_for(lambda: queue.get(job.id).status == DONE)
+    assert queue.get(job.id).result == "hola mundo"
+
+
+def test_failed_handler_marks_job_failed(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1)
+
+    def _fail(_job):
+        raise RuntimeError("sin datos")
+
+    queue.register("informe", _fail)
+    job = queue.submit("informe", {})
+
+    assert _wait_for(lambda: queue.get(job.id).status == FAILED)
+    assert queue.get(job.id).error == "sin datos"
+
+
+def test_active_job_with_same_dedupe_key_is_reused(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1)
+    release = threading.Event()
+    queue.register("informe", lambda job: release.wait(5) and "listo")
+
+    first = queue.submit("informe", {}, dedupe_key="servicios")
+    second = queue.submit("informe", {}, dedupe_key="servicios")
+    release.set()
+
+    assert second.id == first.id
+    assert _wait_for(lambda: queue.get(first.id).status == DONE)
+
+
+def test_register_resumes_queued_and_orphaned_jobs(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    JobQueue(db_path, workers=1)
+    _insert(db_path, "en-cola", QUEUED)
+    # Dueño que murió: su concesión ya venció
+    _insert(db_path, "huerfano", RUNNING, owner="proceso-muerto", lease_until=time.time() - 10)
+    runs = []
+
+    queue = JobQueue(db_path, workers=2)
+    queue.register("informe", lambda job: runs.append(job.job.id) or "ok")
+
+    assert _wait_for(lambda: all(queue.get(job_id).status == DONE for job_id in ("en-cola", "huerfano")))
+    assert sorted(runs) == ["en-cola", "huerfano"]
+
+
+def test_register_leaves_jobs_of_live_owners_alone(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    JobQueue(db_path, workers=1)
+    _insert(db_path, "ajeno", RUNNING, owner="otro-proceso", lease_until=time.time() + 600)
+    runs = []
+
+    queue = JobQueue(db_path, workers=1)
+    queue.register("informe", lambda job: runs.append(job.job.id) or "ok")
+    time.sleep(0.3)
+
+    assert runs == []
+    assert queue.get("ajeno").status == RUNNING
+
+
+def test_two_queues_on_one_database_run_a_job_once(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    runs = []
+    lock = threading.Lock()
+
+    def _handler(job):
+        with lock:
+            runs.append(job.job.id)
+        time.sleep(0.3)
+        return "ok"
+
+    first = JobQueue(db_path, workers=1)
+    first.register("informe", _handler)
+    job = first.submit("informe", {})
+    assert _wait_for(lambda: first.get(job.id).status == RUNNING)
+
+    second = JobQueue(db_path, workers=1)
+    second.register("informe", _handler)
+
+    assert _wait_for(lambda: first.get(job.id).status == DONE)
+    assert runs == [job.id]
+
+
+def test_partial_writes_are_throttled(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1)
+    seen = {}
+
+    def _handler(job):
+        for number in range(100):
+            if job.partial_due():
+                job.partial(str(number))
+        seen["partial"] = queue.get(job.job.id).partial
+        return "ok"
+
+    queue.register("informe", _handler)
+    job = queue.submit("informe", {})
+
+    assert _wait_for(lambda: queue.get(job.id).status == DONE)
+    # Solo la primera escritura ocurre dentro del intervalo mínimo
+    assert seen["partial"] == "0"
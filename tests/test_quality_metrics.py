@@ -0,0 +1,74 @@
+import math
+
+import pandas as pd
+import pytest
+
+from conftest import evaluation
+from evaluation_store import normalize_evaluations
+from quality_metrics import compute_quality_summary
+
+
+def _frame(rows):
+    frame = pd.DataFrame(rows)
+    frame["evaluacion_llamada_raw"] = frame["evaluacion_llamada"]
+    return normalize_evaluations(frame)
+
+
+@pytest.fixture
+def summary():
+    frame = _frame(
+        [
+            {"id_llamada_procesada": "q-1", "fecha_llamada": "2026-03-01", "evaluacion_llamada": evaluation(100)},
+            {"id_llamada_procesada": "q-2", "fecha_llamada": "2026-03-01", "evaluacion_llamada": evaluation(60, critical=0)},
+            {"id_llamada_procesada": "q-3", "fecha_llamada": "2026-03-02", "evaluacion_llamada": evaluation(80)},
+            {"id_llamada_procesada": "q-4", "fecha_llamada": "2026-03-02", "evaluacion_llamada": evaluation(60)},
+            {"id_llamada_procesada": "q-5", "fecha_llamada": "sin fecha", "evaluacion_llamada": None},
+        ]
+    )
+    return compute_quality_summary(frame, worst_limit=3)
+
+
+def test_totals_and_means(summary):
+    assert summary.total_calls == 5
+    assert summary.evaluated_calls == 4
+    assert summary.mean_precision == pytest.approx(75)
+    assert summary.median_precision == pytest.approx(70)
+
+
+def test_error_rates(summary):
+    assert summary.critical_error_rate == pytest.approx(0.25)
+    assert summary.error_rates["Error Crítico Cliente"] == pytest.approx(0.25)
+    assert summary.error_rates["Error Crítico Negocio"] == 0
+    # La precisión no crítica (90) está bajo el umbral de 100 en todas las llamadas evaluadas
+    assert summary.error_rates["Error No Crítico"] == 1
+
+
+def test_percentiles_and_distributions(summary):
+    row = summary.percentiles.loc["Precisión Total"]
+    assert row["llamadas"] == 4
+    assert row["media"] == pytest.approx(75)
+    assert summary.distributions["Precisión Total"].sum() == 4
+    assert summary.distributions.loc["60-70", "Precisión Total"] == 2
+
+
+def test_daily_aggregates(summary):
+    daily = summary.daily
+    assert list(daily.index.strftime("%Y-%m-%d")) == ["2026-03-01", "2026-03-02"]
+    assert list(daily["llamadas"]) == [2, 2]
+    assert list(daily["precision_media"]) == pytest.approx([80, 70])
+    assert list(daily["tasa_error_critico"]) == pytest.approx([0.5, 0])
+
+
+def test_worst_calls_prefer_critical_errors_on_ties(summary):
+    worst = summary.worst_calls
+    assert list(worst["id_llamada_procesada"]) == ["q-2", "q-4", "q-3"]
+
+
+def test_empty_metrics_do_not_fail():
+    frame = _frame([{"id_llamada_procesada": "vacia", "evaluacion_llamada": None}])
+
+    result = compute_quality_summary(frame)
+
+    assert result.evaluated_calls == 0
+    assert math.isnan(result.mean_precision)
+    assert result.worst_calls.empty
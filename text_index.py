@@ -0,0 +1,264 @@
+import math
+import os
+import pickle
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# --- CONFIGURACIÓN DEL ÍNDICE LÉXICO (BM25) ---
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Incrementar cuando cambie la tokenización o el formato persistido
+TEXT_INDEX_VERSION = 1
+SNIPPET_WIDTH = 180
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Palabras vacías del español (y conectores frecuentes en las evaluaciones) que no aportan al ranking
+STOPWORDS = frozenset(
+    """
+    a al algo algun alguna algunas alguno algunos ante antes aqui asi aun cada como con contra cual cuales
+    cuando de del desde donde dos el ella ellas ello ellos en entre era es esa esas ese eso esos esta estaba
+    estan estar este esto estos fue fueron ha han hasta hay la las le les lo los mas me mi mis muy nada ni no
+    nos o otra otro otros para pero poco por porque que se sea segun ser si sin sobre son su sus tambien
+    tan te tiene tienen todo todos tu un una unas uno unos usted ya y yo
+    """.split()
+)
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin tildes, para que 'Atención' y 'atencion' coincidan."""
+
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _normalized_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """Texto normalizado y, para cada carácter, su posición en el texto original."""
+
+    chars: List[str] = []
+    offsets: List[int] = []
+    for position, char in enumerate(text):
+        for piece in normalize_text(char):
+            chars.append(piece)
+            offsets.append(position)
+    return "".join(chars), offsets
+
+
+def tokenize(text: str) -> List[str]:
+    """Términos indexables de `text` (normalizados, sin palabras vacías ni letras sueltas)."""
+
+    return [
+        token
+        for token in _TOKEN_PATTERN.findall(normalize_text(text))
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def snippet(text: str, query: str, width: int = SNIPPET_WIDTH) -> str:
+    """Fragmento de `text` con la ventana que más términos de `query` contiene, resaltados en negrita."""
+
+    terms = set(tokenize(query))
+    if not text:
+        return ""
+    normalized, offsets = _normalized_with_offsets(text)
+    matches = [
+        (match.start(), match.end())
+        for match in _TOKEN_PATTERN.finditer(normalized)
+        if match.group() in terms
+    ]
+    if not matches:
+        fragment = text[:width].strip()
+        return fragment + ("…" if len(text) > width else "")
+
+    # Ventana (en el texto normalizado) que cubre más coincidencias
+    best_start, best_count, right = matches[0][0], 0, 0
+    for left, (start, _) in enumerate(matches):
+        while right < len(matches) and matches[right][1] - start <= width:
+            right += 1
+        if right - left > best_count:
+            best_start, best_count = start, right - left
+    window_start = max(0, best_start - width // 4)
+    window_end = min(len(normalized), window_start + width)
+
+    pieces: List[str] = []
+    cursor = offsets[window_start]
+    for start, end in matches:
+        if start < window_start or end > window_end:
+            continue
+        original_start, original_end = offsets[start], offsets[end - 1] + 1
+        pieces.append(text[cursor:original_start])
+        pieces.append(f"**{text[original_start:original_end]}**")
+        cursor = original_end
+    end_position = offsets[window_end - 1] + 1
+    pieces.append(text[cursor:end_position])
+    fragment = " ".join("".join(pieces).split())
+    prefix = "…" if offsets[window_start] > 0 else ""
+    suffix = "…" if end_position < len(text) else ""
+    return f"{prefix}{fragment}{suffix}"
+
+
+class BM25Index:
+    """Índice invertido BM25 persistente y actualizable de forma incremental.
+
+    Cada documento se identifica por una clave y una huella de su contenido; `sync`
+    solo reindexa los documentos nuevos o modificados y retira los que desaparecieron.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        # clave → (huella, longitud en términos, términos distintos)
+        self.documents: Dict[str, Tuple[str, int, Tuple[str, ...]]] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+        self._compiled = None
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        del state["_compiled"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._compiled = None
+
+    def fingerprint_of(self, key: str) -> Optional[str]:
+        entry = self.documents.get(key)
+        return entry[0] if entry else None
+
+    def add(self, key: str, text: str, fingerprint: str) -> None:
+        with self._lock:
+            if key in self.documents:
+                self.remove(key)
+            counts = Counter(tokenize(text))
+            length = sum(counts.values())
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, {})[key] = frequency
+            self.documents[key] = (fingerprint, length, tuple(counts))
+            self.total_length += length
+            self._compiled = None
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            entry = self.documents.pop(key, None)
+            if entry is None:
+                return
+            _, length, terms = entry
+            for term in terms:
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                posting.pop(key, None)
+                if not posting:
+                    del self.postings[term]
+            self.total_length -= length
+            self._compiled = None
+
+    def sync(self, documents: Iterable[Tuple[str, str, str]]) -> Tuple[int, int]:
+        """Alinea el índice con `documents` (clave, texto, huella); devuelve (agregados, retirados)."""
+
+        with self._lock:
+            seen = set()
+            added = 0
+            for key, text, fingerprint in documents:
+                seen.add(key)
+                if self.fingerprint_of(key) == fingerprint:
+                    continue
+                self.add(key, text, fingerprint)
+                added += 1
+            stale = [key for key in self.documents if key not in seen]
+            for key in stale:
+                self.remove(key)
+            return added, len(stale)
+
+    def _compile(self) -> dict:
+        """Vista en arreglos numpy del índice, reconstruida solo tras una modificación.
+
+        Las listas de cada término se convierten de forma perezosa en la primera consulta que lo usa.
+        """
+
+        if self._compiled is None:
+            keys = list(self.documents)
+            lengths = np.fromiter((self.documents[key][1] for key in keys), dtype=np.float32, count=len(keys))
+            average_length = float(lengths.mean()) if len(keys) and lengths.mean() > 0 else 1.0
+            self._compiled = {
+                "keys": keys,
+                "positions": {key: row for row, key in enumerate(keys)},
+                # Denominador de BM25 sin la frecuencia: k1 * (1 - b + b * |d| / avgdl)
+                "norms": BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length),
+                "terms": {},
+            }
+        return self._compiled
+
+    def _term_arrays(self, compiled: dict, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = compiled["terms"].get(term)
+        if arrays is None:
+            posting = self.postings.get(term)
+            if not posting:
+                return None
+            positions = compiled["positions"]
+            rows = np.fromiter((positions[key] for key in posting), dtype=np.int64, count=len(posting))
+            frequencies = np.fromiter(posting.values(), dtype=np.float32, count=len(posting))
+            arrays = compiled["terms"][term] = (rows, frequencies)
+        return arrays
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Las `k` claves con mayor puntaje BM25 para `query`, de mayor a menor.
+
+        El puntaje se acumula de forma vectorizada sobre las listas de cada término, por lo
+        que una consulta sobre cientos de miles de documentos tarda milisegundos.
+        """
+
+        terms = set(tokenize(query))
+        with self._lock:
+            total_docs = len(self.documents)
+            if not terms or not total_docs or k <= 0:
+                return []
+            compiled = self._compile()
+            scores = np.zeros(total_docs, dtype=np.float32)
+            for term in terms:
+                arrays = self._term_arrays(compiled, term)
+                if arrays is None:
+                    continue
+                rows, frequencies = arrays
+                idf = math.log(1 + (total_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                scores[rows] += idf * frequencies * (BM25_K1 + 1) / (frequencies + compiled["norms"][rows])
+            candidates = np.flatnonzero(scores)
+            if not len(candidates):
+                return []
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            keys = compiled["keys"]
+            return [(keys[row], float(scores[row])) for row in candidates]
+
+    def save(self, path: str) -> None:
+        """Escritura atómica del índice (pickle con versión)."""
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                pickle.dump((TEXT_INDEX_VERSION, self), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Carga el índice guardado; si no existe, está dañado o es de otra versión, devuelve uno vacío."""
+
+        try:
+            with open(path, "rb") as f:
+                version, index = pickle.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError, AttributeError, TypeError):
+            return cls()
+        if version != TEXT_INDEX_VERSION or not isinstance(index, cls):
+            return cls()
+        return index
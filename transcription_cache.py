@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from evaluation_store import CACHE_DIR
+
+# --- CONFIGURACIÓN DE LA CACHÉ DE TRANSCRIPCIONES ---
+TRANSCRIPTION_CACHE_DIR = os.environ.get(
+    "AUDITBOT_TRANSCRIPTION_CACHE_DIR", os.path.join(CACHE_DIR, "transcripciones")
+)
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.environ.get("AUDITBOT_TRANSCRIPTION_CACHE_MAX_ENTRIES", "5000"))
+TRANSCRIPTION_CACHE_TTL_DAYS = float(os.environ.get("AUDITBOT_TRANSCRIPTION_CACHE_TTL_DAYS", "90"))
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def audio_digest(file_obj) -> str:
+    """SHA-256 del contenido del audio, leído por tramos; deja el archivo al inicio."""
+
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(_HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def config_digest(prompt: str, model: str, config: dict) -> str:
+    """Huella del prompt, el modelo y la configuración de generación."""
+
+    payload = json.dumps({"prompt": prompt, "model": model, "config": config}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranscriptionCache:
+    """Caché persistente de transcripciones direccionada por contenido.
+
+    Cada entrada es un JSON cuyo nombre es la clave (audio + configuración). Se expulsan
+    las entradas vencidas por TTL y, si se supera el máximo, las de uso menos reciente.
+    """
+
+    def __init__(
+        self,
+        directory: str = TRANSCRIPTION_CACHE_DIR,
+        max_entries: int = TRANSCRIPTION_CACHE_MAX_ENTRIES,
+        ttl_days: float = TRANSCRIPTION_CACHE_TTL_DAYS,
+    ):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_days * 24 * 3600
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - record.get("created_at", 0) > self.ttl_seconds:
+            self._remove(path)
+            return None
+        try:
+            # El mtime marca el último uso para la expulsión LRU
+            os.utime(path)
+        except OSError:
+            pass
+        return record
+
+    def put(self, key: str, record: dict) -> None:
+        record = dict(record, created_at=time.time())
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self.evict()
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        """Elimina entradas vencidas y recorta al máximo de entradas por uso menos reciente."""
+
+        with self._lock:
+            try:
+                entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+            except FileNotFoundError:
+                return
+            now = time.time()
+            alive = []
+            for entry in entries:
+                mtime = entry.stat().st_mtime
+                # Una entrada sin uso por más del TTL también venció
+                if now - mtime > self.ttl_seconds:
+                    self._remove(entry.path)
+                else:
+                    alive.append((mtime, entry.path))
+            alive.sort()
+            for _, path in alive[: max(0, len(alive) - self.max_entries)]:
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_shared_cache: Optional[TranscriptionCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_transcription_cache() -> TranscriptionCache:
+    """Caché de transcripciones compartida por todas las sesiones del proceso."""
+
+    global _shared_cache  # pylint: disable=global-statement
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = TranscriptionCache()
+        return _shared_cache